@@ -0,0 +1,32 @@
+"""
+Shared bootstrap for the benchmark scripts.
+
+Runs Django against a throwaway SQLite database, or against the Postgres
+database from the regular ``DB_*`` variables when ``BENCH_USE_POSTGRES=true``,
+and applies migrations before the benchmark seeds its data. Point the
+Postgres variables at a scratch database, the benchmarks insert rows.
+"""
+import os
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup():
+    sys.path.insert(0, BASE_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
+    os.environ.setdefault('SECRET_KEY', 'benchmark-only-secret-key-not-for-production-use')
+
+    from django.conf import settings
+    if os.environ.get('BENCH_USE_POSTGRES', 'false').lower() != 'true':
+        settings.DATABASES['default'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(tempfile.mkdtemp(), 'bench.sqlite3'),
+        }
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
@@ -0,0 +1,198 @@
+"""
+Compare the WSGI and ASGI deployments of the hot read endpoints under a
+mix of slow and fast requests.
+
+    python benchmarks/async_reads.py [requests] [rate] [slow_ms] [wsgi_threads]
+
+Requests arrive at a steady ``rate`` per second. Every tenth one is a
+subscription list whose query is delayed by ``slow_ms`` (standing in for a
+slow Postgres query); the rest are profile, catalog and entitlement reads.
+
+- WSGI: the DRF endpoints behind Django's WSGI handler, served by
+  ``wsgi_threads`` threads like one gthread worker.
+- ASGI: the ``/api/async/`` endpoints behind Django's ASGI handler on a
+  single event loop, like one uvicorn worker.
+
+Reports wall time and latency percentiles, measured from each request's
+arrival, for fast and slow requests.
+"""
+import asyncio
+import datetime
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from _django import setup
+
+setup()
+
+from django.core.asgi import get_asgi_application  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from django.db.backends.signals import connection_created  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from department.models import Department, DepartmentAdmin, DepartmentUser  # noqa: E402
+from service_package.models import ServiceAccess, ServicePackage, Subscription  # noqa: E402
+from user.models import User  # noqa: E402
+
+SLOW_TABLE = 'FROM "subscriptions"'
+
+
+def seed(rows):
+    root = User.objects.create_user('bench-root@example.com', 'Root', 'x', is_root_admin=True)
+    member = User.objects.create_user('bench-user@example.com', 'Member', 'x')
+    package = ServicePackage.objects.create(name='Bench', description='Benchmark', price='9.99', features={})
+    department = Department.objects.create(name='Bench Department')
+    DepartmentAdmin.objects.create(user=member, department=department)
+    DepartmentUser.objects.create(user=member, department=department)
+    today = datetime.date.today()
+    subscriptions = Subscription.objects.bulk_create(
+        Subscription(department=department, service_package=package, start_date=today,
+                     end_date=today + datetime.timedelta(days=30), status='active')
+        for _ in range(rows)
+    )
+    ServiceAccess.objects.create(user=member, service_package=package, subscription=subscriptions[0])
+    return root, member, package
+
+
+def slow_down(slow_ms):
+    """Delay every query reading the subscriptions table"""
+    def wrapper(execute, sql, params, many, context):
+        if SLOW_TABLE in sql:
+            time.sleep(slow_ms / 1000)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        # Thread-local connection wrappers outlive the connections they open
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+    connection_created.connect(install, weak=False)
+
+
+def plan(count, root, member, package, prefix):
+    fast = [
+        (f'{prefix}users/profile/', member),
+        (f'{prefix}services/packages/', member),
+        (f'{prefix}services/entitlements/{package.pk}/', member),
+    ]
+    requests = []
+    for i in range(count):
+        if i % 10 == 0:
+            requests.append(('slow', f'{prefix}services/subscriptions/', root))
+        else:
+            path, user = fast[i % len(fast)]
+            requests.append(('fast', path, user))
+    return [(kind, path, str(AccessToken.for_user(user))) for kind, path, user in requests]
+
+
+def wsgi_get(app, path, token):
+    path, _, query = path.partition('?')
+    environ = {}
+    setup_testing_defaults(environ)
+    environ.update(PATH_INFO=path, QUERY_STRING=query, HTTP_HOST='localhost',
+                   HTTP_AUTHORIZATION=f'Bearer {token}')
+    statuses = []
+    b''.join(app(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+    return int(statuses[0].split()[0])
+
+
+async def asgi_get(app, path, token):
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'authorization', f'Bearer {token}'.encode())],
+        'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+    }
+    sent = []
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client never disconnects
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent[0]['status']
+
+
+def run_wsgi(requests, rate, threads):
+    app = get_wsgi_application()
+    started = time.perf_counter()
+
+    def timed(arrival, kind, path, token):
+        status = wsgi_get(app, path, token)
+        return kind, status, time.perf_counter() - started - arrival
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = []
+        for index, request in enumerate(requests):
+            arrival = index / rate
+            time.sleep(max(0, started + arrival - time.perf_counter()))
+            futures.append(pool.submit(timed, arrival, *request))
+        results = [future.result() for future in futures]
+    return results, time.perf_counter() - started
+
+
+def run_asgi(requests, rate):
+    app = get_asgi_application()
+
+    async def serve():
+        started = time.perf_counter()
+
+        async def timed(arrival, kind, path, token):
+            await asyncio.sleep(max(0, started + arrival - time.perf_counter()))
+            status = await asgi_get(app, path, token)
+            return kind, status, time.perf_counter() - started - arrival
+
+        results = await asyncio.gather(*(
+            timed(index / rate, *request) for index, request in enumerate(requests)
+        ))
+        return results, time.perf_counter() - started
+    return asyncio.run(serve())
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def report(label, results, wall):
+    errors = [status for _, status, _ in results if status != 200]
+    print(f'{label}: {wall * 1000:8.0f} ms wall, {len(errors)} errors')
+    for kind in ('fast', 'slow'):
+        latencies = [elapsed * 1000 for k, _, elapsed in results if k == kind]
+        print(f'    {kind}: p50 {statistics.median(latencies):7.0f} ms  '
+              f'p95 {percentile(latencies, 95):7.0f} ms  max {max(latencies):7.0f} ms')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 100
+    slow_ms = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+    threads = int(sys.argv[4]) if len(sys.argv) > 4 else 4
+
+    root, member, package = seed(200)
+    slow_down(slow_ms)
+    print(f'{count} requests at {rate:g}/s, 1 in 10 slow ({slow_ms} ms query), '
+          f'WSGI with {threads} threads\n')
+
+    # Warm up both handlers and the catalog cache
+    run_wsgi(plan(10, root, member, package, '/api/'), rate, threads)
+    run_asgi(plan(10, root, member, package, '/api/async/'), rate)
+
+    report('WSGI', *run_wsgi(plan(count, root, member, package, '/api/'), rate, threads))
+    report('ASGI', *run_asgi(plan(count, root, member, package, '/api/async/'), rate))
+
+
+if __name__ == '__main__':
+    main()
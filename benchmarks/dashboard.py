@@ -0,0 +1,115 @@
+"""
+Latency of ``GET /api/dashboard/`` per role, cold and cached.
+
+    python benchmarks/dashboard.py [departments] [requests]
+
+Seeds ``departments`` departments, each with an admin, a member, an active
+subscription and a few transactions, half of them customers of one
+reseller. Then times ``requests`` dashboard loads per role through the
+test client: cold (response cache cleared before each load), with the
+sections run one after the other and concurrently, and cached.
+
+The 10M row target needs Postgres (``BENCH_USE_POSTGRES=true``, see
+_django.py) and a seeded scratch database; SQLite serializes the
+concurrent sections, so locally only the query counts and the cached
+path are representative.
+"""
+import datetime
+import sys
+import time
+
+from _django import setup
+
+setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from core import parallel  # noqa: E402
+from department.models import Department, DepartmentAdmin, DepartmentUser  # noqa: E402
+from reseller.models import Reseller, ResellerAdmin, ResellerCustomer  # noqa: E402
+from service_package.models import ServicePackage, Subscription, Transaction  # noqa: E402
+from user.models import User  # noqa: E402
+
+
+def seed(count):
+    package = ServicePackage.objects.create(name='Dashboard', description='', price='9.99')
+    reseller = Reseller.objects.create(name='Dashboard Reseller')
+    departments = Department.objects.bulk_create(Department(name=f'Department {i}') for i in range(count))
+    users = User.objects.bulk_create(
+        User(email=f'dash{i}@example.com', full_name=f'User {i}', password='!') for i in range(2 * count)
+    )
+    DepartmentAdmin.objects.bulk_create(
+        DepartmentAdmin(user=users[2 * i], department=department) for i, department in enumerate(departments)
+    )
+    DepartmentUser.objects.bulk_create(
+        DepartmentUser(user=users[2 * i + 1], department=department) for i, department in enumerate(departments)
+    )
+    ResellerCustomer.objects.bulk_create(
+        ResellerCustomer(reseller=reseller, department=department) for department in departments[::2]
+    )
+    today = datetime.date.today()
+    subscriptions = Subscription.objects.bulk_create(
+        Subscription(department=department, service_package=package, start_date=today,
+                     end_date=today + datetime.timedelta(days=i % 365), status='active')
+        for i, department in enumerate(departments)
+    )
+    now = timezone.now()
+    Transaction.objects.bulk_create(
+        Transaction(subscription=subscription, amount='9.99', payment_date=now - datetime.timedelta(hours=i + j),
+                    payment_method='card', transaction_id=f'dash-{i}-{j}', status='completed')
+        for i, subscription in enumerate(subscriptions) for j in range(3)
+    )
+
+    root = User.objects.create_user('dash-root@example.com', 'Root', 'unused', is_root_admin=True)
+    reseller_user = User.objects.create_user('dash-reseller@example.com', 'Reseller', 'unused',
+                                             is_reseller_admin=True)
+    ResellerAdmin.objects.create(user=reseller_user, reseller=reseller)
+    return {'root_admin': root, 'reseller_admin': reseller_user, 'department_admin': users[0]}
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(client, requests, clear):
+    timings = []
+    queries = 0
+    for _ in range(requests):
+        if clear:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get('/api/dashboard/')
+            timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.content
+        queries = len(captured)
+    return timings, queries
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    users = seed(count)
+    print(f'{count} departments, {requests} loads per row, database: {connection.vendor}\n')
+    print(f'{"role":<18}{"mode":<12}{"p50 ms":>9}{"p95 ms":>9}{"queries":>9}')
+    for role, user in users.items():
+        client = APIClient(HTTP_HOST='localhost')
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        for mode, workers, clear in (('serial', 0, True), ('parallel', 4, True), ('cached', 4, False)):
+            settings.PARALLEL = {'WORKERS': workers}
+            parallel._pid = None
+            client.get('/api/dashboard/')
+            timings, queries = run(client, requests, clear)
+            # Queries on the request thread; parallel sections run theirs on the pool
+            print(f'{role:<18}{mode:<12}{percentile(timings, 50):>9.1f}{percentile(timings, 95):>9.1f}{queries:>9}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Compare the ModelSerializer and values-based read paths for list endpoints.
+
+    python benchmarks/list_serializers.py [rows]
+
+Reports CPU time and peak traced memory for serializing a page of
+subscriptions and transactions, flat and with nested expansion.
+"""
+import datetime
+import sys
+import time
+import tracemalloc
+
+from _django import setup
+
+setup()
+
+from django.utils import timezone  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from department.models import Department  # noqa: E402
+from myproject.readers import _compile_reader  # noqa: E402
+from reseller.models import Reseller  # noqa: E402
+from service_package.models import ServicePackage, Subscription, Transaction  # noqa: E402
+from service_package.serializers import SubscriptionSerializer, TransactionSerializer  # noqa: E402
+
+
+def seed(rows):
+    reseller = Reseller.objects.create(name='Bench Reseller')
+    packages = [
+        ServicePackage.objects.create(name=f'Package {i}', description='Benchmark', price='19.99',
+                                      features={'seats': i})
+        for i in range(5)
+    ]
+    departments = Department.objects.bulk_create(
+        Department(name=f'Department {i}') for i in range(rows // 10 or 1)
+    )
+    today = datetime.date.today()
+    subscriptions = Subscription.objects.bulk_create(
+        Subscription(
+            department=departments[i % len(departments)],
+            service_package=packages[i % len(packages)],
+            start_date=today,
+            end_date=today + datetime.timedelta(days=30),
+            status='active',
+            reseller=reseller if i % 2 else None,
+        )
+        for i in range(rows)
+    )
+    Transaction.objects.bulk_create(
+        Transaction(subscription=subscription, amount='19.99', payment_date=timezone.now(),
+                    payment_method='card', transaction_id=f'bench-{i}', status='completed')
+        for i, subscription in enumerate(subscriptions)
+    )
+
+
+def measure(label, render):
+    # CPU and memory are measured in separate runs, tracemalloc skews timings
+    started = time.process_time()
+    payload = render()
+    elapsed = time.process_time() - started
+
+    tracemalloc.start()
+    render()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'  {label:<12} {elapsed * 1000:9.1f} ms CPU {peak / 1024 / 1024:9.1f} MiB peak')
+    return payload, elapsed, peak
+
+
+def compare(serializer_class, queryset, expand):
+    print(f'{serializer_class.__name__} expand={",".join(expand) or "-"}')
+    renderer = JSONRenderer()
+
+    serializer_payload, serializer_cpu, serializer_peak = measure('serializer', lambda: renderer.render(
+        serializer_class(serializer_class.setup_eager_loading(queryset, expand=expand),
+                         many=True, expand=expand).data
+    ))
+    reader = _compile_reader(serializer_class, tuple(expand), None)
+    values_payload, values_cpu, values_peak = measure('values', lambda: renderer.render(reader.read(queryset)))
+
+    assert serializer_payload == values_payload, 'values reader output differs from the serializer'
+    print(f'  speedup {serializer_cpu / values_cpu:.1f}x CPU, {serializer_peak / values_peak:.1f}x memory')
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    seed(rows)
+    subscriptions = Subscription.objects.order_by('id')
+    transactions = Transaction.objects.order_by('id')
+
+    compare(SubscriptionSerializer, subscriptions, [])
+    compare(SubscriptionSerializer, subscriptions, ['department', 'service_package', 'reseller'])
+    compare(TransactionSerializer, transactions, [])
+    compare(TransactionSerializer, transactions, ['subscription.department', 'subscription.service_package'])
+
+
+if __name__ == '__main__':
+    main()
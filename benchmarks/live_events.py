@@ -0,0 +1,164 @@
+"""
+Hold many idle live event streams in one worker and fan an event out.
+
+    python benchmarks/live_events.py [connections] [departments]
+
+Opens ``connections`` streams on ``/api/async/events/`` through Django's
+ASGI handler in one process, as department admins spread over
+``departments`` departments, and lets them sit idle for a few poll
+intervals. Then writes one subscription change per department and times
+how long each event takes to reach every stream following it.
+
+Reports the memory held per idle stream, the queries the hub ran while
+the streams were idle, and the fan-out latency percentiles.
+"""
+import asyncio
+import datetime
+import sys
+import time
+import tracemalloc
+
+from _django import setup
+
+setup()
+
+from asgiref.sync import sync_to_async  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.core.asgi import get_asgi_application  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.backends.signals import connection_created  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from department.models import Department, DepartmentAdmin  # noqa: E402
+from service_package.models import ServicePackage, Subscription  # noqa: E402
+from user.models import User  # noqa: E402
+
+queries = []
+
+
+def count_queries():
+    def wrapper(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+    connection_created.connect(install, weak=False)
+
+
+def seed(departments):
+    package = ServicePackage.objects.create(name='Live', description='', price='1.00')
+    today = datetime.date.today()
+    admins = []
+    for index in range(departments):
+        department = Department.objects.create(name=f'Live {index}')
+        admin = User.objects.create_user(f'live{index}@example.com', f'Live {index}', 'unused-password')
+        DepartmentAdmin.objects.create(user=admin, department=department)
+        Subscription.objects.create(department=department, service_package=package,
+                                    start_date=today, end_date=today, status='active')
+        admins.append((department.pk, str(AccessToken.for_user(admin))))
+    return admins
+
+
+class Stream:
+    def __init__(self, app, department_id, token):
+        self.department_id = department_id
+        self.received = {}
+        self.opened = asyncio.Event()
+        self.closed = asyncio.Event()
+        self.started = False
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': '/api/async/events/',
+            'raw_path': b'/api/async/events/', 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'localhost'), (b'authorization', f'Bearer {token}'.encode())],
+            'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+        }
+        self.task = asyncio.create_task(app(scope, self.receive, self.send))
+
+    async def receive(self):
+        if not self.started:
+            self.started = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.closed.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            if message['status'] != 200:
+                raise SystemExit(f"stream answered {message['status']}")
+            self.opened.set()
+        for line in message.get('body', b'').decode().splitlines():
+            if line.startswith('id: '):
+                self.received[int(line[4:])] = time.perf_counter()
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    departments = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    options = dict(getattr(settings, 'LIVE_EVENTS', {}), SETTLE_SECONDS=0)
+    settings.LIVE_EVENTS = options
+    interval = options.get('POLL_INTERVAL', 1)
+
+    admins = await sync_to_async(seed)(departments)
+    app = get_asgi_application()
+    count_queries()
+
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    streams = []
+    for index in range(count):
+        streams.append(Stream(app, *admins[index % departments]))
+        if index % 100 == 99:
+            await asyncio.sleep(0)
+    # Let every stream authenticate and go idle
+    started = time.perf_counter()
+    await asyncio.gather(*(stream.opened.wait() for stream in streams))
+    opened = time.perf_counter() - started
+    await asyncio.sleep(interval)
+    held = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(baseline, 'filename'))
+    tracemalloc.stop()
+
+    queries.clear()
+    idle = 5 * interval
+    await asyncio.sleep(idle)
+    idle_queries = len(queries)
+
+    def write():
+        changed = {}
+        for subscription in Subscription.objects.all():
+            subscription.status = 'cancelled'
+            subscription.save()
+            changed[subscription.department_id] = time.perf_counter()
+        return changed
+    changed = await sync_to_async(write)()
+    await asyncio.sleep(3 * interval)
+
+    latencies = []
+    missing = 0
+    for stream in streams:
+        if not stream.received:
+            missing += 1
+            continue
+        latencies += [(arrived - changed[stream.department_id]) * 1000 for arrived in stream.received.values()]
+    for stream in streams:
+        stream.closed.set()
+    await asyncio.gather(*(stream.task for stream in streams), return_exceptions=True)
+
+    print(f'{count} streams over {departments} departments, {interval:g} s poll interval, '
+          f'database: {connection.vendor}\n')
+    print(f'opening:  {opened:.1f} s for all streams to authenticate')
+    print(f'memory:   {held / count / 1024:.1f} KiB per idle stream ({held / 1024 / 1024:.1f} MiB total)')
+    print(f'idle:     {idle_queries} queries in {idle:g} s')
+    print(f'fan-out:  p50 {percentile(latencies, 50):.0f} ms  p95 {percentile(latencies, 95):.0f} ms  '
+          f'max {max(latencies):.0f} ms  ({missing} streams got nothing)')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+"""
+Check that read endpoints stay responsive during a login storm.
+
+    python benchmarks/login_storm.py [seconds] [login_rate] [read_rate] [threads]
+
+For ``seconds``, logins arrive at ``login_rate`` per second alongside
+profile reads at ``read_rate`` per second, all served by Django's WSGI
+handler on ``threads`` threads like one gthread worker. Runs twice:
+
+- inline: every login hashes on its request thread, as before
+- bounded: hashing on the pool from user/hashing.py, with the settings'
+  ``PASSWORD_HASHING`` limits
+
+Reports read latency percentiles, measured from each request's arrival,
+and the status codes the logins got.
+"""
+import collections
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+
+from _django import setup
+
+setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from user import hashing  # noqa: E402
+from user.models import User  # noqa: E402
+
+PASSWORD = 'storm-password-1'
+
+
+def wsgi_call(app, method, path, token=None, body=None):
+    environ = {}
+    setup_testing_defaults(environ)
+    payload = json.dumps(body).encode() if body is not None else b''
+    environ.update(REQUEST_METHOD=method, PATH_INFO=path, HTTP_HOST='localhost',
+                   CONTENT_TYPE='application/json', CONTENT_LENGTH=str(len(payload)),
+                   **{'wsgi.input': BytesIO(payload)})
+    if token:
+        environ['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    statuses = []
+    b''.join(app(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+    return int(statuses[0].split()[0])
+
+
+def plan(seconds, login_rate, read_rate):
+    arrivals = [(index / login_rate, 'login') for index in range(int(seconds * login_rate))]
+    arrivals += [(index / read_rate, 'read') for index in range(int(seconds * read_rate))]
+    return sorted(arrivals)
+
+
+def run(app, arrivals, threads, token, email):
+    started = time.perf_counter()
+
+    def timed(arrival, kind):
+        if kind == 'login':
+            status = wsgi_call(app, 'POST', '/api/users/auth/login/', body={'email': email, 'password': PASSWORD})
+        else:
+            status = wsgi_call(app, 'GET', '/api/users/profile/', token)
+        return kind, status, time.perf_counter() - started - arrival
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = []
+        for arrival, kind in arrivals:
+            time.sleep(max(0, started + arrival - time.perf_counter()))
+            futures.append(pool.submit(timed, arrival, kind))
+        return [future.result() for future in futures]
+
+
+def configure(options):
+    settings.PASSWORD_HASHING = options
+    # Rebuild the pool with the new limits
+    hashing._pid = None
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def report(label, results):
+    reads = [elapsed * 1000 for kind, _, elapsed in results if kind == 'read']
+    logins = collections.Counter(status for kind, status, _ in results if kind == 'login')
+    read_errors = sum(1 for kind, status, _ in results if kind == 'read' and status != 200)
+    print(f'{label}:')
+    print(f'    reads:  p50 {statistics.median(reads):7.0f} ms  p95 {percentile(reads, 95):7.0f} ms  '
+          f'max {max(reads):7.0f} ms  ({read_errors} errors)')
+    print('    logins: ' + ', '.join(f'{count} x {status}' for status, count in sorted(logins.items())))
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    login_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    read_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 20
+    threads = int(sys.argv[4]) if len(sys.argv) > 4 else 8
+
+    bounded = dict(settings.PASSWORD_HASHING, MAX_PENDING=max(1, threads // 2))
+    user = User.objects.create_user('storm@example.com', 'Storm', PASSWORD)
+    token = str(AccessToken.for_user(user))
+    app = get_wsgi_application()
+    arrivals = plan(seconds, login_rate, read_rate)
+
+    started = time.perf_counter()
+    hashing.hash_password(PASSWORD)
+    hash_ms = (time.perf_counter() - started) * 1000
+    print(f'{seconds:g}s of {login_rate:g} logins/s and {read_rate:g} reads/s on {threads} threads, '
+          f'one hash takes {hash_ms:.0f} ms\n')
+
+    configure({'WORKERS': 0})
+    report('inline', run(app, arrivals, threads, token, user.email))
+    configure(bounded)
+    report(f"bounded ({bounded['WORKERS']} workers, {bounded['MAX_PENDING']} pending, "
+           f"{bounded['WAIT']:g}s wait)", run(app, arrivals, threads, token, user.email))
+
+
+if __name__ == '__main__':
+    main()
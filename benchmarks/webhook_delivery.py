@@ -0,0 +1,115 @@
+"""
+Measure outbox webhook delivery against a local HTTP stand-in.
+
+    python benchmarks/webhook_delivery.py [endpoints] [events] [latency_ms]
+
+Starts a threaded HTTP server that answers every POST with 204 after
+``latency_ms``, points ``endpoints`` webhook endpoints at it, writes
+``events`` outbox events through real subscription saves, and drains the
+outbox with ``deliver_once``. Runs twice:
+
+- serial: ``CONCURRENCY`` 1, one endpoint at a time
+- concurrent: the settings' ``WEBHOOKS['CONCURRENCY']``
+
+Reports the rounds, the wall time and the requests the stand-in received,
+and checks every endpoint got every event exactly once.
+"""
+import collections
+import datetime
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from _django import setup
+
+setup()
+
+from django.conf import settings  # noqa: E402
+
+from core.models import OutboxEvent, WebhookEndpoint  # noqa: E402
+from core.webhooks import deliver_once  # noqa: E402
+from department.models import Department  # noqa: E402
+from service_package.models import ServicePackage, Subscription  # noqa: E402
+
+received = collections.defaultdict(list)
+received_lock = threading.Lock()
+
+
+def stand_in(latency):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            time.sleep(latency)
+            with received_lock:
+                received[self.path].extend(event['id'] for event in body['events'])
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        # The default listen backlog of 5 resets concurrent connections
+        request_queue_size = 128
+
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def seed(events):
+    department = Department.objects.create(name='Webhook benchmark')
+    package = ServicePackage.objects.create(name='Benchmark', description='', price='1.00')
+    today = datetime.date.today()
+    subscription = Subscription.objects.create(department=department, service_package=package,
+                                               start_date=today, end_date=today, status='active')
+    for index in range(events - 1):
+        subscription.status = 'active' if index % 2 else 'pending'
+        subscription.save()
+
+
+def run(label, server, endpoints, events, options):
+    settings.WEBHOOKS = options
+    received.clear()
+    OutboxEvent.objects.all().delete()
+    WebhookEndpoint.objects.all().delete()
+    for index in range(endpoints):
+        WebhookEndpoint.objects.create(url=f'http://127.0.0.1:{server.server_port}/hook/{index}', secret='benchmark')
+    seed(events)
+    expected = list(OutboxEvent.objects.order_by('id').values_list('id', flat=True))
+
+    started = time.perf_counter()
+    rounds = 0
+    while True:
+        delivered, failed, more = deliver_once()
+        rounds += 1
+        if failed:
+            raise SystemExit(f'{failed} deliveries failed against the stand-in')
+        if not more:
+            break
+    elapsed = time.perf_counter() - started
+
+    complete = all(received[f'/hook/{index}'] == expected for index in range(endpoints))
+    requests = endpoints * -(-len(expected) // options['BATCH_SIZE'])
+    print(f'{label:<12} {rounds:4d} rounds  {elapsed:7.2f} s  {requests} requests  '
+          f'{"all events delivered once" if complete else "MISSING OR DUPLICATE EVENTS"}')
+
+
+def main():
+    endpoints = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    latency = (float(sys.argv[3]) if len(sys.argv) > 3 else 50) / 1000
+
+    server = stand_in(latency)
+    options = dict(settings.WEBHOOKS, SETTLE_SECONDS=0)
+    print(f'{endpoints} endpoints, {events} events, {latency * 1000:g} ms per response, '
+          f'batches of {options["BATCH_SIZE"]}\n')
+    run('serial', server, endpoints, events, dict(options, CONCURRENCY=1))
+    run('concurrent', server, endpoints, events, options)
+
+
+if __name__ == '__main__':
+    main()
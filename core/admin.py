@@ -0,0 +1,24 @@
+from django.contrib import admin
+from .admin_tools import ScalableModelAdmin
+from .models import Job, ScheduledRun, WebhookEndpoint
+
+@admin.register(WebhookEndpoint)
+class WebhookEndpointAdmin(ScalableModelAdmin):
+    list_display = ('id', 'url', 'reseller', 'is_active', 'last_event_id', 'consecutive_failures', 'last_delivered_at')
+    list_filter = ('is_active',)
+    search_fields = ('url',)
+    readonly_fields = ('last_event_id', 'last_delivered_at', 'consecutive_failures', 'next_attempt_at', 'last_error')
+
+@admin.register(Job)
+class JobAdmin(ScalableModelAdmin):
+    list_display = ('id', 'task', 'queue', 'priority', 'status', 'attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'queue')
+    search_fields = ('task',)
+    readonly_fields = ('attempts', 'locked_until', 'locked_by', 'last_error', 'started_at', 'finished_at')
+
+@admin.register(ScheduledRun)
+class ScheduledRunAdmin(ScalableModelAdmin):
+    list_display = ('id', 'name', 'scheduled_for', 'status', 'enqueued_at', 'duration', 'job')
+    list_filter = ('status', 'name')
+    raw_id_fields = ('job',)
+    readonly_fields = ('enqueued_at', 'started_at', 'finished_at')
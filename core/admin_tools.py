@@ -0,0 +1,132 @@
+"""
+Admin building blocks for tables with millions of rows.
+
+``ScalableModelAdmin`` is the base for the project's model admins:
+
+- Changelists count with ``EstimatedCountPaginator``: an exact ``COUNT(*)``
+  capped at ``ADMIN['EXACT_COUNT_LIMIT']`` rows, and past that the
+  planner's estimate, ``pg_class.reltuples`` for the whole table or the
+  ``EXPLAIN`` row estimate for a filtered list. The second, unfiltered
+  count Django shows next to search results is turned off.
+- ``list_select_related`` defaults to the foreign keys in ``list_display``
+  instead of Django's ``select_related()`` over every non-null relation.
+  Admins whose ``__str__`` (rendered on every row) or whose related
+  models' ``__str__`` reach further list the paths themselves.
+- Foreign keys are edited with autocomplete widgets when the related
+  model's admin has ``search_fields``, and raw ID inputs otherwise, never
+  with a ``<select>`` holding the whole related table. ``raw_id_fields``
+  and ``autocomplete_fields`` still take precedence.
+- Lists without an ordering default to newest first (``-pk``), which gives the
+  autocomplete views a stable order.
+- Search goes through the trigram indexes, see core/search.py.
+
+On databases other than Postgres counts above the cap are exact.
+"""
+import json
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin import widgets
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+from .search import TrigramSearchAdminMixin
+
+
+def get_admin_settings():
+    options = {
+        'EXACT_COUNT_LIMIT': 10000,
+    }
+    options.update(getattr(settings, 'ADMIN', {}))
+    return options
+
+
+def estimate_count(queryset):
+    """The planner's row estimate for ``queryset``, ``None`` off Postgres"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)',
+                           [connection.ops.quote_name(queryset.model._meta.db_table)])
+            row = cursor.fetchone()
+            # -1 until the table is first analyzed
+            return int(row[0]) if row and row[0] >= 0 else None
+        sql, params = queryset.order_by().query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator counting exactly up to a cap and estimating past it"""
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        limit = get_admin_settings()['EXACT_COUNT_LIMIT']
+        count = self.object_list.order_by()[:limit + 1].count()
+        if count <= limit:
+            return count
+        estimate = estimate_count(self.object_list)
+        if estimate is None:
+            return self.object_list.count()
+        return max(estimate, count)
+
+
+class ScalableModelAdmin(TrigramSearchAdminMixin, admin.ModelAdmin):
+    """ModelAdmin for large tables, see the module docstring"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_list_select_related(self, request):
+        if self.list_select_related is not False:
+            return self.list_select_related
+        related = []
+        for name in self.get_list_display(request):
+            if not isinstance(name, str):
+                continue
+            try:
+                field = self.opts.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if (field.many_to_one or field.one_to_one) and field.concrete:
+                related.append(name)
+        return related
+
+    def _is_searchable(self, db_field):
+        related_admin = self.admin_site._registry.get(db_field.remote_field.model)
+        return related_admin is not None and bool(related_admin.search_fields)
+
+    def get_ordering(self, request):
+        return self.ordering or self.opts.ordering or ('-pk',)
+
+    def get_autocomplete_fields(self, request):
+        if self.autocomplete_fields:
+            return self.autocomplete_fields
+        return [
+            field.name for field in self.opts.get_fields()
+            if (field.many_to_one or field.many_to_many) and field.concrete and field.editable
+            and field.name not in self.raw_id_fields and self._is_searchable(field)
+        ]
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if 'widget' not in kwargs and db_field.name not in self.radio_fields \
+                and db_field.name not in self.get_autocomplete_fields(request):
+            kwargs['widget'] = widgets.ForeignKeyRawIdWidget(db_field.remote_field, self.admin_site,
+                                                             using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        if 'widget' not in kwargs and db_field.name not in self.get_autocomplete_fields(request) \
+                and db_field.name not in self.filter_vertical + self.filter_horizontal:
+            kwargs['widget'] = widgets.ManyToManyRawIdWidget(db_field.remote_field, self.admin_site,
+                                                             using=kwargs.get('using'))
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
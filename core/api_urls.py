@@ -0,0 +1,6 @@
+from django.urls import path
+from . import api_views
+
+urlpatterns = [
+    path('stats/', api_views.CacheStatsAPIView.as_view(), name='cache_stats_api'),
+]
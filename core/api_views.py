@@ -0,0 +1,76 @@
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.views import APIView
+from .db_pools import get_pool_stats
+from .jobs import get_job_stats
+from .response_cache import get_stats
+from .scheduler import get_schedule_status
+from .webhooks import get_lag
+
+class CacheStatsAPIView(APIView):
+    """
+    API endpoint reporting response cache hit ratios per view
+    (counters are kept per worker process)
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        if not request.user.is_root_admin:
+            return Response({"error": "Only root administrators can view cache statistics"}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        return Response({"views": get_stats()})
+
+
+class DatabasePoolStatsAPIView(APIView):
+    """
+    API endpoint reporting database connection pool metrics
+    (counters are kept per worker process)
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        if not request.user.is_root_admin:
+            return Response({"error": "Only root administrators can view pool statistics"}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        return Response({"pools": get_pool_stats()})
+
+
+class WebhookLagAPIView(APIView):
+    """
+    API endpoint reporting the undelivered outbox events per webhook endpoint
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        if not request.user.is_root_admin:
+            return Response({"error": "Only root administrators can view webhook delivery"}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        return Response({"endpoints": get_lag()})
+
+
+class JobStatsAPIView(APIView):
+    """
+    API endpoint reporting background job queue depth and latency per queue
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        if not request.user.is_root_admin:
+            return Response({"error": "Only root administrators can view job statistics"}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        return Response({"queues": get_job_stats()})
+
+
+class ScheduleAPIView(APIView):
+    """
+    API endpoint reporting the periodic jobs, their next and last run and
+    how long they take
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        if not request.user.is_root_admin:
+            return Response({"error": "Only root administrators can view the schedule"}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        return Response({"schedule": get_schedule_status()})
@@ -0,0 +1,22 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "core"
+    
+    def ready(self):
+        """Connect cache invalidation, tombstone and outbox signals when the app is ready"""
+        from django.core.signals import request_started
+        from .bus import start_listener
+        from .db_router import check_pin_cache
+        from .dependencies import connect_dependencies
+        from .outbox import connect_outbox
+        from .sync import connect_tombstones
+        
+        check_pin_cache()
+        connect_dependencies()
+        connect_tombstones()
+        connect_outbox()
+        # Each worker process starts its invalidation listener on its first request
+        request_started.connect(start_listener, dispatch_uid='core.bus.start_listener')
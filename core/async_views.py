@@ -0,0 +1,65 @@
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from department.models import DepartmentAdmin
+from myproject.async_api import api_response, async_api_view
+from reseller.models import ResellerAdmin, ResellerCustomer
+from .live import Scope, stream
+
+async def get_scope(user):
+    """The events an admin may follow, None for users who administer nothing"""
+    if user.is_root_admin:
+        return Scope(True, frozenset(), None)
+    department_ids = {
+        department_id async for department_id in
+        DepartmentAdmin.objects.filter(user=user).values_list('department_id', flat=True)
+    }
+    reseller_id = None
+    if user.is_reseller_admin:
+        reseller_id = await ResellerAdmin.objects.filter(user=user).values_list('reseller_id', flat=True).afirst()
+        if reseller_id is not None:
+            department_ids |= {
+                department_id async for department_id in
+                ResellerCustomer.objects.filter(reseller_id=reseller_id).values_list('department_id', flat=True)
+            }
+    if not department_ids and reseller_id is None:
+        return None
+    return Scope(False, frozenset(department_ids), reseller_id)
+
+@async_api_view(query_token=True)
+async def event_stream(request):
+    """
+    Server-Sent Events stream of the subscription, service access and
+    membership changes in the caller's scope (see core/live.py)
+    """
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the stream would hold a worker thread for as long as it's open
+        return api_response({"error": "The event stream is only served over ASGI"},
+                            status=status.HTTP_501_NOT_IMPLEMENTED)
+    
+    scope = await get_scope(request.user)
+    if scope is None:
+        return api_response({"error": "Only department, reseller and root administrators can follow events"},
+                            status=status.HTTP_403_FORBIDDEN)
+    
+    department_id = request.GET.get('department')
+    if department_id is not None:
+        try:
+            department_id = int(department_id)
+        except ValueError:
+            return api_response({"error": "department must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        if not scope.everything and department_id not in scope.department_ids:
+            return api_response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
+        scope = Scope(False, frozenset([department_id]), None)
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    
+    response = StreamingHttpResponse(stream(scope, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
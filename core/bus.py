@@ -0,0 +1,216 @@
+"""
+Cross-worker cache invalidation over Postgres LISTEN/NOTIFY.
+
+Caches such as the package catalog and the response cache keep their
+version keys in the default cache, which is process-local unless a shared
+backend is configured. When a model signal bumps a version in one worker,
+``publish`` sends a compact NOTIFY message and every other worker's
+listener thread evicts the same keys locally.
+
+Messages are JSON ``{"o": <origin>, "k": <kind>, "v": [...]}``. The
+built-in ``cache.delete`` kind deletes keys from the default cache; other
+in-process caches register their own kinds with ``subscribe``.
+
+The listener starts on the first request of each worker process (see
+``CoreConfig.ready``), so management commands never open a LISTEN
+connection. On databases other than Postgres the bus is a no-op.
+"""
+import json
+import logging
+import os
+import select
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD = 7900
+
+ORIGIN = uuid.uuid4().hex[:12]
+
+_handlers = {}
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def get_bus_settings():
+    options = {
+        'ENABLED': True,
+        'CHANNEL': 'cache_invalidation',
+        'DATABASE': DEFAULT_DB_ALIAS,
+        'RECONNECT_DELAY': 5,
+    }
+    options.update(getattr(settings, 'CACHE_INVALIDATION_BUS', {}))
+    return options
+
+
+def is_enabled():
+    options = get_bus_settings()
+    return options['ENABLED'] and connections[options['DATABASE']].vendor == 'postgresql'
+
+
+def subscribe(kind, handler):
+    """Register ``handler(values)`` for messages of ``kind`` from other workers"""
+    _handlers[kind] = handler
+
+
+def _delete_cache_keys(keys):
+    # A two-tier cache only needs its process-local tier evicted, the
+    # shared tier was already updated by the publishing worker
+    evict_local = getattr(caches[DEFAULT_CACHE_ALIAS], 'evict_local', None)
+    if evict_local is not None:
+        evict_local(keys)
+    else:
+        cache.delete_many(keys)
+
+
+subscribe('cache.delete', _delete_cache_keys)
+
+
+def _encode(kind, values):
+    """Split ``values`` into as few payloads as fit in a NOTIFY message"""
+    def dump(chunk):
+        return json.dumps({'o': ORIGIN, 'k': kind, 'v': chunk}, separators=(',', ':'))
+
+    payloads, chunk = [], []
+    size = len(dump([]).encode())
+    for value in values:
+        value_size = len(json.dumps(value).encode()) + 1
+        if chunk and size + value_size > MAX_PAYLOAD:
+            payloads.append(dump(chunk))
+            chunk, size = [], len(dump([]).encode())
+        chunk.append(value)
+        size += value_size
+    if chunk:
+        payloads.append(dump(chunk))
+    return payloads
+
+
+def _send(messages):
+    options = get_bus_settings()
+    payloads = []
+    for kind, values in messages.items():
+        payloads.extend(_encode(kind, values))
+    with connections[options['DATABASE']].cursor() as cursor:
+        for payload in payloads:
+            cursor.execute('SELECT pg_notify(%s, %s)', [options['CHANNEL'], payload])
+
+
+def publish(kind, values):
+    """
+    Tell the other workers to run the ``kind`` handler for ``values``.
+
+    Inside a transaction the message is sent after commit, so a rolled back
+    write never invalidates anything. Callers batch their values into one
+    call to keep the number of messages down.
+    """
+    if not values or not is_enabled():
+        return
+    values = list(values)
+    transaction.on_commit(
+        lambda: _send({kind: values}),
+        using=get_bus_settings()['DATABASE'],
+    )
+
+
+def publish_cache_delete(keys):
+    publish('cache.delete', keys)
+
+
+def dispatch(payload):
+    """Apply a message received from another worker"""
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        logger.warning("Ignoring malformed invalidation message: %r", payload)
+        return
+    if message.get('o') == ORIGIN:
+        return
+    handler = _handlers.get(message.get('k'))
+    if handler is None:
+        return
+    try:
+        handler(message.get('v') or [])
+    except Exception:
+        logger.exception("Invalidation handler for %s failed", message.get('k'))
+
+
+class Listener(threading.Thread):
+    """Daemon thread holding a LISTEN connection for one worker process"""
+
+    def __init__(self):
+        super().__init__(name='cache-invalidation-listener', daemon=True)
+        self.options = get_bus_settings()
+        self.stopped = threading.Event()
+
+    def connect(self):
+        wrapper = connections[self.options['DATABASE']]
+        # A dedicated connection, outside Django's pool: it stays in LISTEN
+        # for the life of the process
+        connection = wrapper.Database.connect(**wrapper.get_connection_params())
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute('LISTEN "{}"'.format(self.options['CHANNEL'].replace('"', '')))
+        return connection
+
+    def listen(self, connection):
+        while not self.stopped.is_set():
+            if hasattr(connection, 'poll'):
+                # psycopg2
+                if select.select([connection], [], [], 5) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    dispatch(connection.notifies.pop(0).payload)
+            else:
+                # psycopg 3
+                for notify in connection.notifies(timeout=5):
+                    dispatch(notify.payload)
+
+    def run(self):
+        while not self.stopped.is_set():
+            connection = None
+            try:
+                connection = self.connect()
+                # Anything published while we weren't listening is lost, so
+                # a process-local cache starts over
+                backend = caches[DEFAULT_CACHE_ALIAS]
+                if isinstance(backend, LocMemCache):
+                    backend.clear()
+                elif isinstance(getattr(backend, 'l1', None), LocMemCache):
+                    backend.l1.clear()
+                self.listen(connection)
+            except Exception:
+                logger.exception("Cache invalidation listener disconnected, reconnecting")
+                self.stopped.wait(self.options['RECONNECT_DELAY'])
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+    def stop(self):
+        self.stopped.set()
+
+
+def start_listener(**kwargs):
+    """Start this process's listener once, restarting it after a fork"""
+    global _listener
+    if _listener is not None and _listener.pid == os.getpid():
+        return
+    if not is_enabled():
+        return
+    with _listener_lock:
+        if _listener is not None and _listener.pid == os.getpid():
+            return
+        listener = Listener()
+        listener.pid = os.getpid()
+        listener.start()
+        _listener = listener
@@ -0,0 +1,332 @@
+"""
+Cache backends needing nothing beyond the Postgres database we already run.
+
+``PostgresCache`` keeps entries in an UNLOGGED table (no WAL, so writes are
+cheap and the table is simply emptied after a crash) with an index on
+``expires_at``. ``get_many``/``set_many``/``delete_many`` are single
+statements, and expired rows are removed by a background thread in small
+batches instead of culling on write.
+
+``TwoTierCache`` puts a short-lived process-local L1 in front of a shared
+L2. Writes go to both tiers; the invalidation bus (core.bus) evicts L1
+entries in the other workers.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.TwoTierCache',
+            'OPTIONS': {'L1': 'local', 'L2': 'shared'},
+        },
+        'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'TIMEOUT': 5},
+        'shared': {'BACKEND': 'core.cache_backends.PostgresCache', 'LOCATION': 'core_cache_entries'},
+    }
+"""
+import logging
+import os
+import pickle
+import threading
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+CACHE_TABLE = 'core_cache_entries'
+
+
+def create_cache_table_sql(table=CACHE_TABLE):
+    return [
+        f'CREATE UNLOGGED TABLE IF NOT EXISTS "{table}" ('
+        f'  cache_key varchar(255) PRIMARY KEY,'
+        f'  value bytea NOT NULL,'
+        f'  expires_at timestamp with time zone NULL'
+        f')',
+        f'CREATE INDEX IF NOT EXISTS "{table}_expires_at" ON "{table}" (expires_at) '
+        f'WHERE expires_at IS NOT NULL',
+    ]
+
+
+class PostgresCache(BaseCache):
+    """Shared cache stored in an UNLOGGED Postgres table"""
+
+    def __init__(self, table, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._table = table or CACHE_TABLE
+        self._db = options.get('DATABASE', DEFAULT_DB_ALIAS)
+        self._expiry_interval = options.get('EXPIRY_INTERVAL', 60)
+        self._expiry_batch = options.get('EXPIRY_BATCH', 1000)
+        self._expiry_thread = None
+        self._expiry_lock = threading.Lock()
+
+    # Helpers
+
+    def _cursor(self):
+        self._start_expiry()
+        return connections[self._db].cursor()
+
+    def _expires_at(self, timeout):
+        expiry = self.get_backend_timeout(timeout)
+        if expiry is None:
+            return None
+        return datetime.fromtimestamp(expiry, tz=dt_timezone.utc)
+
+    def _encode(self, value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _decode(self, value):
+        return pickle.loads(bytes(value))
+
+    # Reads
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._cursor() as cursor:
+            cursor.execute(
+                f'SELECT value FROM "{self._table}" '
+                f'WHERE cache_key = %s AND (expires_at IS NULL OR expires_at > now())',
+                [key],
+            )
+            row = cursor.fetchone()
+        return default if row is None else self._decode(row[0])
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not key_map:
+            return {}
+        with self._cursor() as cursor:
+            cursor.execute(
+                f'SELECT cache_key, value FROM "{self._table}" '
+                f'WHERE cache_key = ANY(%s) AND (expires_at IS NULL OR expires_at > now())',
+                [list(key_map)],
+            )
+            rows = cursor.fetchall()
+        return {key_map[cache_key]: self._decode(value) for cache_key, value in rows}
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._cursor() as cursor:
+            cursor.execute(
+                f'SELECT 1 FROM "{self._table}" '
+                f'WHERE cache_key = %s AND (expires_at IS NULL OR expires_at > now())',
+                [key],
+            )
+            return cursor.fetchone() is not None
+
+    # Writes
+
+    def _upsert(self, rows, only_if_missing=False):
+        placeholders = ', '.join(['(%s, %s, %s)'] * len(rows))
+        params = [value for row in rows for value in row]
+        sql = (
+            f'INSERT INTO "{self._table}" AS entry (cache_key, value, expires_at) VALUES {placeholders} '
+            f'ON CONFLICT (cache_key) DO UPDATE SET value = EXCLUDED.value, expires_at = EXCLUDED.expires_at'
+        )
+        if only_if_missing:
+            # An expired row counts as missing
+            sql += ' WHERE entry.expires_at IS NOT NULL AND entry.expires_at <= now()'
+        with self._cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._upsert([(key, self._encode(value), self._expires_at(timeout))])
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._upsert([(key, self._encode(value), self._expires_at(timeout))], only_if_missing=True) > 0
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if not data:
+            return []
+        expires_at = self._expires_at(timeout)
+        rows = [
+            (self.make_and_validate_key(key, version=version), self._encode(value), expires_at)
+            for key, value in data.items()
+        ]
+        self._upsert(rows)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._cursor() as cursor:
+            cursor.execute(
+                f'UPDATE "{self._table}" SET expires_at = %s '
+                f'WHERE cache_key = %s AND (expires_at IS NULL OR expires_at > now())',
+                [self._expires_at(timeout), key],
+            )
+            return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with transaction.atomic(using=self._db):
+            with self._cursor() as cursor:
+                cursor.execute(
+                    f'SELECT value FROM "{self._table}" '
+                    f'WHERE cache_key = %s AND (expires_at IS NULL OR expires_at > now()) FOR UPDATE',
+                    [key],
+                )
+                row = cursor.fetchone()
+                if row is None:
+                    raise ValueError("Key '%s' not found" % key)
+                value = self._decode(row[0]) + delta
+                cursor.execute(
+                    f'UPDATE "{self._table}" SET value = %s WHERE cache_key = %s',
+                    [self._encode(value), key],
+                )
+        return value
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{self._table}" WHERE cache_key = %s', [key])
+            return cursor.rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if not keys:
+            return
+        with self._cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{self._table}" WHERE cache_key = ANY(%s)', [keys])
+
+    def clear(self):
+        with self._cursor() as cursor:
+            cursor.execute(f'TRUNCATE "{self._table}"')
+
+    # Expiry
+
+    def expire(self, limit=None):
+        """Delete up to ``limit`` expired entries, returning how many went"""
+        with connections[self._db].cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM "{self._table}" WHERE cache_key IN ('
+                f'  SELECT cache_key FROM "{self._table}"'
+                f'  WHERE expires_at IS NOT NULL AND expires_at <= now()'
+                f'  LIMIT %s FOR UPDATE SKIP LOCKED'
+                f')',
+                [limit or self._expiry_batch],
+            )
+            return cursor.rowcount
+
+    def _run_expiry(self, stopped):
+        while not stopped.wait(self._expiry_interval):
+            try:
+                # Keep going while full batches come back, one short
+                # statement at a time
+                while self.expire() >= self._expiry_batch and not stopped.is_set():
+                    pass
+            except Exception:
+                logger.exception("Cache expiry batch failed")
+            finally:
+                connections[self._db].close()
+
+    def _start_expiry(self):
+        thread = self._expiry_thread
+        if not self._expiry_interval or (thread is not None and thread.pid == os.getpid()):
+            return
+        with self._expiry_lock:
+            thread = self._expiry_thread
+            if thread is not None and thread.pid == os.getpid():
+                return
+            stopped = threading.Event()
+            thread = threading.Thread(
+                target=self._run_expiry, args=(stopped,), name='cache-expiry', daemon=True
+            )
+            thread.pid = os.getpid()
+            thread.start()
+            self._expiry_thread = thread
+
+
+class TwoTierCache(BaseCache):
+    """
+    Process-local L1 in front of a shared L2. L1 entries live for at most
+    the L1 cache's own TIMEOUT, bounding staleness when the bus is off.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l1_alias = options.get('L1', 'local')
+        self._l2_alias = options.get('L2', 'shared')
+
+    @property
+    def l1(self):
+        return caches[self._l1_alias]
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def _l1_timeout(self, timeout):
+        l1_timeout = self.l1.default_timeout
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return l1_timeout
+        return min(timeout, l1_timeout)
+
+    def get(self, key, default=None, version=None):
+        sentinel = object()
+        value = self.l1.get(key, sentinel, version=version)
+        if value is not sentinel:
+            return value
+        value = self.l2.get(key, sentinel, version=version)
+        if value is sentinel:
+            return default
+        self.l1.set(key, value, self.l1.default_timeout, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = self.l1.get_many(keys, version=version)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            shared = self.l2.get_many(missing, version=version)
+            if shared:
+                self.l1.set_many(shared, self.l1.default_timeout, version=version)
+            found.update(shared)
+        return found
+
+    def has_key(self, key, version=None):
+        return self.l1.has_key(key, version=version) or self.l2.has_key(key, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version=version)
+        self.l1.set(key, value, self._l1_timeout(timeout), version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.l2.add(key, value, timeout, version=version)
+        if added:
+            self.l1.set(key, value, self._l1_timeout(timeout), version=version)
+        else:
+            self.l1.delete(key, version=version)
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, timeout, version=version)
+        self.l1.set_many(data, self._l1_timeout(timeout), version=version)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l1.delete(key, version=version)
+        return self.l2.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.l2.incr(key, delta, version=version)
+        self.l1.set(key, value, self.l1.default_timeout, version=version)
+        return value
+
+    def delete(self, key, version=None):
+        self.l1.delete(key, version=version)
+        return self.l2.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        self.l1.delete_many(keys, version=version)
+        self.l2.delete_many(keys, version=version)
+
+    def clear(self):
+        self.l1.clear()
+        self.l2.clear()
+
+    def evict_local(self, keys):
+        """Drop ``keys`` from L1 only, used by the invalidation bus"""
+        self.l1.delete_many(keys)
@@ -0,0 +1,209 @@
+"""
+Denormalized counter columns maintained by database triggers.
+
+Each ``Counter`` keeps ``target.column`` equal to the number of rows in
+``source`` pointing at the target through ``fk`` (and matching
+``condition``, a ``(column, value)`` pair), and bumps the target's
+``touch`` timestamp so delta sync (core/sync.py) reports the new count.
+Triggers update the counter
+in the same transaction as the change, so every write path is covered:
+``save()``, ``bulk_create`` (including rows skipped by
+``ignore_conflicts``), ``QuerySet.update()``/``delete()``, cascades and
+raw SQL.
+
+- Postgres: statement-level triggers over transition tables, one
+  ``UPDATE ... FROM (SELECT fk, count(*) ... GROUP BY fk)`` per statement,
+  so a bulk insert of 5,000 memberships touches its department row once.
+- SQLite (local development): row-level triggers. SQLite drops them when
+  a migration rebuilds the source table; such migrations must call
+  ``install_triggers`` again.
+
+Other databases get no triggers; ``manage.py repair_counters`` recomputes
+the columns from scratch everywhere.
+"""
+from collections import namedtuple
+
+from django.db import connections
+from django.utils import timezone
+
+Counter = namedtuple('Counter', 'target target_pk column source fk condition touch')
+
+COUNTERS = [
+    Counter('departments', 'department_id', 'user_count', 'department_users', 'department_id', None, 'updated_at'),
+    Counter('departments', 'department_id', 'admin_count', 'department_admins', 'department_id', None, 'updated_at'),
+    Counter('resellers', 'reseller_id', 'customer_count', 'reseller_customers', 'reseller_id', None, 'updated_at'),
+    Counter('resellers', 'reseller_id', 'active_subscription_count', 'subscriptions', 'reseller_id',
+            ('status', 'active'), 'updated_at'),
+]
+
+
+class CounterFieldsMixin:
+    """
+    Model mixin for targets of counters: ``save()`` on an existing row
+    leaves ``counter_fields`` alone, so a stale in-memory value never
+    overwrites what the triggers wrote.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+def counters_for(target):
+    return [counter for counter in COUNTERS if counter.target == target]
+
+
+def _name(counter):
+    return f'{counter.target}_{counter.column}'
+
+
+def _condition(counter, alias):
+    if counter.condition is None:
+        return 'TRUE'
+    column, value = counter.condition
+    return f"{alias}.{column} = '{value}'"
+
+
+def _touch(counter, now):
+    return f', {counter.touch} = {now}' if counter.touch else ''
+
+
+def _postgres_create(counter):
+    name = _name(counter)
+    touch = _touch(counter, 'now()')
+
+    def delta(rows, sign):
+        return (
+            f'UPDATE {counter.target} t SET {counter.column} = t.{counter.column} {sign} c.n{touch} '
+            f'FROM (SELECT r.{counter.fk} AS fk, count(*) AS n FROM {rows} r '
+            f'WHERE r.{counter.fk} IS NOT NULL AND {_condition(counter, "r")} GROUP BY r.{counter.fk}) c '
+            f'WHERE t.{counter.target_pk} = c.fk;'
+        )
+
+    functions = {
+        'insert': delta('new_rows', '+'),
+        'delete': delta('old_rows', '-'),
+        # Transition tables rule out UPDATE OF <columns>, so every update
+        # fires; only rows whose fk or condition changed move between counts
+        'update': (
+            f'UPDATE {counter.target} t SET {counter.column} = t.{counter.column} + c.n{touch} '
+            f'FROM (SELECT fk, sum(n) AS n FROM ('
+            f'SELECT r.{counter.fk} AS fk, 1 AS n FROM new_rows r '
+            f'WHERE r.{counter.fk} IS NOT NULL AND {_condition(counter, "r")} '
+            f'UNION ALL '
+            f'SELECT r.{counter.fk}, -1 FROM old_rows r '
+            f'WHERE r.{counter.fk} IS NOT NULL AND {_condition(counter, "r")}'
+            f') changes GROUP BY fk HAVING sum(n) <> 0) c '
+            f'WHERE t.{counter.target_pk} = c.fk;'
+        ),
+    }
+    transitions = {
+        'insert': 'REFERENCING NEW TABLE AS new_rows',
+        'delete': 'REFERENCING OLD TABLE AS old_rows',
+        'update': 'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows',
+    }
+    statements = []
+    for event, body in functions.items():
+        statements += [
+            f'CREATE OR REPLACE FUNCTION {name}_{event}() RETURNS trigger LANGUAGE plpgsql AS $$ '
+            f'BEGIN {body} RETURN NULL; END $$;',
+            f'DROP TRIGGER IF EXISTS {name}_{event} ON {counter.source};',
+            f'CREATE TRIGGER {name}_{event} AFTER {event.upper()} ON {counter.source} {transitions[event]} '
+            f'FOR EACH STATEMENT EXECUTE FUNCTION {name}_{event}();',
+        ]
+    return statements
+
+
+def _sqlite_create(counter):
+    name = _name(counter)
+    watched = [counter.fk] + ([counter.condition[0]] if counter.condition else [])
+    # Same text format Django stores datetimes in
+    touch = _touch(counter, "strftime('%Y-%m-%d %H:%M:%f', 'now')")
+
+    def change(row, sign):
+        return (
+            f'UPDATE {counter.target} SET {counter.column} = {counter.column} {sign} 1{touch} '
+            f'WHERE {counter.target_pk} = {row}.{counter.fk} AND {_condition(counter, row)}; '
+        )
+
+    return [
+        f'DROP TRIGGER IF EXISTS {name}_insert;',
+        f'CREATE TRIGGER {name}_insert AFTER INSERT ON {counter.source} '
+        f'BEGIN {change("NEW", "+")}END;',
+        f'DROP TRIGGER IF EXISTS {name}_delete;',
+        f'CREATE TRIGGER {name}_delete AFTER DELETE ON {counter.source} '
+        f'BEGIN {change("OLD", "-")}END;',
+        f'DROP TRIGGER IF EXISTS {name}_update;',
+        f'CREATE TRIGGER {name}_update AFTER UPDATE OF {", ".join(watched)} ON {counter.source} '
+        f'BEGIN {change("OLD", "-")}{change("NEW", "+")}END;',
+    ]
+
+
+def create_triggers_sql(counter, vendor):
+    if vendor == 'postgresql':
+        return _postgres_create(counter)
+    if vendor == 'sqlite':
+        return _sqlite_create(counter)
+    return []
+
+
+def drop_triggers_sql(counter, vendor):
+    name = _name(counter)
+    events = ('insert', 'update', 'delete')
+    if vendor == 'postgresql':
+        return [f'DROP TRIGGER IF EXISTS {name}_{event} ON {counter.source};' for event in events] + \
+            [f'DROP FUNCTION IF EXISTS {name}_{event}();' for event in events]
+    if vendor == 'sqlite':
+        return [f'DROP TRIGGER IF EXISTS {name}_{event};' for event in events]
+    return []
+
+
+def repair(counter, using='default', batch_size=5000):
+    """
+    Recompute ``counter`` for every target row, ``batch_size`` rows per
+    statement. Returns the number of rows that had drifted.
+    """
+    actual = (
+        f'(SELECT count(*) FROM {counter.source} s '
+        f'WHERE s.{counter.fk} = {counter.target}.{counter.target_pk} AND {_condition(counter, "s")})'
+    )
+    touch = f', {counter.touch} = %s' if counter.touch else ''
+    fixed = 0
+    connection = connections[using]
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT min({counter.target_pk}), max({counter.target_pk}) FROM {counter.target}')
+        low, high = cursor.fetchone()
+        if low is None:
+            return 0
+        for start in range(low, high + 1, batch_size):
+            cursor.execute(
+                f'UPDATE {counter.target} SET {counter.column} = {actual}{touch} '
+                f'WHERE {counter.target_pk} >= %s AND {counter.target_pk} < %s '
+                f'AND {counter.column} <> {actual}',
+                ([now] if counter.touch else []) + [start, start + batch_size],
+            )
+            fixed += cursor.rowcount
+    return fixed
+
+
+def install_triggers(schema_editor, target):
+    """Create the triggers for ``target``'s counters and backfill them, for migrations"""
+    vendor = schema_editor.connection.vendor
+    for counter in counters_for(target):
+        for statement in create_triggers_sql(counter, vendor):
+            # No params, the SQL may contain literal % signs
+            schema_editor.execute(statement, params=None)
+        repair(counter, using=schema_editor.connection.alias)
+
+
+def drop_triggers(schema_editor, target):
+    vendor = schema_editor.connection.vendor
+    for counter in counters_for(target):
+        for statement in drop_triggers_sql(counter, vendor):
+            schema_editor.execute(statement, params=None)
@@ -0,0 +1,31 @@
+"""
+Connection pool instrumentation.
+
+Django keeps one psycopg_pool ``ConnectionPool`` per database alias and
+worker process when ``OPTIONS['pool']`` is set. ``get_pool_stats`` reports
+its counters: ``requests_num`` checkouts, ``requests_waiting`` callers
+waiting right now, ``requests_wait_ms`` total time spent waiting and
+``requests_errors`` checkouts that timed out.
+"""
+from django.db import connections
+
+
+def get_pool(alias):
+    """The pool already created for ``alias`` in this process, if any"""
+    connection = connections[alias]
+    return getattr(connection, '_connection_pools', {}).get(alias)
+
+
+def get_pool_stats():
+    stats = {}
+    for alias in connections:
+        pool = get_pool(alias)
+        if pool is None:
+            continue
+        counters = pool.get_stats()
+        counters['requests_wait_ms_avg'] = (
+            round(counters.get('requests_wait_ms', 0) / counters['requests_num'], 2)
+            if counters.get('requests_num') else 0.0
+        )
+        stats[alias] = counters
+    return stats
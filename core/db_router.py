@@ -0,0 +1,243 @@
+"""
+Read-replica routing with read-your-writes pinning.
+
+Viewsets using ``ReplicaReadMixin`` run their list/retrieve/export actions
+against a replica from ``DATABASE_REPLICATION['REPLICAS']``; everything else,
+including reads inside a transaction, stays on ``default``. A request that
+writes pins its user (and browser, through a cookie) to the primary for
+``PIN_SECONDS`` so they read their own changes. The user pin, all that
+clients without cookies get, lives in the ``PIN_CACHE`` cache, which every
+worker process has to share: by default the ``shared`` cache when
+CACHE_BACKEND=postgres configures one. A process-local pin cache with
+replicas configured fails at startup unless DEBUG is on (a single
+development server). Replicas are checked for
+replication lag at most every ``LAG_CHECK_INTERVAL`` seconds per process
+and skipped while more than ``MAX_LAG`` seconds behind or unreachable.
+
+Two SQLite files can stand in for a primary and a replica locally:
+
+    DATABASES = {
+        'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'db.sqlite3'},
+        'replica1': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'replica.sqlite3'},
+    }
+    DATABASE_REPLICATION = {'REPLICAS': ['replica1']}
+
+(copy db.sqlite3 to replica.sqlite3 after migrating, run with DEBUG=true).
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+_replica = contextvars.ContextVar('db_replica', default=None)
+_wrote = contextvars.ContextVar('db_wrote', default=False)
+
+# alias -> (checked_at, healthy)
+_health = {}
+_health_lock = threading.Lock()
+
+
+def get_replication_settings():
+    options = {
+        'REPLICAS': [],
+        'MAX_LAG': 5,
+        'LAG_CHECK_INTERVAL': 10,
+        'PIN_SECONDS': 15,
+        'PIN_COOKIE': 'db_pin',
+        # Cache alias holding the user pins, None for 'shared' when configured
+        'PIN_CACHE': None,
+        # Writes to these apps never pin (e.g. session saves on every request)
+        'PIN_IGNORE_APPS': ['sessions'],
+    }
+    options.update(getattr(settings, 'DATABASE_REPLICATION', {}))
+    return options
+
+
+def replica_lag(alias):
+    """Seconds ``alias`` is behind its primary, 0 when it isn't replicating"""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        # An idle primary sends no new WAL, so a fully replayed replica
+        # counts as caught up however old its last transaction is
+        cursor.execute(
+            'SELECT CASE'
+            ' WHEN NOT pg_is_in_recovery() THEN 0'
+            ' WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0'
+            ' ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)'
+            ' END'
+        )
+        return float(cursor.fetchone()[0])
+
+
+def is_healthy(alias):
+    options = get_replication_settings()
+    now = time.monotonic()
+    checked = _health.get(alias)
+    if checked is not None and now - checked[0] < options['LAG_CHECK_INTERVAL']:
+        return checked[1]
+    try:
+        lag = replica_lag(alias)
+        healthy = lag <= options['MAX_LAG']
+        if not healthy:
+            logger.warning("Replica %s is %.1fs behind, skipping it", alias, lag)
+    except Exception:
+        logger.warning("Replica %s is unreachable, skipping it", alias, exc_info=True)
+        healthy = False
+    with _health_lock:
+        _health[alias] = (now, healthy)
+    return healthy
+
+
+def choose_replica():
+    """Pick a healthy replica, or None to stay on the primary"""
+    healthy = [alias for alias in get_replication_settings()['REPLICAS'] if is_healthy(alias)]
+    return random.choice(healthy) if healthy else None
+
+
+def _pin_key(user_pk):
+    return f'db:pin:user:{user_pk}'
+
+
+def get_pin_cache():
+    alias = get_replication_settings()['PIN_CACHE']
+    if alias is None:
+        alias = 'shared' if 'shared' in settings.CACHES else 'default'
+    return caches[alias]
+
+
+def _is_process_local(backend):
+    from .cache_backends import TwoTierCache
+
+    if isinstance(backend, TwoTierCache):
+        return _is_process_local(backend.l2)
+    return isinstance(backend, (LocMemCache, DummyCache))
+
+
+def check_pin_cache():
+    """Refuse to start with replicas and pins other workers can't see"""
+    if get_replication_settings()['REPLICAS'] and not settings.DEBUG and _is_process_local(get_pin_cache()):
+        raise ImproperlyConfigured(
+            "DATABASE_REPLICATION needs a PIN_CACHE shared by every worker process "
+            "(e.g. CACHE_BACKEND=postgres), read-your-writes pins would be per process"
+        )
+
+
+def is_pinned(request):
+    """Whether ``request`` must read from the primary after a recent write"""
+    if request.COOKIES.get(get_replication_settings()['PIN_COOKIE']):
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_authenticated and get_pin_cache().get(_pin_key(user.pk)))
+
+
+def pin(request, response):
+    """Send the caller's reads to the primary for the next PIN_SECONDS"""
+    options = get_replication_settings()
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        get_pin_cache().set(_pin_key(user.pk), True, options['PIN_SECONDS'])
+    response.set_cookie(
+        options['PIN_COOKIE'], '1', max_age=options['PIN_SECONDS'], httponly=True, samesite='Lax'
+    )
+
+
+def current_replica():
+    return _replica.get()
+
+
+def has_written():
+    return _wrote.get()
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside the block, e.g. when filling a cache"""
+    token = _replica.set(None)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+@contextmanager
+def request_scope():
+    """Fresh routing state for one request"""
+    replica_token = _replica.set(None)
+    wrote_token = _wrote.set(False)
+    try:
+        yield
+    finally:
+        _replica.reset(replica_token)
+        _wrote.reset(wrote_token)
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the replica chosen for the current request, all writes
+    to ``default``
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related objects come from where their parent was read
+            return instance._state.db
+        alias = _replica.get()
+        if alias is None or _wrote.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in get_replication_settings()['PIN_IGNORE_APPS']:
+            _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        return db not in get_replication_settings()['REPLICAS']
+
+
+class ReplicaReadMixin:
+    """
+    ViewSet mixin running ``replica_actions`` against a read replica unless
+    the caller is pinned to the primary.
+    """
+    replica_actions = ('list', 'retrieve', 'export', 'lookup', 'search')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._replica_token = None
+        if self.action in self.replica_actions and not is_pinned(request):
+            alias = choose_replica()
+            if alias is not None:
+                self._replica_token = _replica.set(alias)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        alias = _replica.get()
+        # Bind the queryset itself, streamed exports are evaluated after
+        # the view has returned
+        return queryset.using(alias) if alias is not None else queryset
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _replica.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
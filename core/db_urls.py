@@ -0,0 +1,6 @@
+from django.urls import path
+from . import api_views
+
+urlpatterns = [
+    path('pools/', api_views.DatabasePoolStatsAPIView.as_view(), name='db_pool_stats_api'),
+]
@@ -0,0 +1,184 @@
+"""
+Dependency map from models to response cache namespaces.
+
+Each resolver receives the saved or deleted instance and returns the
+(namespace, tenant) pairs whose cached responses include that row:
+
+- ``department``: DepartmentViewSet.retrieve, keyed by department id
+- ``reseller``: ResellerViewSet.retrieve, keyed by reseller id
+- ``reseller_customers``: ResellerCustomerAPI.get, keyed by reseller id
+- ``dashboard``: DashboardAPIView (see myproject/dashboard.py), keyed by
+  ``root``, ``department:<id>``, ``reseller:<id>`` and ``user:<id>``
+
+Nested users render their ``managed_departments``, so changes to a user or
+to the departments they administer also reach every department and reseller
+listing that user. Departments and resellers render their counters (see
+core/counters.py), so membership and subscription changes reach the
+resellers listing them too.
+"""
+from django.db.models.signals import post_save, post_delete
+
+from .response_cache import invalidate_on_commit
+
+
+def _user_namespaces(user_ids):
+    """Namespaces of every detail view that renders one of ``user_ids``"""
+    from department.models import DepartmentAdmin, DepartmentUser
+    from reseller.models import ResellerAdmin
+
+    department_ids = set(
+        DepartmentUser.objects.filter(user_id__in=user_ids).values_list('department_id', flat=True)
+    )
+    department_ids.update(
+        DepartmentAdmin.objects.filter(user_id__in=user_ids).values_list('department_id', flat=True)
+    )
+    reseller_ids = ResellerAdmin.objects.filter(user_id__in=user_ids).values_list('reseller_id', flat=True)
+    return (
+        [('department', department_id) for department_id in department_ids]
+        + [('reseller', reseller_id) for reseller_id in set(reseller_ids)]
+    )
+
+
+def user_changed(user):
+    return _user_namespaces([user.pk]) + [('dashboard', f'user:{user.pk}')]
+
+
+def _customer_of(department_id):
+    """Ids of the resellers listing ``department_id`` as a customer"""
+    from reseller.models import ResellerCustomer
+
+    return set(ResellerCustomer.objects.filter(department_id=department_id).values_list('reseller_id', flat=True))
+
+
+def _dashboard_namespaces(department_id, reseller_ids):
+    """Dashboards showing ``department_id``: root's, its admins' and its resellers'"""
+    return (
+        [('dashboard', 'root'), ('dashboard', f'department:{department_id}')]
+        + [('dashboard', f'reseller:{reseller_id}') for reseller_id in reseller_ids]
+    )
+
+
+def _reseller_namespaces(department_id):
+    """Namespaces of the resellers listing ``department_id`` as a customer, and of the dashboards"""
+    reseller_ids = _customer_of(department_id)
+    namespaces = _dashboard_namespaces(department_id, reseller_ids)
+    for reseller_id in reseller_ids:
+        namespaces += [('reseller', reseller_id), ('reseller_customers', reseller_id)]
+    return namespaces
+
+
+def department_changed(department):
+    from department.models import DepartmentAdmin
+
+    namespaces = [('department', department.pk)] + _reseller_namespaces(department.pk)
+    # Admins of this department list it in their managed_departments
+    admin_ids = list(DepartmentAdmin.objects.filter(department_id=department.pk).values_list('user_id', flat=True))
+    if admin_ids:
+        namespaces += _user_namespaces(admin_ids)
+    return namespaces
+
+
+def department_admin_changed(admin):
+    # Resellers render the department's admin_count
+    return (
+        [('department', admin.department_id), ('dashboard', f'user:{admin.user_id}')]
+        + _user_namespaces([admin.user_id])
+        + _reseller_namespaces(admin.department_id)
+    )
+
+
+def department_users_changed(department_id):
+    return [('department', department_id)] + _reseller_namespaces(department_id)
+
+
+def department_user_changed(membership):
+    return department_users_changed(membership.department_id)
+
+
+def reseller_changed(reseller):
+    return [
+        ('reseller', reseller.pk), ('reseller_customers', reseller.pk), ('dashboard', f'reseller:{reseller.pk}'),
+    ]
+
+
+def reseller_admin_changed(admin):
+    return [
+        ('reseller', admin.reseller_id), ('reseller_customers', admin.reseller_id),
+        ('dashboard', f'user:{admin.user_id}'),
+    ]
+
+
+def reseller_customer_changed(customer):
+    return [
+        ('reseller', customer.reseller_id), ('reseller_customers', customer.reseller_id),
+        ('dashboard', f'reseller:{customer.reseller_id}'),
+    ]
+
+
+def _subscription_namespaces(subscription, customer_of):
+    namespaces = _dashboard_namespaces(subscription.department_id, customer_of)
+    # Resellers render their active_subscription_count
+    if subscription.reseller_id is not None:
+        namespaces += [
+            ('reseller', subscription.reseller_id), ('reseller_customers', subscription.reseller_id),
+            ('dashboard', f'reseller:{subscription.reseller_id}'),
+        ]
+    return namespaces
+
+
+def subscription_changed(subscription):
+    return _subscription_namespaces(subscription, _customer_of(subscription.department_id))
+
+
+def subscriptions_changed(subscriptions):
+    """``subscription_changed`` for many rows saved without signals, in one query"""
+    from reseller.models import ResellerCustomer
+
+    department_ids = {subscription.department_id for subscription in subscriptions}
+    customers = {}
+    for department_id, reseller_id in ResellerCustomer.objects.filter(
+            department_id__in=department_ids).values_list('department_id', 'reseller_id'):
+        customers.setdefault(department_id, set()).add(reseller_id)
+    namespaces = set()
+    for subscription in subscriptions:
+        namespaces.update(_subscription_namespaces(subscription, customers.get(subscription.department_id, ())))
+    return namespaces
+
+
+def transaction_changed(transaction):
+    # Recent transactions show on the dashboards of the subscription's department
+    from service_package.models import Subscription
+
+    department_id = Subscription.objects.filter(pk=transaction.subscription_id).values_list(
+        'department_id', flat=True).first()
+    return [('dashboard', 'root'), ('dashboard', f'department:{department_id}')]
+
+
+CACHE_DEPENDENCIES = {
+    'user.User': user_changed,
+    'department.Department': department_changed,
+    'department.DepartmentAdmin': department_admin_changed,
+    'department.DepartmentUser': department_user_changed,
+    'reseller.Reseller': reseller_changed,
+    'reseller.ResellerAdmin': reseller_admin_changed,
+    'reseller.ResellerCustomer': reseller_customer_changed,
+    'service_package.Subscription': subscription_changed,
+    'service_package.Transaction': transaction_changed,
+}
+
+
+def _make_receiver(resolve):
+    def receiver(sender, instance, using=None, **kwargs):
+        # Resolved now, while the rows are there, bumped after commit
+        invalidate_on_commit(resolve(instance), using=using)
+    return receiver
+
+
+def connect_dependencies():
+    from django.apps import apps
+
+    for label, resolve in CACHE_DEPENDENCIES.items():
+        model = apps.get_model(label)
+        receiver = _make_receiver(resolve)
+        post_save.connect(receiver, sender=model, weak=False, dispatch_uid=f'response_cache:save:{label}')
+        post_delete.connect(receiver, sender=model, weak=False, dispatch_uid=f'response_cache:delete:{label}')
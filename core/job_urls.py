@@ -0,0 +1,7 @@
+from django.urls import path
+from . import api_views
+
+urlpatterns = [
+    path('stats/', api_views.JobStatsAPIView.as_view(), name='job_stats_api'),
+    path('schedule/', api_views.ScheduleAPIView.as_view(), name='job_schedule_api'),
+]
@@ -0,0 +1,234 @@
+"""
+Background jobs stored in the database.
+
+Tasks are plain functions registered with ``@task``, conventionally in an
+app's ``tasks.py`` (the worker imports every app's ``tasks`` module):
+
+    @task(queue='imports', max_attempts=5)
+    def rebuild_rollups(department_id):
+        ...
+
+    rebuild_rollups.enqueue(department_id=4)
+    enqueue('department.rebuild_rollups', {'department_id': 4}, priority=10)
+
+``enqueue`` inserts a ``Job`` row in the caller's transaction, so a job
+queued by a request that rolls back never runs. Arguments go through JSON.
+
+``manage.py run_worker`` claims due jobs with
+``SELECT ... FOR UPDATE SKIP LOCKED``, so any number of workers share the
+queues without a broker and without handing a job out twice, and runs
+them on a thread pool. A claimed job is locked for ``VISIBILITY_TIMEOUT``
+seconds, extended while it runs; if its worker dies the lock lapses and
+the job is queued again. A job raising an exception is retried with
+exponential backoff until ``max_attempts``, then marked failed. Jobs
+should be idempotent, a job can run more than once.
+"""
+import datetime
+import logging
+import os
+import socket
+import traceback
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from .models import Job, ScheduledRun
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+
+class UnknownTask(Exception):
+    pass
+
+
+def get_job_settings():
+    options = {
+        'CONCURRENCY': 4,
+        'POLL_INTERVAL': 1,
+        'VISIBILITY_TIMEOUT': 300,
+        'RETRY_BASE_SECONDS': 10,
+        'RETRY_MAX_SECONDS': 3600,
+        'RETENTION_DAYS': 7,
+    }
+    options.update(getattr(settings, 'JOBS', {}))
+    return options
+
+
+def task(name=None, queue='default', priority=0, max_attempts=3):
+    """Register a function as a task, named ``<app>.<function>`` by default"""
+    def decorator(function):
+        task_name = name or f"{function.__module__.split('.')[0]}.{function.__name__}"
+        _tasks[task_name] = function
+
+        @wraps(function)
+        def enqueue_task(**kwargs):
+            return enqueue(task_name, kwargs, queue=queue, priority=priority, max_attempts=max_attempts)
+
+        function.task_name = task_name
+        function.enqueue = enqueue_task
+        return function
+    return decorator
+
+
+def get_task(name):
+    try:
+        return _tasks[name]
+    except KeyError:
+        raise UnknownTask(f"No task registered as {name}")
+
+
+def enqueue(name, kwargs=None, queue='default', priority=0, max_attempts=3, run_at=None):
+    """Queue ``name`` to run with ``kwargs``, returns the ``Job``"""
+    return Job.objects.create(
+        task=name, kwargs=kwargs or {}, queue=queue, priority=priority, max_attempts=max_attempts,
+        run_at=run_at or timezone.now(),
+    )
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+
+
+def requeue_expired():
+    """
+    Queue running jobs whose worker stopped extending their lock, or fail
+    them when out of attempts (a job that kills its worker would otherwise
+    come back forever). Returns how many were requeued.
+    """
+    now = timezone.now()
+    expired = Job.objects.filter(status='running', locked_until__lt=now)
+    lost = list(expired.filter(attempts__gte=F('max_attempts')).values_list('id', flat=True))
+    if lost:
+        Job.objects.filter(id__in=lost, status='running').update(
+            status='failed', locked_by='', locked_until=None, finished_at=now,
+            last_error="Worker lost while running the job",
+        )
+        ScheduledRun.objects.filter(job_id__in=lost).update(status='failed', finished_at=now)
+    return expired.update(status='queued', locked_by='', locked_until=None)
+
+
+def claim(queues, limit, worker, visibility_timeout):
+    """Lock up to ``limit`` due jobs from ``queues`` for ``worker`` and return them"""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', queue__in=queues, run_at__lte=now)
+            .order_by('-priority', 'run_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        Job.objects.filter(id__in=ids, status='queued').update(
+            status='running', locked_by=worker, attempts=F('attempts') + 1, started_at=now,
+            locked_until=now + datetime.timedelta(seconds=visibility_timeout),
+        )
+    return list(Job.objects.filter(id__in=ids, locked_by=worker).order_by('-priority', 'run_at', 'id'))
+
+
+def extend(job_ids, worker, visibility_timeout):
+    """Push back the lock of the jobs ``worker`` is still running"""
+    Job.objects.filter(id__in=job_ids, status='running', locked_by=worker).update(
+        locked_until=timezone.now() + datetime.timedelta(seconds=visibility_timeout),
+    )
+
+
+def retry_delay(attempts, options):
+    return min(options['RETRY_BASE_SECONDS'] * 2 ** (attempts - 1), options['RETRY_MAX_SECONDS'])
+
+
+def _finish_run(job, status, finished_at):
+    # Jobs fired by the scheduler keep their outcome in its history (see core/scheduler.py)
+    ScheduledRun.objects.filter(job_id=job.pk).update(status=status, started_at=job.started_at,
+                                                       finished_at=finished_at)
+
+
+def run_job(job, worker):
+    """Run a claimed job and record the outcome, returns True if it succeeded"""
+    options = get_job_settings()
+    close_old_connections()
+    try:
+        get_task(job.task)(**job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception("Job %s (%s) failed, attempt %s of %s", job.id, job.task, job.attempts, job.max_attempts)
+        now = timezone.now()
+        owned = Job.objects.filter(pk=job.pk, status='running', locked_by=worker)
+        if job.attempts < job.max_attempts:
+            owned.update(status='queued', locked_by='', locked_until=None, last_error=error,
+                         run_at=now + datetime.timedelta(seconds=retry_delay(job.attempts, options)))
+        elif owned.update(status='failed', locked_by='', locked_until=None, last_error=error, finished_at=now):
+            _finish_run(job, 'failed', now)
+        return False
+    else:
+        now = timezone.now()
+        if Job.objects.filter(pk=job.pk, status='running', locked_by=worker).update(
+                status='done', locked_by='', locked_until=None, finished_at=now):
+            _finish_run(job, 'done', now)
+        return True
+    finally:
+        close_old_connections()
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else None
+
+
+def get_job_stats(window=3600, sample=1000):
+    """
+    Per queue depth and latency: jobs queued, due and running, the age of
+    the oldest due job, and for up to ``sample`` jobs finished in the last
+    ``window`` seconds the outcomes and the wait (due to started) and run
+    time percentiles
+    """
+    now = timezone.now()
+    stats = {}
+    depth = Job.objects.filter(status__in=['queued', 'running']).values('queue').annotate(
+        queued=Count('id', filter=Q(status='queued')),
+        due=Count('id', filter=Q(status='queued', run_at__lte=now)),
+        running=Count('id', filter=Q(status='running')),
+        oldest_due=Min('run_at', filter=Q(status='queued', run_at__lte=now)),
+    )
+    for row in depth:
+        stats[row['queue']] = {
+            'queued': row['queued'],
+            'due': row['due'],
+            'running': row['running'],
+            'lag_seconds': round((now - row['oldest_due']).total_seconds(), 1) if row['oldest_due'] else 0,
+        }
+
+    since = now - datetime.timedelta(seconds=window)
+    finished = Job.objects.filter(finished_at__gte=since).order_by('-finished_at').values_list(
+        'queue', 'status', 'run_at', 'started_at', 'finished_at')[:sample]
+    timings = {}
+    for queue, status, run_at, started_at, finished_at in finished:
+        entry = timings.setdefault(queue, {'done': 0, 'failed': 0, 'wait': [], 'run': []})
+        entry[status] += 1
+        if started_at is not None:
+            entry['wait'].append(max(0, (started_at - run_at).total_seconds()))
+            entry['run'].append((finished_at - started_at).total_seconds())
+    empty = {'queued': 0, 'due': 0, 'running': 0, 'lag_seconds': 0}
+    for queue, entry in timings.items():
+        stats.setdefault(queue, dict(empty)).update({
+            'done_recently': entry['done'],
+            'failed_recently': entry['failed'],
+            'wait_seconds_p50': _percentile(entry['wait'], 50),
+            'wait_seconds_p95': _percentile(entry['wait'], 95),
+            'run_seconds_p50': _percentile(entry['run'], 50),
+            'run_seconds_p95': _percentile(entry['run'], 95),
+        })
+    return stats
+
+
+def prune_jobs():
+    """Delete finished jobs older than ``RETENTION_DAYS``, returns how many"""
+    cutoff = timezone.now() - datetime.timedelta(days=get_job_settings()['RETENTION_DAYS'])
+    deleted, _ = Job.objects.filter(status__in=['done', 'failed'], finished_at__lt=cutoff).delete()
+    return deleted
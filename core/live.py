@@ -0,0 +1,246 @@
+"""
+Live event stream (Server-Sent Events) for admin UIs.
+
+``GET /api/async/events/`` streams the outbox events (see core/outbox.py)
+in the caller's scope as they happen: service access grants, subscription
+changes, department membership changes.
+
+    id: 41
+    event: subscription.updated
+    data: {"id": 41, "type": "subscription.updated", "created_at": "...", "data": {...}}
+
+Each worker process runs one ``EventHub``. While at least one stream is
+open, a single task polls the outbox every ``POLL_INTERVAL`` seconds and
+hands new events to the streams whose scope they fall in, found through
+a department and a reseller index. An idle stream costs a small queue and
+a suspended coroutine, no queries and no database connection, so a
+worker holds thousands of them.
+
+The hub follows the outbox with the ``(transaction_xid, id)`` cursor of
+webhook delivery (see core/webhooks.py) and on Postgres only moves over
+events of transactions that are no longer in progress, so an event whose
+transaction commits late is still handed out instead of skipped. Other
+databases wait ``SETTLE_SECONDS`` instead, which a slower commit can slip
+past.
+
+A client too slow to keep up overflows its queue and gets a ``reset``
+event. ``EventSource`` reconnects with ``Last-Event-ID``, and the stream
+replays what was missed from the outbox before going live again; when more
+than ``REPLAY_LIMIT`` events were missed it sends ``reset`` straight away
+and the client should reload its state, as it should when its last
+event was already pruned.
+"""
+import asyncio
+import collections
+import contextvars
+import datetime
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboxEvent
+from .outbox import event_data
+from .webhooks import committed_horizon, past_cursor
+
+
+def get_live_settings():
+    options = {
+        'POLL_INTERVAL': 1,
+        'SETTLE_SECONDS': 1,
+        'HEARTBEAT_SECONDS': 15,
+        'QUEUE_SIZE': 100,
+        'REPLAY_LIMIT': 500,
+        'BATCH_SIZE': 500,
+    }
+    options.update(getattr(settings, 'LIVE_EVENTS', {}))
+    return options
+
+
+class Scope(collections.namedtuple('Scope', 'everything department_ids reseller_id')):
+    """Which events a stream receives: all, or those of its departments or reseller"""
+
+    def filter(self, events):
+        if self.everything:
+            return events
+        condition = Q(department_id__in=self.department_ids)
+        if self.reseller_id is not None:
+            condition |= Q(reseller_id=self.reseller_id)
+        return events.filter(condition)
+
+
+class Listener:
+    def __init__(self, scope, size):
+        self.scope = scope
+        self.queue = asyncio.Queue(size)
+        self.overflowed = False
+
+    def put(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+def committed_events(horizon=None, settled=None):
+    """Outbox events of transactions below ``horizon``, or older than ``settled`` off Postgres"""
+    events = OutboxEvent.objects.all()
+    if horizon is not None:
+        return events.filter(transaction_xid__lt=horizon)
+    if settled is not None:
+        return events.filter(created_at__lte=settled)
+    return events
+
+
+def _fetch(after, settle_seconds, limit):
+    """Return the new position and the events past ``after``, starting from the newest if None"""
+    try:
+        horizon = committed_horizon()
+        settled = timezone.now() - datetime.timedelta(seconds=settle_seconds) if horizon is None else None
+        events = committed_events(horizon, settled)
+        if after is None:
+            return events.order_by('-transaction_xid', '-id').values_list(
+                'transaction_xid', 'id').first() or (0, 0), []
+        events = list(events.filter(past_cursor(*after)).order_by('transaction_xid', 'id')[:limit])
+        return ((events[-1].transaction_xid, events[-1].id) if events else after), events
+    finally:
+        # Runs outside any request, nothing else would give the connection back
+        connection.close()
+
+
+class EventHub:
+    """Per-process fan-out of outbox events to the open streams"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.listeners = set()
+        self.everything = set()
+        self.by_department = collections.defaultdict(set)
+        self.by_reseller = collections.defaultdict(set)
+        self.task = None
+        # (transaction_xid, id) of the last event handed out, None until the
+        # poller has started
+        self.position = None
+        self.started = asyncio.Event()
+
+    def _groups(self, scope):
+        if scope.everything:
+            yield self.everything
+            return
+        for department_id in scope.department_ids:
+            yield self.by_department[department_id]
+        if scope.reseller_id is not None:
+            yield self.by_reseller[scope.reseller_id]
+
+    def subscribe(self, scope):
+        listener = Listener(scope, get_live_settings()['QUEUE_SIZE'])
+        self.listeners.add(listener)
+        for group in self._groups(scope):
+            group.add(listener)
+        if self.task is None:
+            # A fresh context, the poller must not inherit the request's
+            self.task = self.loop.create_task(self.poll(), context=contextvars.Context())
+        return listener
+
+    def unsubscribe(self, listener):
+        self.listeners.discard(listener)
+        for group in self._groups(listener.scope):
+            group.discard(listener)
+        for index in (self.by_department, self.by_reseller):
+            for key in [key for key, group in index.items() if not group]:
+                del index[key]
+
+    def publish(self, event):
+        listeners = set(self.everything)
+        listeners |= self.by_department.get(event.department_id, set())
+        listeners |= self.by_reseller.get(event.reseller_id, set())
+        for listener in listeners:
+            listener.put(event)
+
+    async def poll(self):
+        options = get_live_settings()
+        fetch = sync_to_async(_fetch, thread_sensitive=False)
+        try:
+            while self.listeners:
+                position, events = await fetch(self.position, options['SETTLE_SECONDS'], options['BATCH_SIZE'])
+                for event in events:
+                    self.publish(event)
+                self.position = position
+                self.started.set()
+                if len(events) < options['BATCH_SIZE']:
+                    await asyncio.sleep(options['POLL_INTERVAL'])
+        finally:
+            self.task = None
+            self.position = None
+            self.started.clear()
+
+
+_hub = None
+
+
+def get_hub():
+    global _hub
+    loop = asyncio.get_running_loop()
+    if _hub is None or _hub.loop is not loop:
+        _hub = EventHub(loop)
+    return _hub
+
+
+def format_event(event):
+    data = json.dumps(event_data(event), cls=DjangoJSONEncoder)
+    return f'id: {event.id}\nevent: {event.event_type}\ndata: {data}\n\n'
+
+
+RESET = 'event: reset\ndata: {}\n\n'
+
+
+async def stream(scope, last_event_id=None):
+    """Yield the SSE messages for ``scope``, replaying from ``last_event_id`` first"""
+    options = get_live_settings()
+    hub = get_hub()
+    listener = hub.subscribe(scope)
+    try:
+        # The retry hint doubles as a first byte, so proxies see the stream open
+        yield f'retry: {options["POLL_INTERVAL"] * 1000 + 1000}\n\n'
+        # Position of the last event sent
+        sent = None
+        if last_event_id is not None:
+            sent = await OutboxEvent.objects.filter(pk=last_event_id).values_list('transaction_xid', 'id').afirst()
+            if sent is None:
+                # Pruned, what came after it may be too
+                yield RESET
+                return
+            # Everything past the hub's position reaches the queue, replay up to it
+            await hub.started.wait()
+            missed = scope.filter(OutboxEvent.objects.filter(past_cursor(*sent)).exclude(past_cursor(*hub.position)))
+            missed = missed.order_by('transaction_xid', 'id')[:options['REPLAY_LIMIT'] + 1]
+            missed = [event async for event in missed]
+            if len(missed) > options['REPLAY_LIMIT']:
+                yield RESET
+                return
+            for event in missed:
+                yield format_event(event)
+                sent = (event.transaction_xid, event.id)
+
+        while True:
+            if listener.overflowed and listener.queue.empty():
+                yield RESET
+                return
+            try:
+                event = await asyncio.wait_for(listener.queue.get(), options['HEARTBEAT_SECONDS'])
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            position = (event.transaction_xid, event.id)
+            if sent is not None and position <= sent:
+                continue
+            yield format_event(event)
+            sent = position
+    finally:
+        hub.unsubscribe(listener)
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.webhooks import deliver_once, get_webhook_settings, prune_outbox
+
+
+class Command(BaseCommand):
+    help = "Push outbox events to the webhook endpoints (see core/webhooks.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Deliver one round and exit instead of polling")
+        parser.add_argument('--prune', action='store_true',
+                            help="Delete events past WEBHOOKS['RETENTION_DAYS'] and exit")
+
+    def handle(self, *args, **options):
+        if options['prune']:
+            self.stdout.write(f"{prune_outbox()} outbox events pruned")
+            return
+
+        interval = get_webhook_settings()['POLL_INTERVAL']
+        while True:
+            delivered, failed, more = deliver_once()
+            if delivered or failed:
+                self.stdout.write(f"{delivered} events delivered, {failed} endpoints failed")
+            if options['once']:
+                return
+            if not more:
+                time.sleep(interval)
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from core.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Delete delta sync tombstones older than DELTA_SYNC['TOMBSTONE_RETENTION_DAYS']"
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{prune_tombstones()} tombstones pruned")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from core.counters import COUNTERS, repair
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized counter columns (see core/counters.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Target rows recomputed per statement")
+
+    def handle(self, *args, **options):
+        for counter in COUNTERS:
+            fixed = repair(counter, using=options['database'], batch_size=options['batch_size'])
+            self.stdout.write(f"{counter.target}.{counter.column}: {fixed} rows repaired")
@@ -0,0 +1,55 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.utils.module_loading import autodiscover_modules
+
+from core.jobs import UnknownTask, get_task
+from core.scheduler import Leadership, Scheduler, get_schedule, get_scheduler_settings
+
+
+class Command(BaseCommand):
+    help = "Enqueue the periodic jobs in SCHEDULE as they come due (see core/scheduler.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Fire what is due (as leader or not at all) and exit")
+
+    def handle(self, *args, **options):
+        autodiscover_modules('tasks')
+        settings = get_scheduler_settings()
+        entries = get_schedule()
+        for entry in entries:
+            try:
+                get_task(entry.task)
+            except UnknownTask as e:
+                raise CommandError(f"Schedule entry {entry.name!r}: {e}")
+
+        stopping = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *args: stopping.set())
+
+        leadership = Leadership(settings['LOCK_KEY'])
+        scheduler = Scheduler(entries, settings)
+        self.stdout.write(f"Scheduler running {len(entries)} entries")
+        leading = False
+        try:
+            while not stopping.is_set():
+                if leadership.check() != leading:
+                    leading = leadership.is_leader
+                    self.stdout.write("Leading, firing due jobs" if leading else "Following, another node leads")
+                if leading:
+                    try:
+                        for run in scheduler.tick():
+                            self.stdout.write(f"Fired {run.name} for {run.scheduled_for:%Y-%m-%d %H:%M} "
+                                              f"as job {run.job_id}")
+                    except DatabaseError as e:
+                        self.stderr.write(f"Scheduler tick failed: {e}")
+                        connection.close()
+                if options['once']:
+                    break
+                stopping.wait(settings['TICK'])
+        finally:
+            leadership.release()
+        self.stdout.write("Scheduler stopped")
@@ -0,0 +1,63 @@
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import autodiscover_modules
+
+from core.jobs import claim, extend, get_job_settings, requeue_expired, run_job, worker_name
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the database queue (see core/jobs.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queues', default='default',
+                            help="Comma separated queues to take jobs from")
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help="Jobs run at the same time, JOBS['CONCURRENCY'] by default")
+        parser.add_argument('--burst', action='store_true',
+                            help="Exit once no job is due instead of polling")
+
+    def handle(self, *args, **options):
+        autodiscover_modules('tasks')
+        settings = get_job_settings()
+        queues = [queue.strip() for queue in options['queues'].split(',') if queue.strip()]
+        concurrency = options['concurrency'] or settings['CONCURRENCY']
+        visibility_timeout = settings['VISIBILITY_TIMEOUT']
+        worker = worker_name()
+
+        stopping = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *args: stopping.set())
+
+        self.stdout.write(f"Worker {worker} running {', '.join(queues)} with concurrency {concurrency}")
+        running = {}
+        extended = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='job') as pool:
+            while running or not stopping.is_set():
+                for future in [future for future in running if future.done()]:
+                    del running[future]
+                if running and time.monotonic() - extended > visibility_timeout / 3:
+                    extend(list(running.values()), worker, visibility_timeout)
+                    extended = time.monotonic()
+
+                jobs = []
+                if not stopping.is_set():
+                    requeue_expired()
+                    free = concurrency - len(running)
+                    if free:
+                        jobs = claim(queues, free, worker, visibility_timeout)
+                    for job in jobs:
+                        running[pool.submit(run_job, job, worker)] = job.id
+                    if options['burst'] and not jobs and not running:
+                        break
+                if not jobs:
+                    if running:
+                        wait(running, timeout=settings['POLL_INTERVAL'], return_when=FIRST_COMPLETED)
+                    else:
+                        stopping.wait(settings['POLL_INTERVAL'])
+                elif len(running) == concurrency:
+                    wait(running, timeout=settings['POLL_INTERVAL'], return_when=FIRST_COMPLETED)
+        self.stdout.write(f"Worker {worker} stopped")
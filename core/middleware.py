@@ -0,0 +1,41 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .db_router import get_replication_settings, has_written, pin, request_scope
+
+
+class ReadYourWritesMiddleware:
+    """
+    Resets replica routing for each request and pins callers that wrote
+    to the primary database (see core/db_router.py)
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = bool(get_replication_settings()['REPLICAS'])
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        with request_scope():
+            response = self.get_response(request)
+            if has_written():
+                pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        with request_scope():
+            response = await self.get_response(request)
+            if has_written():
+                pin(request, response)
+        return response
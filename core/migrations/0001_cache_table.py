@@ -0,0 +1,28 @@
+from django.db import migrations
+
+from core.cache_backends import CACHE_TABLE, create_cache_table_sql
+
+
+def create_cache_table(apps, schema_editor):
+    # UNLOGGED tables are Postgres only; other databases use a local cache
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for statement in create_cache_table_sql():
+        schema_editor.execute(statement)
+
+
+def drop_cache_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS "{CACHE_TABLE}"')
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.RunPython(create_cache_table, drop_cache_table),
+    ]
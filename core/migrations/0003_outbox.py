@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-18 23:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_tombstone'),
+        ('reseller', '0003_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('event_type', models.CharField(max_length=50)),
+                ('object_id', models.BigIntegerField()),
+                ('reseller_id', models.IntegerField(blank=True, null=True)),
+                ('payload', models.JSONField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'outbox_events',
+                'indexes': [models.Index(fields=['reseller_id', 'id'], name='outbox_events_reseller_idx'), models.Index(fields=['created_at'], name='outbox_events_created_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WebhookEndpoint',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('url', models.URLField(max_length=500)),
+                ('secret', models.CharField(help_text='Key for the X-Webhook-Signature HMAC', max_length=100)),
+                ('event_types', models.JSONField(blank=True, default=list)),
+                ('is_active', models.BooleanField(default=True)),
+                ('last_event_id', models.BigIntegerField(default=0, editable=False)),
+                ('last_delivered_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('consecutive_failures', models.PositiveIntegerField(default=0, editable=False)),
+                ('next_attempt_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('last_error', models.CharField(blank=True, editable=False, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('reseller', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='webhook_endpoints', to='reseller.reseller')),
+            ],
+            options={
+                'db_table': 'webhook_endpoints',
+            },
+        ),
+    ]
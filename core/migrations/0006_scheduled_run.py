@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-18 23:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledRun',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('scheduled_for', models.DateTimeField()),
+                ('status', models.CharField(choices=[('enqueued', 'Enqueued'), ('done', 'Done'), ('failed', 'Failed')], default='enqueued', max_length=20)),
+                ('enqueued_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.job')),
+            ],
+            options={
+                'db_table': 'scheduled_runs',
+                'constraints': [models.UniqueConstraint(fields=('name', 'scheduled_for'), name='scheduled_runs_window_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-19 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_scheduled_run'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tombstone',
+            name='department_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='reseller_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['model', 'department_id', 'deleted_at', 'id'], name='tombstones_department_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['model', 'reseller_id', 'deleted_at', 'id'], name='tombstones_reseller_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.1 on 2026-10-19 00:02
+
+from django.db import migrations, models
+
+
+def set_xid_default(apps, schema_editor):
+    # Transaction ids are Postgres only; other databases keep 0, see core/webhooks.py
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('ALTER TABLE outbox_events ALTER COLUMN transaction_xid '
+                          'SET DEFAULT pg_current_xact_id()::text::bigint')
+
+
+def reset_xid_default(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('ALTER TABLE outbox_events ALTER COLUMN transaction_xid SET DEFAULT 0')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_tombstone_scope'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='transaction_xid',
+            field=models.BigIntegerField(db_default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='webhookendpoint',
+            name='last_event_xid',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(fields=['transaction_xid', 'id'], name='outbox_events_xid_idx'),
+        ),
+        migrations.RunPython(set_xid_default, reset_xid_default),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-19 00:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_outbox_transaction_xid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TombstoneAudience',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('user_id', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'tombstone_audience',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='tombstone',
+            name='tombstones_department_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tombstone',
+            name='tombstones_reseller_idx',
+        ),
+        migrations.RemoveField(
+            model_name='tombstone',
+            name='department_id',
+        ),
+        migrations.RemoveField(
+            model_name='tombstone',
+            name='reseller_id',
+        ),
+        migrations.AddField(
+            model_name='tombstoneaudience',
+            name='tombstone',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='audience', to='core.tombstone'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstoneaudience',
+            index=models.Index(fields=['user_id', 'tombstone'], name='tombstone_audience_user_idx'),
+        ),
+    ]
@@ -0,0 +1,192 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Tombstone(models.Model):
+    """
+    Records a deleted row so delta sync clients (see core/sync.py) can
+    drop it. Pruned after ``DELTA_SYNC['TOMBSTONE_RETENTION_DAYS']``.
+    """
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=100)  # e.g. 'department.department'
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'tombstones'
+        indexes = [
+            models.Index(fields=['model', 'deleted_at', 'id'], name='tombstones_model_deleted_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted at {self.deleted_at}"
+
+
+class TombstoneAudience(models.Model):
+    """
+    A user who could see a row when it was deleted, and so gets its
+    tombstone (see core/sync.py)
+    """
+    id = models.BigAutoField(primary_key=True)
+    tombstone = models.ForeignKey(Tombstone, on_delete=models.CASCADE, related_name='audience')
+    # Not a foreign key, the user may be deleted along with the row
+    user_id = models.IntegerField()
+    
+    class Meta:
+        db_table = 'tombstone_audience'
+        indexes = [
+            models.Index(fields=['user_id', 'tombstone'], name='tombstone_audience_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.tombstone} for user {self.user_id}"
+
+
+class OutboxEvent(models.Model):
+    """
+    A subscription, transaction, service access or membership change,
+    written in the same transaction as the change itself (see
+    core/outbox.py), pushed to the webhook endpoints by
+    ``manage.py deliver_webhooks`` and relayed by the live event stream.
+    """
+    id = models.BigAutoField(primary_key=True)
+    event_type = models.CharField(max_length=50)  # e.g. 'subscription.created'
+    object_id = models.BigIntegerField()
+    # Plain columns rather than foreign keys, events outlive their rows
+    department_id = models.IntegerField(null=True, blank=True)
+    reseller_id = models.IntegerField(null=True, blank=True)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now)
+    # Id of the writing transaction, filled in by Postgres (the column default
+    # is pg_current_xact_id(), see core/webhooks.py), 0 on other databases
+    transaction_xid = models.BigIntegerField(db_default=0, editable=False)
+    
+    class Meta:
+        db_table = 'outbox_events'
+        indexes = [
+            models.Index(fields=['transaction_xid', 'id'], name='outbox_events_xid_idx'),
+            models.Index(fields=['department_id', 'id'], name='outbox_events_department_idx'),
+            models.Index(fields=['reseller_id', 'id'], name='outbox_events_reseller_idx'),
+            models.Index(fields=['created_at'], name='outbox_events_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} {self.object_id}"
+
+
+class WebhookEndpoint(models.Model):
+    """
+    An integrator URL receiving outbox events in batches. Delivery state
+    (cursor, failures, backoff) is kept on the row, see core/webhooks.py.
+    """
+    id = models.BigAutoField(primary_key=True)
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=100, help_text="Key for the X-Webhook-Signature HMAC")
+    # Empty means every event type
+    event_types = models.JSONField(default=list, blank=True)
+    # Only events of this reseller's subscriptions, all events if empty
+    reseller = models.ForeignKey('reseller.Reseller', on_delete=models.CASCADE,
+                                 related_name='webhook_endpoints', null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    # Delivery cursor, the (transaction_xid, id) of the last delivered event
+    last_event_xid = models.BigIntegerField(default=0, editable=False)
+    last_event_id = models.BigIntegerField(default=0, editable=False)
+    last_delivered_at = models.DateTimeField(null=True, blank=True, editable=False)
+    consecutive_failures = models.PositiveIntegerField(default=0, editable=False)
+    next_attempt_at = models.DateTimeField(null=True, blank=True, editable=False)
+    last_error = models.CharField(max_length=255, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'webhook_endpoints'
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.last_event_id:
+            # New endpoints start with the next event, not the whole history
+            latest = OutboxEvent.objects.order_by('-transaction_xid', '-id').values_list(
+                'transaction_xid', 'id').first()
+            self.last_event_xid, self.last_event_id = latest or (0, 0)
+        super().save(*args, **kwargs)
+    
+    def __str__(self):
+        return self.url
+
+
+class Job(models.Model):
+    """
+    A background job, run by ``manage.py run_worker`` (see core/jobs.py).
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    
+    id = models.BigAutoField(primary_key=True)
+    queue = models.CharField(max_length=50, default='default')
+    task = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # Higher runs first
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    # Not before this time; retries are pushed back here
+    run_at = models.DateTimeField(default=timezone.now)
+    # A running job whose worker stops extending this is queued again
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'jobs'
+        indexes = [
+            models.Index(fields=['queue', '-priority', 'run_at', 'id'], condition=models.Q(status='queued'),
+                         name='jobs_queued_idx'),
+            models.Index(fields=['locked_until'], condition=models.Q(status='running'), name='jobs_running_idx'),
+            models.Index(fields=['finished_at'], name='jobs_finished_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.task} #{self.id} ({self.status})"
+
+
+class ScheduledRun(models.Model):
+    """
+    One firing of a ``SCHEDULE`` entry (see core/scheduler.py). A window
+    fires at most once, whichever scheduler node gets there first.
+    """
+    STATUS_CHOICES = (
+        ('enqueued', 'Enqueued'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    
+    id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=100)
+    # The cron window this run is for, not when it was fired
+    scheduled_for = models.DateTimeField()
+    job = models.ForeignKey(Job, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='enqueued')
+    enqueued_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'scheduled_runs'
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'scheduled_for'], name='scheduled_runs_window_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} at {self.scheduled_for:%Y-%m-%d %H:%M} ({self.status})"
+    
+    @property
+    def duration(self):
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
@@ -0,0 +1,130 @@
+"""
+Transactional outbox for subscription and membership events.
+
+Every save or delete of a model in ``OUTBOX_MODELS`` writes an
+``OutboxEvent`` in the same transaction as the row itself, so an event
+exists if and only if the change committed. ``manage.py deliver_webhooks``
+pushes the events to the integrators' endpoints (see core/webhooks.py) and
+the live event stream relays them to admin UIs (see core/live.py).
+
+Events are named ``<prefix>.created``, ``<prefix>.updated`` and
+``<prefix>.deleted`` and carry the row as the model's API serializer
+renders it, without expansions.
+
+Deletes are covered by ``post_delete``, which Django sends inside the
+deletion's transaction. ``post_save`` runs after ``Model.save`` returns,
+so the models also use ``OutboxMixin`` to put the save and the event in
+one transaction. ``bulk_create`` and ``QuerySet.update`` send no signals,
+paths using them call ``record_events`` themselves.
+"""
+from django.apps import apps
+from django.db import router, transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils.module_loading import import_string
+
+from .models import OutboxEvent
+
+# label -> (event prefix, serializer rendering the payload, how the event is scoped)
+#
+# Events carry a department and a reseller, used by the webhook filters and
+# the live stream: 'own' reads them off the row, 'subscription' off the row's
+# subscription, 'department' takes the reseller the department is a customer of.
+OUTBOX_MODELS = {
+    'service_package.Subscription': ('subscription', 'service_package.serializers.SubscriptionSerializer', 'own'),
+    'service_package.Transaction': ('transaction', 'service_package.serializers.TransactionSerializer',
+                                    'subscription'),
+    'service_package.ServiceAccess': ('service_access', 'service_package.serializers.ServiceAccessSerializer',
+                                      'subscription'),
+    'department.DepartmentUser': ('department_user', 'department.serializers.DepartmentUserSerializer',
+                                  'department'),
+    'department.DepartmentAdmin': ('department_admin', 'department.serializers.DepartmentAdminSerializer',
+                                   'department'),
+}
+
+
+class OutboxMixin:
+    """Model mixin saving the row and its outbox event in one transaction"""
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+
+def _scopes(instances):
+    """
+    ``(department_id, reseller_id)`` for each instance, with at most one
+    query per kind of lookup whatever the number of instances
+    """
+    from reseller.models import ResellerCustomer
+    from service_package.models import Subscription
+
+    kinds = [OUTBOX_MODELS[instance._meta.label][2] for instance in instances]
+    subscription_ids = {
+        instance.subscription_id for instance, kind in zip(instances, kinds)
+        if kind == 'subscription' and not type(instance).subscription.is_cached(instance)
+    }
+    subscriptions = {
+        pk: (department_id, reseller_id)
+        for pk, department_id, reseller_id in Subscription.objects.filter(pk__in=subscription_ids).values_list(
+            'pk', 'department_id', 'reseller_id')
+    } if subscription_ids else {}
+    department_ids = {instance.department_id for instance, kind in zip(instances, kinds) if kind == 'department'}
+    customers = dict(
+        ResellerCustomer.objects.filter(department_id__in=department_ids, is_active=True).values_list(
+            'department_id', 'reseller_id')
+    ) if department_ids else {}
+
+    scopes = []
+    for instance, kind in zip(instances, kinds):
+        if kind == 'own':
+            scopes.append((instance.department_id, instance.reseller_id))
+        elif kind == 'department':
+            scopes.append((instance.department_id, customers.get(instance.department_id)))
+        elif type(instance).subscription.is_cached(instance):
+            scopes.append((instance.subscription.department_id, instance.subscription.reseller_id))
+        else:
+            scopes.append(subscriptions.get(instance.subscription_id, (None, None)))
+    return scopes
+
+
+def build_events(instances, action):
+    """Return the unsaved ``OutboxEvent`` for ``action`` on each of ``instances``"""
+    events = []
+    for instance, (department_id, reseller_id) in zip(instances, _scopes(instances)):
+        prefix, serializer_path, _ = OUTBOX_MODELS[instance._meta.label]
+        events.append(OutboxEvent(
+            event_type=f'{prefix}.{action}',
+            object_id=instance.pk,
+            department_id=department_id,
+            reseller_id=reseller_id,
+            payload=import_string(serializer_path)(instance).data,
+        ))
+    return events
+
+
+def event_data(event):
+    """The JSON shape of an event, as webhooks and the live stream send it"""
+    return {'id': event.id, 'type': event.event_type, 'created_at': event.created_at, 'data': event.payload}
+
+
+def record_events(instances, action):
+    """Write outbox events for rows saved without signals (``bulk_create``, ``update``)"""
+    return OutboxEvent.objects.bulk_create(build_events(list(instances), action))
+
+
+def _saved(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    build_events([instance], 'created' if created else 'updated')[0].save(using=using)
+
+
+def _deleted(sender, instance, using=None, **kwargs):
+    build_events([instance], 'deleted')[0].save(using=using)
+
+
+def connect_outbox():
+    for label in OUTBOX_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(_saved, sender=model, dispatch_uid=f'outbox:saved:{label}')
+        post_delete.connect(_deleted, sender=model, dispatch_uid=f'outbox:deleted:{label}')
@@ -0,0 +1,86 @@
+"""
+Run independent pieces of a request concurrently, each on a database
+connection of its own.
+
+    profile, subscriptions = run_parallel([
+        (load_profile, (user,)),
+        (load_subscriptions, (user, 10)),
+    ])
+
+The first call runs on the calling thread, the others on a per-process
+pool of ``PARALLEL['WORKERS']`` threads, each in a copy of the caller's
+context (replica routing and read-your-writes carry over, see
+core/db_router.py). Inside a transaction, or with no workers, everything
+runs on the calling thread, since other connections wouldn't see the
+transaction's writes. Results come back in order; the first exception
+raised is re-raised once every call has finished.
+"""
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+
+def get_parallel_settings():
+    options = {
+        # 0 runs everything on the calling thread
+        'WORKERS': 4,
+    }
+    options.update(getattr(settings, 'PARALLEL', {}))
+    return options
+
+
+_executor = None
+_pid = None
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _pid
+    if _pid != os.getpid():
+        with _lock:
+            if _pid != os.getpid():
+                workers = get_parallel_settings()['WORKERS']
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='parallel') if workers else None
+                _pid = os.getpid()
+    return _executor
+
+
+def _run_on_pool(function, args):
+    close_old_connections()
+    try:
+        return function(*args)
+    finally:
+        # Gives pooled connections back; persistent ones stay with the thread
+        close_old_connections()
+
+
+def run_parallel(calls):
+    """Run ``(function, args)`` pairs concurrently and return their results in order"""
+    calls = list(calls)
+    executor = _get_executor()
+    if len(calls) < 2 or executor is None or connection.in_atomic_block:
+        return [function(*args) for function, args in calls]
+
+    futures = [
+        executor.submit(contextvars.copy_context().run, _run_on_pool, function, args)
+        for function, args in calls[1:]
+    ]
+    results = [None] * len(calls)
+    error = None
+    try:
+        function, args = calls[0]
+        results[0] = function(*args)
+    except Exception as e:
+        error = e
+    for index, future in enumerate(futures, 1):
+        try:
+            results[index] = future.result()
+        except Exception as e:
+            error = error or e
+    if error is not None:
+        raise error
+    return results
@@ -0,0 +1,202 @@
+"""
+Tenant-aware response cache for DRF views.
+
+Views opt in with ``@cache_response``:
+
+    @cache_response('reseller', tenant_kwarg='pk')
+    def retrieve(self, request, *args, **kwargs):
+        ...
+
+Entries are keyed by the view, the tenant (reseller or department id taken
+from the URL kwargs), the caller's authorization scope and the full query
+string. Every (namespace, tenant) pair has a version number; the model
+signals in ``core.dependencies`` bump it once a save/delete commits, which
+orphans the cached entries for exactly that tenant. Bumping before the
+commit would let a concurrent miss read the old rows and cache them under
+the new version.
+
+Misses are computed once per key (see ``core.singleflight``), and with
+``stale_timeout`` an expired entry keeps being served while one caller
+refreshes it.
+"""
+import hashlib
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from . import singleflight
+from .bus import publish_cache_delete
+from .db_router import use_primary
+
+DEFAULT_TIMEOUT = 5 * 60
+
+_stats = defaultdict(lambda: {'hits': 0, 'stale': 0, 'coalesced': 0, 'misses': 0})
+_stats_lock = threading.Lock()
+
+
+def _version_key(namespace, tenant):
+    return f'resp:version:{namespace}:{tenant}'
+
+
+def get_versions(namespace_tenants):
+    """Return the current version of each (namespace, tenant) pair"""
+    keys = [_version_key(namespace, tenant) for namespace, tenant in namespace_tenants]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    for key in missing:
+        # Start from the clock so an evicted version never repeats an old one
+        cache.add(key, time.time_ns(), None)
+    if missing:
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, 0) for key in keys]
+
+
+def invalidate_many(namespace_tenants):
+    """
+    Orphan every cached response for the given (namespace, tenant) pairs,
+    here and, through the invalidation bus, in the other workers
+    """
+    keys = [_version_key(namespace, tenant) for namespace, tenant in namespace_tenants]
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+    publish_cache_delete(keys)
+
+
+def invalidate_on_commit(namespace_tenants, using=None):
+    """``invalidate_many`` once the current transaction commits (right away outside one)"""
+    namespace_tenants = set(namespace_tenants)
+    transaction.on_commit(lambda: invalidate_many(namespace_tenants), using=using)
+
+
+def invalidate(namespace, tenant):
+    """Orphan every cached response for ``tenant`` in ``namespace``"""
+    invalidate_many([(namespace, tenant)])
+
+
+def get_auth_scope(request):
+    """
+    Cache partition for the caller. Root admins share one partition, everyone
+    else gets their own, since permission checks ran before the cached data
+    was produced.
+    """
+    user = request.user
+    if getattr(user, 'is_root_admin', False):
+        return 'root'
+    return f'user:{user.pk}'
+
+
+def _record(view_name, outcome):
+    with _stats_lock:
+        _stats[view_name][outcome] += 1
+
+
+def get_stats():
+    """Hit/miss counters and hit ratio per cached view in this process"""
+    with _stats_lock:
+        snapshot = {name: dict(counts) for name, counts in _stats.items()}
+    for counts in snapshot.values():
+        served = counts['hits'] + counts['stale']
+        total = served + counts['coalesced'] + counts['misses']
+        counts['hit_ratio'] = round(served / total, 4) if total else 0.0
+    return snapshot
+
+
+def cache_response(*namespaces, tenant_kwarg=None, timeout=DEFAULT_TIMEOUT, scope=get_auth_scope,
+                   stale_timeout=0, dependencies=None, permission=None):
+    """
+    Cache successful responses of a DRF view method per tenant and caller
+    scope, invalidated through ``namespaces``.
+
+    Views whose data depends on the caller rather than on the URL pass
+    ``dependencies`` instead, a callable ``(view, request)`` returning the
+    (namespace, tenant) pairs to key the entry on.
+
+    Entries stay fresh for ``timeout`` seconds. For ``stale_timeout``
+    seconds after that they are still served (``X-Cache: STALE``) while a
+    single request recomputes them.
+
+    Checks inside ``method`` only run on a miss, so access that can be
+    revoked without touching the cached namespaces belongs in
+    ``permission``: a callable ``(view, request, *args, **kwargs)`` run
+    before every lookup, returning an error response or ``None``.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            if permission is not None:
+                denied = permission(view, request, *args, **kwargs)
+                if denied is not None:
+                    return denied
+
+            view_name = f'{type(view).__name__}.{method.__name__}'
+            if dependencies is not None:
+                pairs = sorted(set(dependencies(view, request)), key=str)
+                tenant = ','.join(f'{namespace}:{tenant}' for namespace, tenant in pairs)
+            else:
+                tenant = kwargs.get(tenant_kwarg)
+                pairs = [(namespace, tenant) for namespace in namespaces]
+            versions = get_versions(pairs)
+            raw_key = '|'.join([
+                view_name,
+                str(tenant),
+                scope(request),
+                ','.join(str(version) for version in versions),
+                request.get_full_path(),
+            ])
+            key = 'resp:' + hashlib.sha1(raw_key.encode()).hexdigest()
+            own = []
+
+            def compute():
+                # Never fill the cache from a replica that may still lag
+                # behind the write that invalidated it
+                with use_primary():
+                    response = method(view, request, *args, **kwargs)
+                own.append(response)
+                if response.status_code != 200:
+                    return singleflight.NOT_SHARED
+                cache.set(key, (response.data, time.time() + timeout), timeout + stale_timeout)
+                return response.data
+
+            def fresh():
+                entry = cache.get(key)
+                if entry is not None and entry[1] > time.time():
+                    return entry[0]
+                return None
+
+            entry = cache.get(key)
+            if entry is not None:
+                data, fresh_until = entry
+                if fresh_until > time.time():
+                    _record(view_name, 'hits')
+                    return Response(data, headers={'X-Cache': 'HIT'})
+                with singleflight.try_lead(key + ':refresh') as leading:
+                    if not leading:
+                        _record(view_name, 'stale')
+                        return Response(data, headers={'X-Cache': 'STALE'})
+                    _record(view_name, 'misses')
+                    compute()
+                    response = own[0]
+            else:
+                data = singleflight.do(key, compute, recheck=fresh)
+                _record(view_name, 'misses' if own else 'coalesced')
+                if own:
+                    response = own[0]
+                elif data is singleflight.NOT_SHARED:
+                    # The leader's response was an error, don't share it
+                    response = method(view, request, *args, **kwargs)
+                else:
+                    response = Response(data)
+
+            if response.status_code == 200:
+                response['X-Cache'] = 'MISS' if own else 'HIT'
+            return response
+        return wrapper
+    return decorator
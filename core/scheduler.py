@@ -0,0 +1,288 @@
+"""
+Periodic jobs, fired by ``manage.py run_scheduler``.
+
+``SCHEDULE`` in settings maps a name to a cron expression and a task
+registered with ``@task`` (see core/jobs.py):
+
+    SCHEDULE = {
+        'expire-subscriptions': {'cron': '5 0 * * *', 'task': 'service_package.expire_subscriptions'},
+        'repair-counters': {'cron': '0 4 * * 0', 'task': 'core.repair_counters', 'kwargs': {'batch_size': 1000}},
+    }
+
+Cron expressions have the usual five fields (minute, hour, day of month,
+month, day of week with Sunday as 0 or 7) taking ``*``, lists, ranges and
+``/`` steps, or one of ``@hourly``, ``@daily``, ``@weekly``, ``@monthly``,
+``@yearly``. They are read in ``TIME_ZONE``. The scheduler doesn't run
+anything itself, it enqueues a job for each window and the workers run it.
+
+Any number of nodes can run the scheduler, the one holding a Postgres
+advisory lock (``pg_try_advisory_lock``) leads and fires the jobs, the
+others retry every tick and take over when the leader's session goes away.
+Each firing is a ``ScheduledRun`` row, unique per name and window and
+written in the same transaction as its job, so a window fires once even if
+two nodes briefly both believe they lead. Workers record the run's outcome
+and duration on it.
+
+After downtime the windows missed since an entry's last run are fired, at
+most ``MAX_CATCH_UP_DAYS`` back: all of them with ``'catch_up': 'all'``,
+only the most recent with ``'catch_up': 'latest'``, the default, which
+suits jobs working off the current state. An entry that never ran starts
+from when the scheduler started.
+"""
+import collections
+import datetime
+import logging
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+from django.utils import timezone
+
+from .jobs import get_task
+from .models import ScheduledRun
+
+logger = logging.getLogger(__name__)
+
+
+def get_scheduler_settings():
+    options = {
+        'TICK': 5,
+        'MAX_CATCH_UP_DAYS': 7,
+        # Runs fired per entry and tick when catching up with 'all'
+        'MAX_CATCH_UP_RUNS': 100,
+        # Deployments sharing a database need distinct keys
+        'LOCK_KEY': zlib.crc32(b'core.scheduler'),
+        'HISTORY_DAYS': 90,
+    }
+    options.update(getattr(settings, 'SCHEDULER', {}))
+    return options
+
+
+ALIASES = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *',
+    '@yearly': '0 0 1 1 *',
+}
+
+# name, lowest and highest value of each field
+FIELDS = (('minute', 0, 59), ('hour', 0, 23), ('day of month', 1, 31), ('month', 1, 12), ('day of week', 0, 7))
+
+
+def _parse_field(field, low, high):
+    values = set()
+    for item in field.split(','):
+        step = 1
+        if '/' in item:
+            item, step = item.split('/', 1)
+            step = int(step)
+        if item == '*':
+            start, end = low, high
+        elif '-' in item:
+            start, end = (int(value) for value in item.split('-', 1))
+        else:
+            start = int(item)
+            # '5/15' means from 5 on, every 15
+            end = high if step > 1 else start
+        if step < 1 or not low <= start <= end <= high:
+            raise ValueError(item)
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class Cron:
+    """A five field cron expression"""
+
+    def __init__(self, expression):
+        self.expression = expression
+        fields = ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != len(FIELDS):
+            raise ImproperlyConfigured(f"Cron expression {expression!r} should have {len(FIELDS)} fields")
+        values = []
+        for field, (name, low, high) in zip(fields, FIELDS):
+            try:
+                values.append(_parse_field(field, low, high))
+            except ValueError:
+                raise ImproperlyConfigured(f"Invalid {name} {field!r} in cron expression {expression!r}")
+        self.minutes, self.hours, self.days, self.months, weekdays = values
+        self.weekdays = {day % 7 for day in weekdays}
+        # As in cron, when both day fields are restricted either may match
+        self.either_day = not fields[2].startswith('*') and not fields[4].startswith('*')
+
+    def __repr__(self):
+        return f'Cron({self.expression!r})'
+
+    def _day_matches(self, moment):
+        in_month = moment.day in self.days
+        in_week = moment.isoweekday() % 7 in self.weekdays
+        return in_month or in_week if self.either_day else in_month and in_week
+
+    def next_after(self, moment):
+        """The first window strictly after ``moment``, None if there is none within five years"""
+        zone = timezone.get_current_timezone()
+        current = timezone.localtime(moment, zone).replace(tzinfo=None, second=0, microsecond=0)
+        current += datetime.timedelta(minutes=1)
+        limit = current + datetime.timedelta(days=5 * 366)
+        while current < limit:
+            if current.month not in self.months:
+                current = (current.replace(day=1, hour=0, minute=0) + datetime.timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(current):
+                current = current.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+            elif current.hour not in self.hours:
+                current = current.replace(minute=0) + datetime.timedelta(hours=1)
+            elif current.minute not in self.minutes:
+                current += datetime.timedelta(minutes=1)
+            else:
+                return timezone.make_aware(current, zone)
+        return None
+
+
+class Entry(collections.namedtuple('Entry', 'name cron task kwargs catch_up')):
+    """A ``SCHEDULE`` entry"""
+
+
+def get_schedule():
+    """The ``SCHEDULE`` entries, raises ``ImproperlyConfigured`` on a malformed one"""
+    entries = []
+    for name, definition in getattr(settings, 'SCHEDULE', {}).items():
+        if 'cron' not in definition or 'task' not in definition:
+            raise ImproperlyConfigured(f"Schedule entry {name!r} needs a 'cron' and a 'task'")
+        catch_up = definition.get('catch_up', 'latest')
+        if catch_up not in ('all', 'latest'):
+            raise ImproperlyConfigured(f"Schedule entry {name!r}: catch_up should be 'all' or 'latest'")
+        entries.append(Entry(name, Cron(definition['cron']), definition['task'],
+                             definition.get('kwargs', {}), catch_up))
+    return entries
+
+
+class Leadership:
+    """
+    Leader election through a session level advisory lock, taken on a
+    connection of its own so it never ends up in the connection pool.
+    Other databases have no such lock, there the scheduler assumes it is
+    the only one running.
+    """
+
+    def __init__(self, key, using=DEFAULT_DB_ALIAS):
+        self.key = key
+        self.using = using
+        self.lock_connection = None
+        self.is_leader = False
+
+    def check(self):
+        """Whether this node leads, trying to take the lock when it doesn't"""
+        wrapper = connections[self.using]
+        if wrapper.vendor != 'postgresql':
+            self.is_leader = True
+            return True
+        try:
+            if self.lock_connection is None:
+                self.lock_connection = wrapper.Database.connect(**wrapper.get_connection_params(), autocommit=True)
+            if self.is_leader:
+                # The lock lives as long as the session, make sure it still does
+                self.lock_connection.execute('SELECT 1')
+            else:
+                self.is_leader = self.lock_connection.execute(
+                    'SELECT pg_try_advisory_lock(%s)', [self.key]).fetchone()[0]
+        except wrapper.Database.Error:
+            logger.warning("Scheduler lock connection failed", exc_info=True)
+            self.release()
+        return self.is_leader
+
+    def release(self):
+        self.is_leader = False
+        if self.lock_connection is not None:
+            try:
+                # Ending the session releases the lock
+                self.lock_connection.close()
+            except Exception:
+                pass
+            self.lock_connection = None
+
+
+def due_windows(entry, last, now, options):
+    """The windows of ``entry`` to fire at ``now``, oldest first, given its last fired window"""
+    windows = []
+    window = entry.cron.next_after(max(last, now - datetime.timedelta(days=options['MAX_CATCH_UP_DAYS'])))
+    while window is not None and window <= now:
+        if entry.catch_up == 'latest':
+            windows = [window]
+        else:
+            windows.append(window)
+            if len(windows) >= options['MAX_CATCH_UP_RUNS']:
+                break
+        window = entry.cron.next_after(window)
+    return windows
+
+
+def fire(entry, window):
+    """Enqueue the job for ``entry``'s ``window``, returns the run or None if it already fired"""
+    try:
+        with transaction.atomic():
+            job = get_task(entry.task).enqueue(**entry.kwargs)
+            return ScheduledRun.objects.create(name=entry.name, scheduled_for=window, job=job)
+    except IntegrityError:
+        return None
+
+
+class Scheduler:
+    def __init__(self, entries, options=None):
+        self.entries = entries
+        self.options = options or get_scheduler_settings()
+        self.started_at = timezone.now()
+
+    def tick(self, now=None):
+        """Fire every entry's due windows, returns the runs created"""
+        now = now or timezone.now()
+        runs = []
+        for entry in self.entries:
+            # Read every time, another node may have led since the last tick
+            last = ScheduledRun.objects.filter(name=entry.name).order_by('-scheduled_for').values_list(
+                'scheduled_for', flat=True).first()
+            for window in due_windows(entry, last or self.started_at, now, self.options):
+                run = fire(entry, window)
+                if run is not None:
+                    runs.append(run)
+        return runs
+
+
+def get_schedule_status(recent=20):
+    """
+    Per entry its cron, task and next window, the last run, and the median
+    and longest duration of its ``recent`` last finished runs
+    """
+    now = timezone.now()
+    status = {}
+    for entry in get_schedule():
+        runs = list(ScheduledRun.objects.filter(name=entry.name).order_by('-scheduled_for')[:recent])
+        durations = sorted(run.duration.total_seconds() for run in runs if run.duration is not None)
+        next_window = entry.cron.next_after(now)
+        status[entry.name] = {
+            'cron': entry.cron.expression,
+            'task': entry.task,
+            'next_run': next_window,
+            'last_run': {
+                'scheduled_for': runs[0].scheduled_for,
+                'status': runs[0].status,
+                'started_at': runs[0].started_at,
+                'finished_at': runs[0].finished_at,
+                'duration_seconds': runs[0].duration.total_seconds() if runs[0].duration is not None else None,
+            } if runs else None,
+            'duration_seconds_p50': durations[len(durations) // 2] if durations else None,
+            'duration_seconds_max': durations[-1] if durations else None,
+            'failed_recently': sum(run.status == 'failed' for run in runs),
+        }
+    return status
+
+
+def prune_runs():
+    """Delete runs older than ``HISTORY_DAYS``, keeping each entry's latest, returns how many"""
+    cutoff = timezone.now() - datetime.timedelta(days=get_scheduler_settings()['HISTORY_DAYS'])
+    latest = [
+        ScheduledRun.objects.filter(name=name).order_by('-scheduled_for').values_list('id', flat=True).first()
+        for name in ScheduledRun.objects.values_list('name', flat=True).distinct()
+    ]
+    deleted, _ = ScheduledRun.objects.filter(scheduled_for__lt=cutoff).exclude(id__in=latest).delete()
+    return deleted
@@ -0,0 +1,172 @@
+"""
+Substring search backed by pg_trgm indexes.
+
+``icontains`` compiles to ``UPPER(col::text) LIKE UPPER('%term%')`` on
+Postgres, which no btree index can serve. The search columns get a GIN
+trigram index on exactly that expression, so the plain lookup is
+index-backed:
+
+    CREATE INDEX CONCURRENTLY departments_name_trgm ON departments
+        USING gin (UPPER(name::text) gin_trgm_ops);
+
+The indexes are built concurrently so the tables stay writable while
+they build, which can't happen in a transaction: their migrations set
+``atomic = False``.
+
+Two entry points use it:
+
+- ``SearchMixin`` adds a ``search/`` route to a ViewSet, ranking the
+  matches of ``?q=`` in its ``trigram_search_fields`` by trigram word
+  similarity. Rows are scoped and shaped like the list endpoint.
+- ``TrigramSearchAdminMixin`` runs admin ``search_fields`` that cross
+  relations as ``<relation>__in`` subqueries on the related table, where
+  the index is, instead of an OR over a join the planner can only scan.
+
+Terms shorter than three characters have no trigram to look up; the API
+rejects them. Other databases get the same results from unindexed
+``icontains`` scans, ranked by exact and prefix matches.
+"""
+import operator
+from functools import reduce
+
+from django.conf import settings
+from django.contrib.admin.utils import get_fields_from_path, lookup_spawns_duplicates
+from django.db import connections
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils.text import smart_split, unescape_string_literal
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from myproject.readers import get_values_reader
+
+
+def get_search_settings():
+    options = {
+        'MIN_LENGTH': 3,
+        'LIMIT': 20,
+    }
+    options.update(getattr(settings, 'SEARCH', {}))
+    return options
+
+
+def _index_name(table, column):
+    return f'{table}_{column}_trgm'
+
+
+def _is_invalid(schema_editor, name):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)',
+                       [schema_editor.quote_name(name)])
+        row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def install_trigram_indexes(schema_editor, table, columns):
+    """
+    Create the trigram indexes for ``columns`` of ``table`` concurrently,
+    for migrations with ``atomic = False``
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    quote = schema_editor.quote_name
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in columns:
+        name = _index_name(table, column)
+        # An interrupted concurrent build leaves an invalid index behind
+        if _is_invalid(schema_editor, name):
+            schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {quote(name)}')
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote(name)} ON {quote(table)} '
+            f'USING gin (UPPER({quote(column)}::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(schema_editor, table, columns):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in columns:
+        schema_editor.execute(
+            f'DROP INDEX CONCURRENTLY IF EXISTS {schema_editor.quote_name(_index_name(table, column))}'
+        )
+
+
+def search_condition(fields, term):
+    """Q matching rows where any of ``fields`` contains ``term``"""
+    return reduce(operator.or_, (Q(**{f'{field}__icontains': term}) for field in fields))
+
+
+def search_rank(fields, term, using='default'):
+    """Expression ranking how well ``fields`` match ``term``, higher is better"""
+    if connections[using].vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        ranks = [TrigramWordSimilarity(Value(term), field) for field in fields]
+    else:
+        ranks = [
+            Case(
+                When(**{f'{field}__iexact': term}, then=Value(1.0)),
+                When(**{f'{field}__istartswith': term}, then=Value(0.5)),
+                default=Value(0.1),
+                output_field=FloatField(),
+            )
+            for field in fields
+        ]
+    return ranks[0] if len(ranks) == 1 else Greatest(*ranks)
+
+
+class SearchMixin:
+    """
+    ViewSet mixin adding a ranked ``search/?q=`` route over
+    ``trigram_search_fields``, see the module docstring.
+    """
+    trigram_search_fields = ()
+
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        options = get_search_settings()
+        term = request.query_params.get('q', '').strip()
+        if len(term) < options['MIN_LENGTH']:
+            return Response({"error": f"q should be at least {options['MIN_LENGTH']} characters"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        pk_name = queryset.model._meta.pk.name
+        fields = self.trigram_search_fields
+        queryset = queryset.filter(search_condition(fields, term)).annotate(
+            search_rank=search_rank(fields, term, using=queryset.db),
+        ).order_by('-search_rank', pk_name)[:options['LIMIT']]
+
+        serializer_class = self.get_serializer_class()
+        reader = get_values_reader(serializer_class, request)
+        if reader is not None:
+            results = reader.read(queryset)
+        else:
+            results = serializer_class(queryset, many=True, context=self.get_serializer_context()).data
+        return Response({"results": results})
+
+
+class TrigramSearchAdminMixin:
+    """
+    ModelAdmin mixin matching each of ``search_fields`` through the related
+    table's own index, see the module docstring. Terms combine like the
+    stock admin search: every term has to match one of the fields.
+    """
+    def get_search_results(self, request, queryset, search_term):
+        fields = self.get_search_fields(request)
+        if not search_term or not fields or any(field[0] in '^=@$' for field in fields):
+            return super().get_search_results(request, queryset, search_term)
+
+        for bit in smart_split(search_term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            queryset = queryset.filter(reduce(operator.or_, (self._search_field(field, bit) for field in fields)))
+        may_have_duplicates = any(lookup_spawns_duplicates(self.opts, field) for field in fields)
+        return queryset, may_have_duplicates
+
+    def _search_field(self, field, term):
+        relation, _, name = field.rpartition('__')
+        if not relation:
+            return Q(**{f'{name}__icontains': term})
+        related = get_fields_from_path(self.model, relation)[-1].related_model
+        return Q(**{f'{relation}__in': related._default_manager.filter(**{f'{name}__icontains': term}).values('pk')})
@@ -0,0 +1,178 @@
+"""
+Single-flight execution for expensive reads.
+
+When a cache entry expires under load, every concurrent request would
+otherwise recompute it at once. ``do(key, fn)`` lets one caller per key
+compute while the others wait:
+
+- within a process, followers block on the leader's call and share its
+  result (or exception);
+- across processes, when the result lands in a shared cache, the leader
+  holds a Postgres advisory lock on the key while computing. Leaders in
+  other workers wait for that lock and then call ``recheck()`` (the cache
+  read) before computing themselves.
+
+Waiting is bounded by ``timeout``; a caller that gives up computes the
+value itself rather than failing the request.
+"""
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.response import Response
+
+DEFAULT_WAIT = 10.0
+POLL_INTERVAL = 0.05
+
+# Result of a call whose response must not be shared with followers
+NOT_SHARED = object()
+
+_calls = {}
+_calls_lock = threading.Lock()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def lock_id(key):
+    """Map ``key`` onto the signed 64-bit space of Postgres advisory locks"""
+    return int.from_bytes(hashlib.sha1(key.encode()).digest()[:8], 'big', signed=True)
+
+
+@contextmanager
+def advisory_lock(key, timeout=DEFAULT_WAIT, using=DEFAULT_DB_ALIAS):
+    """
+    Hold the session-level advisory lock for ``key``, waiting up to
+    ``timeout`` seconds (0 tries once). Yields whether the lock was taken.
+    Databases without advisory locks always yield True.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        yield True
+        return
+
+    lock = lock_id(key)
+    deadline = time.monotonic() + timeout
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [lock])
+            acquired = cursor.fetchone()[0]
+            if acquired or time.monotonic() >= deadline:
+                break
+            time.sleep(POLL_INTERVAL)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [lock])
+
+
+def do(key, fn, recheck=None, timeout=DEFAULT_WAIT):
+    """
+    Return ``fn()``, computed once for all concurrent callers of ``key``.
+
+    ``recheck`` returns the value another process may have produced while
+    this one waited for the advisory lock, or None to compute it. Without
+    it there is nothing to share between processes and no lock is taken.
+    """
+    with _calls_lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+
+    if not leader:
+        if not call.done.wait(timeout):
+            return fn()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        if recheck is None:
+            result = fn()
+        else:
+            with advisory_lock(key, timeout):
+                result = recheck()
+                if result is None:
+                    result = fn()
+        call.result = result
+        return result
+    except Exception as error:
+        call.error = error
+        raise
+    finally:
+        with _calls_lock:
+            _calls.pop(key, None)
+        call.done.set()
+
+
+@contextmanager
+def try_lead(key):
+    """
+    Claim ``key`` without waiting, e.g. to refresh a stale entry while
+    other callers keep serving it. Yields whether this caller got it.
+    """
+    with _calls_lock:
+        claimed = key not in _calls
+        if claimed:
+            call = _calls[key] = _Call()
+    if not claimed:
+        yield False
+        return
+
+    try:
+        with advisory_lock(key, timeout=0) as acquired:
+            yield acquired
+    finally:
+        with _calls_lock:
+            _calls.pop(key, None)
+        call.done.set()
+
+
+def single_flight(key_func=None, timeout=DEFAULT_WAIT):
+    """
+    Coalesce concurrent identical requests to a DRF view method.
+
+    Requests with the same key (by default the view, the caller's cache
+    scope and the full path) share one 200 response; other statuses are
+    never shared and each follower runs the view itself.
+    """
+    from .response_cache import get_auth_scope
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            if key_func is not None:
+                key = key_func(view, request, *args, **kwargs)
+            else:
+                key = '|'.join([
+                    f'{type(view).__name__}.{method.__name__}',
+                    get_auth_scope(request),
+                    request.get_full_path(),
+                ])
+            key = 'flight:' + key
+            own = []
+
+            def compute():
+                response = method(view, request, *args, **kwargs)
+                own.append(response)
+                return response.data if response.status_code == 200 else NOT_SHARED
+
+            data = do(key, compute, timeout=timeout)
+            if own:
+                return own[0]
+            if data is NOT_SHARED:
+                return method(view, request, *args, **kwargs)
+            return Response(data)
+        return wrapper
+    return decorator
+
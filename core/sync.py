@@ -0,0 +1,255 @@
+"""
+Delta sync for list endpoints.
+
+ViewSets using ``DeltaSyncMixin`` get a ``changes/`` route returning the
+rows changed since a watermark, plus tombstones for rows deleted since:
+
+    GET /api/departments/departments/changes/?updated_since=2025-06-01T00:00:00Z
+    {
+        "results": [...],                       # same shape as the list endpoint
+        "deleted": [{"department_id": 4, "deleted_at": "..."}],
+        "next_cursor": "...",
+        "has_more": false
+    }
+
+Clients follow ``next_cursor`` (``?cursor=``) while ``has_more`` is true,
+keep the last one, and poll with it later. Pages are keyset-paginated on
+``(updated_at, pk)`` and ``(deleted_at, id)``, both indexed, so a poll
+that finds nothing costs two index probes.
+
+Tombstones are scoped like the list. Root admins see every tombstone; for
+everyone else the users who could see the row are recorded with it in
+``pre_delete``, while the memberships and admin roles granting access
+still exist, so deleting a tenant (which cascades those away) still
+reaches its admins and members, and nobody else learns its IDs. A row
+that leaves the caller's scope without being deleted (a membership or
+admin role removed, a customer moving to another reseller) produces no
+tombstone. Clients drop such rows with a full re-fetch, or by checking the
+IDs they hold against ``lookup/``, which reports them as missing.
+
+Rows are only reported once their timestamp is ``SETTLE_SECONDS`` old:
+``updated_at`` is set before commit, so a slow transaction can commit a
+timestamp older than rows already handed out. Reads stay on the primary
+for the same reason. Watermarks older than ``TOMBSTONE_RETENTION_DAYS``
+get 410 Gone, the client has to re-fetch the full list.
+"""
+import base64
+import datetime
+import json
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.signals import post_delete, pre_delete
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from myproject.readers import get_values_reader
+
+from .models import Tombstone, TombstoneAudience
+
+
+def _department_audience(department, using):
+    """Admins and members of the department"""
+    from department.models import DepartmentAdmin, DepartmentUser
+
+    admins = DepartmentAdmin.objects.using(using).filter(department_id=department.pk).values_list('user_id')
+    members = DepartmentUser.objects.using(using).filter(department_id=department.pk).values_list('user_id')
+    return admins.union(members)
+
+
+def _reseller_audience(reseller, using):
+    from reseller.models import ResellerAdmin
+
+    return ResellerAdmin.objects.using(using).filter(reseller_id=reseller.pk).values_list('user_id')
+
+
+def _subscription_audience(subscription, using):
+    """The department's admins and the admins of the resellers listing it as a customer"""
+    from department.models import DepartmentAdmin
+    from reseller.models import ResellerAdmin, ResellerCustomer
+
+    department_id = subscription.department_id
+    admins = DepartmentAdmin.objects.using(using).filter(department_id=department_id).values_list('user_id')
+    resellers = ResellerCustomer.objects.using(using).filter(department_id=department_id).values('reseller_id')
+    reseller_admins = ResellerAdmin.objects.using(using).filter(reseller_id__in=resellers).values_list('user_id')
+    return admins.union(reseller_admins)
+
+
+# Models whose deletes are recorded -> who gets the tombstone besides root
+# admins, None for rows every caller sees
+SYNC_MODELS = {
+    'department.Department': _department_audience,
+    'reseller.Reseller': _reseller_audience,
+    'service_package.ServicePackage': None,
+    'service_package.Subscription': _subscription_audience,
+}
+
+
+class InvalidPosition(Exception):
+    pass
+
+
+def get_sync_settings():
+    options = {
+        'PAGE_SIZE': 500,
+        'SETTLE_SECONDS': 5,
+        'TOMBSTONE_RETENTION_DAYS': 30,
+    }
+    options.update(getattr(settings, 'DELTA_SYNC', {}))
+    return options
+
+
+def record_audience(sender, instance, using=None, **kwargs):
+    # Before the delete cascades away the rows granting access
+    audience = SYNC_MODELS[sender._meta.label]
+    if audience is not None:
+        instance._sync_audience = {user_id for user_id, in audience(instance, using)}
+
+
+def record_tombstone(sender, instance, using=None, **kwargs):
+    tombstone = Tombstone.objects.using(using).create(model=sender._meta.label_lower, object_id=instance.pk)
+    TombstoneAudience.objects.using(using).bulk_create(
+        TombstoneAudience(tombstone=tombstone, user_id=user_id)
+        for user_id in getattr(instance, '_sync_audience', ())
+    )
+
+
+def connect_tombstones():
+    for label in SYNC_MODELS:
+        model = apps.get_model(label)
+        pre_delete.connect(record_audience, sender=model, dispatch_uid=f'sync:audience:{label}')
+        post_delete.connect(record_tombstone, sender=model, dispatch_uid=f'sync:tombstone:{label}')
+
+
+def prune_tombstones():
+    """Delete tombstones past the retention period, returns how many"""
+    cutoff = timezone.now() - datetime.timedelta(days=get_sync_settings()['TOMBSTONE_RETENTION_DAYS'])
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
+
+
+def encode_cursor(updated, deleted):
+    position = {
+        'u': [updated[0].isoformat(), updated[1]],
+        'd': [deleted[0].isoformat(), deleted[1]],
+    }
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode()).decode()
+
+
+def _parse_timestamp(value):
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise InvalidPosition("updated_since must be an ISO 8601 timestamp")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, datetime.timezone.utc)
+    return parsed
+
+
+def decode_cursor(cursor):
+    """Return the ((updated_at, pk), (deleted_at, id)) positions in ``cursor``"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (
+            (_parse_timestamp(position['u'][0]), int(position['u'][1])),
+            (_parse_timestamp(position['d'][0]), int(position['d'][1])),
+        )
+    except (ValueError, KeyError, IndexError, TypeError, InvalidPosition):
+        raise InvalidPosition("Invalid cursor")
+
+
+def _after(queryset, timestamp_field, pk_field, position):
+    timestamp, pk = position
+    return queryset.filter(
+        Q(**{f'{timestamp_field}__gt': timestamp})
+        | Q(**{timestamp_field: timestamp, f'{pk_field}__gt': pk})
+    )
+
+
+class DeltaSyncMixin:
+    """
+    ViewSet mixin adding a ``changes/`` route for incremental sync, see the
+    module docstring. The changed rows are scoped like the list endpoint,
+    the tombstones by the audience recorded at delete time (see
+    ``SYNC_MODELS``).
+    """
+    sync_timestamp_field = 'updated_at'
+
+    def get_changes_queryset(self):
+        return self.filter_queryset(self.get_queryset())
+
+    def scope_tombstones(self, tombstones):
+        """The ``tombstones`` the caller may see: all for root admins, else those recorded for them"""
+        user = self.request.user
+        if user.is_root_admin:
+            return tombstones
+        return tombstones.filter(audience__user_id=user.pk)
+
+    @action(detail=False, methods=['get'], url_path='changes')
+    def changes(self, request):
+        options = get_sync_settings()
+        model = self.get_queryset().model
+        pk_name = model._meta.pk.name
+        try:
+            if 'cursor' in request.query_params:
+                updated, deleted = decode_cursor(request.query_params['cursor'])
+            elif 'updated_since' in request.query_params:
+                since = _parse_timestamp(request.query_params['updated_since'])
+                # Rows at exactly the watermark are included, repeats are harmless
+                updated = deleted = (since, 0)
+            else:
+                return Response({"error": "updated_since or cursor is required"},
+                                status=status.HTTP_400_BAD_REQUEST)
+        except InvalidPosition as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        now = timezone.now()
+        if min(updated[0], deleted[0]) < now - datetime.timedelta(days=options['TOMBSTONE_RETENTION_DAYS']):
+            return Response({"error": "Watermark is older than the tombstone retention, re-fetch the full list"},
+                            status=status.HTTP_410_GONE)
+        settled = now - datetime.timedelta(seconds=options['SETTLE_SECONDS'])
+        limit = options['PAGE_SIZE']
+        timestamp_field = self.sync_timestamp_field
+
+        queryset = _after(self.get_changes_queryset(), timestamp_field, pk_name, updated)
+        queryset = queryset.filter(**{f'{timestamp_field}__lte': settled}).order_by(timestamp_field, pk_name)
+        serializer_class = self.get_serializer_class()
+        reader = get_values_reader(serializer_class, request)
+        if reader is not None:
+            rows = list(queryset.values_list(timestamp_field, pk_name, *reader.paths)[:limit + 1])
+            more_updated = len(rows) > limit
+            rows = rows[:limit]
+            results = reader.build(row[2:] for row in rows)
+            if rows:
+                updated = (rows[-1][0], rows[-1][1])
+        else:
+            instances = list(queryset[:limit + 1])
+            more_updated = len(instances) > limit
+            instances = instances[:limit]
+            results = serializer_class(instances, many=True, context=self.get_serializer_context()).data
+            if instances:
+                updated = (getattr(instances[-1], timestamp_field), instances[-1].pk)
+
+        tombstones = self.scope_tombstones(Tombstone.objects.filter(model=model._meta.label_lower))
+        tombstones = _after(tombstones, 'deleted_at', 'id', deleted)
+        tombstones = list(
+            tombstones.filter(deleted_at__lte=settled).order_by('deleted_at', 'id')
+            .values_list('deleted_at', 'id', 'object_id')[:limit + 1]
+        )
+        more_deleted = len(tombstones) > limit
+        tombstones = tombstones[:limit]
+        if tombstones:
+            deleted = (tombstones[-1][0], tombstones[-1][1])
+
+        return Response({
+            "results": results,
+            "deleted": [{pk_name: object_id, "deleted_at": deleted_at} for deleted_at, _, object_id in tombstones],
+            "next_cursor": encode_cursor(updated, deleted),
+            "has_more": more_updated or more_deleted,
+        })
@@ -0,0 +1,45 @@
+"""
+Maintenance tasks for the job queue (see core/jobs.py), the same work as
+the matching management commands.
+"""
+from django.db import DEFAULT_DB_ALIAS
+
+from .counters import COUNTERS, repair
+from .jobs import prune_jobs, task
+from .scheduler import prune_runs
+from .sync import prune_tombstones
+from .webhooks import deliver_once, prune_outbox
+
+
+@task(name='core.deliver_webhooks', queue='webhooks')
+def deliver_webhooks():
+    """Deliver every batch that is due, one round per full batch"""
+    more = True
+    while more:
+        _, _, more = deliver_once()
+
+
+@task(name='core.prune_tombstones')
+def prune_tombstones_task():
+    prune_tombstones()
+
+
+@task(name='core.prune_outbox')
+def prune_outbox_task():
+    prune_outbox()
+
+
+@task(name='core.prune_jobs')
+def prune_jobs_task():
+    prune_jobs()
+
+
+@task(name='core.prune_scheduled_runs')
+def prune_scheduled_runs():
+    prune_runs()
+
+
+@task(name='core.repair_counters')
+def repair_counters(batch_size=5000):
+    for counter in COUNTERS:
+        repair(counter, using=DEFAULT_DB_ALIAS, batch_size=batch_size)
@@ -0,0 +1,630 @@
+import asyncio
+import datetime
+import json
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from department.models import Department, DepartmentAdmin, DepartmentUser
+from reseller.models import Reseller, ResellerAdmin, ResellerCustomer
+from service_package.models import ServicePackage, Subscription
+from user.models import User
+
+from .counters import COUNTERS, repair
+from .jobs import claim, enqueue, requeue_expired, retry_delay, run_job, task
+from . import live, webhooks
+from .models import Job, OutboxEvent, WebhookEndpoint
+from .response_cache import get_versions, invalidate_on_commit
+from .scheduler import Cron, Entry, due_windows
+from .sync import InvalidPosition, decode_cursor, encode_cursor
+
+UTC = datetime.timezone.utc
+
+
+def at(*args):
+    return datetime.datetime(*args, tzinfo=UTC)
+
+
+@task(name='core.tests.failing')
+def failing():
+    raise RuntimeError("Task failed")
+
+
+class CronParsingTests(SimpleTestCase):
+    def test_fields(self):
+        cron = Cron('*/15 9-17 1,15 * 1-5')
+        self.assertEqual(cron.minutes, {0, 15, 30, 45})
+        self.assertEqual(cron.hours, set(range(9, 18)))
+        self.assertEqual(cron.days, {1, 15})
+        self.assertEqual(cron.months, set(range(1, 13)))
+        self.assertEqual(cron.weekdays, {1, 2, 3, 4, 5})
+
+    def test_step_from_start(self):
+        self.assertEqual(Cron('5/20 * * * *').minutes, {5, 25, 45})
+        self.assertEqual(Cron('0 0-12/6 * * *').hours, {0, 6, 12})
+
+    def test_sunday_is_0_or_7(self):
+        self.assertEqual(Cron('0 0 * * 7').weekdays, {0})
+        self.assertEqual(Cron('0 0 * * 5-7').weekdays, {5, 6, 0})
+
+    def test_aliases(self):
+        daily = Cron('@daily')
+        self.assertEqual((daily.minutes, daily.hours), ({0}, {0}))
+        self.assertEqual(Cron('@weekly').weekdays, {0})
+
+    def test_invalid(self):
+        for expression in ('60 * * * *', '* * * *', '* * * * * *', '*/0 * * * *', 'a * * * *',
+                           '5-1 * * * *', '0 0 0 * *', '0 0 * 13 *', '0 0 * * 8'):
+            with self.subTest(expression=expression), self.assertRaises(ImproperlyConfigured):
+                Cron(expression)
+
+
+class CronScheduleTests(SimpleTestCase):
+    def setUp(self):
+        zone = timezone.override(UTC)
+        zone.__enter__()
+        self.addCleanup(zone.__exit__, None, None, None)
+
+    def test_next_after_is_strictly_after(self):
+        cron = Cron('0 * * * *')
+        self.assertEqual(cron.next_after(at(2026, 3, 1, 10, 0)), at(2026, 3, 1, 11, 0))
+        self.assertEqual(cron.next_after(at(2026, 3, 1, 10, 0, 30)), at(2026, 3, 1, 11, 0))
+        self.assertEqual(cron.next_after(at(2026, 3, 1, 9, 59, 59)), at(2026, 3, 1, 10, 0))
+
+    def test_skips_months_without_the_day(self):
+        self.assertEqual(Cron('0 0 31 * *').next_after(at(2026, 1, 31)), at(2026, 3, 31))
+
+    def test_day_of_month_or_day_of_week(self):
+        # Both restricted: the 1st or a Friday, as in cron
+        cron = Cron('0 0 1 * 5')
+        self.assertEqual(cron.next_after(at(2026, 2, 27)), at(2026, 3, 1))   # Sunday the 1st
+        self.assertEqual(cron.next_after(at(2026, 3, 1)), at(2026, 3, 6))    # Friday
+
+    def test_single_day_field(self):
+        self.assertEqual(Cron('0 0 13 * *').next_after(at(2026, 3, 1)), at(2026, 3, 13))
+        self.assertEqual(Cron('0 0 * * 5').next_after(at(2026, 3, 1)), at(2026, 3, 6))
+
+    def test_starred_day_field_with_step_combines_with_and(self):
+        # '*/2' counts as unrestricted: odd days that are also Fridays
+        self.assertEqual(Cron('0 0 */2 * 5').next_after(at(2026, 3, 1)), at(2026, 3, 13))
+
+    def test_no_window(self):
+        self.assertIsNone(Cron('0 0 30 2 *').next_after(at(2026, 1, 1)))
+
+
+class DueWindowsTests(SimpleTestCase):
+    options = {'MAX_CATCH_UP_DAYS': 7, 'MAX_CATCH_UP_RUNS': 100}
+
+    def setUp(self):
+        zone = timezone.override(UTC)
+        zone.__enter__()
+        self.addCleanup(zone.__exit__, None, None, None)
+
+    def entry(self, catch_up):
+        return Entry('hourly', Cron('0 * * * *'), 'core.tests.failing', {}, catch_up)
+
+    def test_nothing_due(self):
+        self.assertEqual(due_windows(self.entry('all'), at(2026, 3, 1, 3), at(2026, 3, 1, 3, 30), self.options), [])
+
+    def test_catch_up_all(self):
+        windows = due_windows(self.entry('all'), at(2026, 3, 1, 0), at(2026, 3, 1, 3, 30), self.options)
+        self.assertEqual(windows, [at(2026, 3, 1, 1), at(2026, 3, 1, 2), at(2026, 3, 1, 3)])
+
+    def test_catch_up_latest(self):
+        windows = due_windows(self.entry('latest'), at(2026, 3, 1, 0), at(2026, 3, 1, 3, 30), self.options)
+        self.assertEqual(windows, [at(2026, 3, 1, 3)])
+
+    def test_window_at_now_is_due(self):
+        windows = due_windows(self.entry('all'), at(2026, 3, 1, 2), at(2026, 3, 1, 3), self.options)
+        self.assertEqual(windows, [at(2026, 3, 1, 3)])
+
+    def test_runs_per_tick_are_capped(self):
+        options = dict(self.options, MAX_CATCH_UP_RUNS=2)
+        windows = due_windows(self.entry('all'), at(2026, 3, 1, 0), at(2026, 3, 1, 3, 30), options)
+        self.assertEqual(windows, [at(2026, 3, 1, 1), at(2026, 3, 1, 2)])
+
+    def test_catch_up_is_bounded(self):
+        options = dict(self.options, MAX_CATCH_UP_DAYS=1)
+        windows = due_windows(self.entry('all'), at(2026, 2, 1), at(2026, 3, 1, 3, 30), options)
+        self.assertEqual(windows[0], at(2026, 2, 28, 4))
+        self.assertEqual(len(windows), 24)
+
+
+class SyncCursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        updated = (at(2026, 3, 1, 10, 0, 0, 123456), 42)
+        deleted = (at(2026, 2, 1), 7)
+        self.assertEqual(decode_cursor(encode_cursor(updated, deleted)), (updated, deleted))
+
+    def test_cursor_is_url_safe(self):
+        cursor = encode_cursor((at(2026, 3, 1), 2 ** 40), (at(2026, 3, 1), 0))
+        self.assertRegex(cursor, r'^[A-Za-z0-9_=-]+$')
+
+    def test_invalid(self):
+        for cursor in ('', 'not-a-cursor', 'e30=', encode_cursor((at(2026, 3, 1), 1), (at(2026, 3, 1), 1))[:-4]):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidPosition):
+                decode_cursor(cursor)
+
+
+class JobRetryTests(TransactionTestCase):
+    options = {'RETRY_BASE_SECONDS': 10, 'RETRY_MAX_SECONDS': 60}
+
+    def test_retry_delay_doubles_up_to_the_cap(self):
+        self.assertEqual([retry_delay(attempts, self.options) for attempts in range(1, 6)], [10, 20, 40, 60, 60])
+
+    @override_settings(JOBS=options)
+    def test_failure_is_retried_later(self):
+        job = enqueue('core.tests.failing', max_attempts=2)
+        claimed, = claim(['default'], 10, 'worker-1', 60)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertFalse(run_job(claimed, 'worker-1'))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), ('queued', 1, ''))
+        self.assertGreaterEqual(job.run_at, timezone.now() + datetime.timedelta(seconds=9))
+        self.assertIn("Task failed", job.last_error)
+        # Not due again before the backoff
+        self.assertEqual(claim(['default'], 10, 'worker-1', 60), [])
+
+    @override_settings(JOBS=options)
+    def test_last_attempt_fails(self):
+        job = enqueue('core.tests.failing', max_attempts=1)
+        claimed, = claim(['default'], 10, 'worker-1', 60)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            run_job(claimed, 'worker-1')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIsNotNone(job.finished_at)
+
+    def test_claimed_job_is_hidden_until_its_lock_expires(self):
+        job = enqueue('core.tests.failing')
+        self.assertEqual([claimed.pk for claimed in claim(['default'], 10, 'worker-1', 60)], [job.pk])
+        self.assertEqual(claim(['default'], 10, 'worker-2', 60), [])
+        self.assertEqual(requeue_expired(), 0)
+
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertEqual(requeue_expired(), 1)
+        claimed, = claim(['default'], 10, 'worker-2', 60)
+        self.assertEqual((claimed.pk, claimed.attempts, claimed.locked_by), (job.pk, 2, 'worker-2'))
+
+    def test_expired_job_out_of_attempts_fails(self):
+        job = enqueue('core.tests.failing', max_attempts=1)
+        claim(['default'], 10, 'worker-1', 60)
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertEqual(requeue_expired(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+    def test_claim_order(self):
+        low = enqueue('core.tests.failing')
+        high = enqueue('core.tests.failing', priority=5)
+        other_queue = enqueue('core.tests.failing', queue='webhooks')
+        later = enqueue('core.tests.failing', run_at=timezone.now() + datetime.timedelta(hours=1))
+        claimed = [job.pk for job in claim(['default'], 10, 'worker-1', 60)]
+        self.assertEqual(claimed, [high.pk, low.pk])
+        self.assertNotIn(other_queue.pk, claimed)
+        self.assertNotIn(later.pk, claimed)
+
+
+class ResponseCacheInvalidationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reseller = Reseller.objects.create(name='Reseller')
+        cls.department = Department.objects.create(name='Department')
+        ResellerCustomer.objects.create(reseller=cls.reseller, department=cls.department)
+        cls.user = User.objects.create_user('user@example.com', 'User', 'unused')
+
+    def setUp(self):
+        cache.clear()
+
+    def assertBumped(self, pairs, write):
+        before = get_versions(pairs)
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        for pair, old, new in zip(pairs, before, get_versions(pairs)):
+            with self.subTest(pair=pair):
+                self.assertNotEqual(old, new)
+
+    def test_bumped_once_committed(self):
+        pairs = [('reseller', self.reseller.pk)]
+        before = get_versions(pairs)
+        with self.captureOnCommitCallbacks() as callbacks:
+            invalidate_on_commit(pairs)
+            self.assertEqual(get_versions(pairs), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_versions(pairs), before)
+
+    def test_reseller_admin(self):
+        self.assertBumped(
+            [('reseller', self.reseller.pk), ('reseller_customers', self.reseller.pk),
+             ('dashboard', f'user:{self.user.pk}')],
+            lambda: ResellerAdmin.objects.create(user=self.user, reseller=self.reseller),
+        )
+
+    def test_department_admin_reaches_the_reseller(self):
+        self.assertBumped(
+            [('department', self.department.pk), ('reseller', self.reseller.pk),
+             ('reseller_customers', self.reseller.pk), ('dashboard', f'reseller:{self.reseller.pk}')],
+            lambda: DepartmentAdmin.objects.create(user=self.user, department=self.department),
+        )
+
+    def test_admin_rename_reaches_managed_departments(self):
+        DepartmentAdmin.objects.create(user=self.user, department=self.department)
+        self.user.full_name = 'Renamed'
+        self.assertBumped([('department', self.department.pk)], self.user.save)
+
+    def test_other_tenants_untouched(self):
+        other = Reseller.objects.create(name='Other')
+        pairs = [('reseller', other.pk), ('reseller_customers', other.pk)]
+        before = get_versions(pairs)
+        with self.captureOnCommitCallbacks(execute=True):
+            ResellerAdmin.objects.create(user=self.user, reseller=self.reseller)
+        self.assertEqual(get_versions(pairs), before)
+
+
+class CounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name='Department')
+        cls.users = [User.objects.create_user(f'user{i}@example.com', f'User {i}', None) for i in range(3)]
+        cls.reseller = Reseller.objects.create(name='Reseller')
+        cls.package = ServicePackage.objects.create(name='Package', description='Text', price='9.90')
+
+    def counts(self, instance, *columns):
+        return tuple(type(instance).objects.values_list(*columns).get(pk=instance.pk))
+
+    def subscribe(self, reseller, status='active'):
+        today = datetime.date(2026, 3, 1)
+        return Subscription.objects.create(
+            department=self.department, service_package=self.package, start_date=today, end_date=today,
+            status=status, reseller=reseller,
+        )
+
+    def test_insert_and_delete(self):
+        membership = DepartmentUser.objects.create(user=self.users[0], department=self.department)
+        DepartmentAdmin.objects.create(user=self.users[0], department=self.department)
+        self.assertEqual(self.counts(self.department, 'user_count', 'admin_count'), (1, 1))
+        membership.delete()
+        self.assertEqual(self.counts(self.department, 'user_count', 'admin_count'), (0, 1))
+
+    def test_bulk_create_counts_inserted_rows_only(self):
+        DepartmentUser.objects.create(user=self.users[0], department=self.department)
+        DepartmentUser.objects.bulk_create(
+            [DepartmentUser(user=user, department=self.department) for user in self.users],
+            ignore_conflicts=True,
+        )
+        self.assertEqual(self.counts(self.department, 'user_count'), (3,))
+
+    def test_cascade(self):
+        DepartmentUser.objects.create(user=self.users[0], department=self.department)
+        self.users[0].delete()
+        self.assertEqual(self.counts(self.department, 'user_count'), (0,))
+
+    def test_status_flips_through_update(self):
+        subscriptions = [self.subscribe(self.reseller) for _ in range(3)]
+        self.subscribe(self.reseller, status='pending')
+        self.assertEqual(self.counts(self.reseller, 'active_subscription_count'), (3,))
+
+        Subscription.objects.filter(pk__in=[s.pk for s in subscriptions[:2]]).update(status='expired')
+        self.assertEqual(self.counts(self.reseller, 'active_subscription_count'), (1,))
+        Subscription.objects.update(status='active')
+        self.assertEqual(self.counts(self.reseller, 'active_subscription_count'), (4,))
+
+    def test_moving_between_resellers(self):
+        other = Reseller.objects.create(name='Other')
+        subscription = self.subscribe(self.reseller)
+        Subscription.objects.filter(pk=subscription.pk).update(reseller=other)
+        self.assertEqual(self.counts(self.reseller, 'active_subscription_count'), (0,))
+        self.assertEqual(self.counts(other, 'active_subscription_count'), (1,))
+
+    def test_reseller_set_null(self):
+        other = Reseller.objects.create(name='Other')
+        self.subscribe(self.reseller)
+        self.subscribe(other)
+        # The subscriptions outlive their reseller (on_delete=SET_NULL)
+        self.reseller.delete()
+        self.assertEqual(Subscription.objects.filter(reseller=None).count(), 1)
+        self.assertEqual(self.counts(other, 'active_subscription_count'), (1,))
+
+        Subscription.objects.filter(reseller=other).update(reseller=None)
+        self.assertEqual(self.counts(other, 'active_subscription_count'), (0,))
+
+    def test_save_keeps_the_counters(self):
+        stale = Department.objects.get(pk=self.department.pk)
+        DepartmentUser.objects.create(user=self.users[0], department=self.department)
+        stale.name = 'Renamed'
+        stale.save()
+        self.assertEqual(self.counts(self.department, 'name', 'user_count'), ('Renamed', 1))
+
+    def test_repair_after_drift(self):
+        DepartmentUser.objects.create(user=self.users[0], department=self.department)
+        ResellerCustomer.objects.create(reseller=self.reseller, department=self.department)
+        Department.objects.update(user_count=7)
+        Reseller.objects.update(customer_count=0)
+
+        self.assertEqual({counter.column: repair(counter) for counter in COUNTERS}, {
+            'user_count': 1, 'admin_count': 0, 'customer_count': 1, 'active_subscription_count': 0,
+        })
+        self.assertEqual(self.counts(self.department, 'user_count'), (1,))
+        self.assertEqual(self.counts(self.reseller, 'customer_count'), (1,))
+        self.assertEqual([repair(counter) for counter in COUNTERS], [0, 0, 0, 0])
+
+    def test_repair_in_batches(self):
+        departments = Department.objects.bulk_create(Department(name=f'Department {i}') for i in range(5))
+        Department.objects.update(user_count=3)
+        self.assertEqual(repair(COUNTERS[0], batch_size=2), len(departments) + 1)
+        self.assertFalse(Department.objects.exclude(user_count=0).exists())
+
+
+@override_settings(DELTA_SYNC={'SETTLE_SECONDS': 0})
+class TombstoneScopeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.root = User.objects.create_user('root@example.com', 'Root', None, is_root_admin=True)
+        cls.department_admin = User.objects.create_user('admin@example.com', 'Admin', None)
+        cls.member = User.objects.create_user('member@example.com', 'Member', None)
+        cls.reseller_admin = User.objects.create_user('reseller@example.com', 'Reseller', None, is_reseller_admin=True)
+        cls.outsider = User.objects.create_user('outsider@example.com', 'Outsider', None, is_reseller_admin=True)
+
+        cls.department = Department.objects.create(name='Department')
+        DepartmentAdmin.objects.create(user=cls.department_admin, department=cls.department)
+        DepartmentUser.objects.create(user=cls.member, department=cls.department)
+        cls.reseller = Reseller.objects.create(name='Reseller')
+        ResellerAdmin.objects.create(user=cls.reseller_admin, reseller=cls.reseller)
+        ResellerCustomer.objects.create(reseller=cls.reseller, department=cls.department)
+        ResellerAdmin.objects.create(user=cls.outsider, reseller=Reseller.objects.create(name='Other'))
+
+        today = datetime.date(2026, 3, 1)
+        cls.subscription = Subscription.objects.create(
+            department=cls.department, service_package=ServicePackage.objects.create(
+                name='Package', description='Text', price='9.90'),
+            start_date=today, end_date=today, status='active', reseller=cls.reseller,
+        )
+
+    def deleted(self, user, url):
+        client = APIClient()
+        client.force_authenticate(user)
+        since = (timezone.now() - datetime.timedelta(hours=1)).isoformat()
+        response = client.get(url, {'updated_since': since})
+        self.assertEqual(response.status_code, 200)
+        return [next(value for key, value in row.items() if key != 'deleted_at') for row in response.data['deleted']]
+
+    def test_deleted_department_reaches_its_admins_and_members(self):
+        department_id = self.department.pk
+        self.department.delete()
+        url = '/api/departments/departments/changes/'
+        for user in (self.root, self.department_admin, self.member):
+            with self.subTest(user=user.email):
+                self.assertEqual(self.deleted(user, url), [department_id])
+        self.assertEqual(self.deleted(self.outsider, url), [])
+
+    def test_deleted_reseller_reaches_its_admins(self):
+        reseller_id = self.reseller.pk
+        self.reseller.delete()
+        url = '/api/resellers/resellers/changes/'
+        self.assertEqual(self.deleted(self.reseller_admin, url), [reseller_id])
+        self.assertEqual(self.deleted(self.outsider, url), [])
+
+    def test_cascaded_subscriptions(self):
+        subscription_id = self.subscription.pk
+        self.department.delete()
+        url = '/api/services/subscriptions/changes/'
+        for user in (self.root, self.department_admin, self.reseller_admin):
+            with self.subTest(user=user.email):
+                self.assertEqual(self.deleted(user, url), [subscription_id])
+        for user in (self.member, self.outsider):
+            with self.subTest(user=user.email):
+                self.assertEqual(self.deleted(user, url), [])
+
+    def test_later_members_get_nothing(self):
+        subscription_id = self.subscription.pk
+        self.subscription.delete()
+        newcomer = User.objects.create_user('newcomer@example.com', 'Newcomer', None)
+        DepartmentAdmin.objects.create(user=newcomer, department=self.department)
+        url = '/api/services/subscriptions/changes/'
+        self.assertEqual(self.deleted(self.department_admin, url), [subscription_id])
+        self.assertEqual(self.deleted(newcomer, url), [])
+
+
+@override_settings(WEBHOOKS={'SETTLE_SECONDS': 0, 'BATCH_SIZE': 3, 'RETRY_BASE_SECONDS': 10, 'RETENTION_DAYS': 7})
+class WebhookTests(TestCase):
+    def setUp(self):
+        self.endpoint = WebhookEndpoint.objects.create(url='http://hooks.example.com/in', secret='secret')
+        self.requests = []
+        self.status = 200
+
+    async def post(self, url, body, headers, timeout):
+        self.requests.append((url, json.loads(body), headers))
+        return self.status
+
+    def event(self, xid=0, event_type='subscription.created', reseller_id=None, age=None):
+        event = OutboxEvent.objects.create(event_type=event_type, object_id=1, payload={}, reseller_id=reseller_id)
+        changes = {'transaction_xid': xid}
+        if age is not None:
+            changes['created_at'] = timezone.now() - age
+        OutboxEvent.objects.filter(pk=event.pk).update(**changes)
+        return event.pk
+
+    def deliver(self):
+        with mock.patch.object(webhooks, 'post', self.post):
+            return webhooks.deliver_once()
+
+    def refresh(self):
+        self.endpoint.refresh_from_db()
+        return self.endpoint
+
+    def test_pending_events_follow_the_transaction_order(self):
+        late = self.event(xid=20)
+        first = self.event(xid=10)
+        second = self.event(xid=10)
+        pending = lambda: list(webhooks.pending_events(self.refresh()).values_list('pk', flat=True))  # noqa: E731
+        self.assertEqual(pending(), [first, second, late])
+
+        WebhookEndpoint.objects.filter(pk=self.endpoint.pk).update(last_event_xid=10, last_event_id=first)
+        self.assertEqual(pending(), [second, late])
+        # Nothing from transactions still in progress
+        self.assertEqual(list(webhooks.pending_events(self.endpoint, horizon=20).values_list('pk', flat=True)),
+                         [second])
+
+    def test_pending_events_filters(self):
+        reseller = Reseller.objects.create(name='Reseller')
+        WebhookEndpoint.objects.filter(pk=self.endpoint.pk).update(
+            event_types=['subscription.updated'], reseller=reseller,
+        )
+        self.event(event_type='subscription.created', reseller_id=reseller.pk)
+        self.event(event_type='subscription.updated')
+        wanted = self.event(event_type='subscription.updated', reseller_id=reseller.pk)
+        self.assertEqual(list(webhooks.pending_events(self.refresh()).values_list('pk', flat=True)), [wanted])
+
+    def test_retry_delay_backs_off(self):
+        options = {'RETRY_BASE_SECONDS': 10, 'RETRY_MAX_SECONDS': 60}
+        for failures, ceiling in ((1, 10), (2, 20), (3, 40), (4, 60), (10, 60)):
+            with self.subTest(failures=failures):
+                delay = webhooks.retry_delay(failures, options)
+                self.assertTrue(ceiling / 2 <= delay <= ceiling)
+
+    def test_delivery_advances_the_cursor(self):
+        events = [self.event() for _ in range(4)]
+        self.assertEqual(self.deliver(), (3, 0, True))
+        url, body, headers = self.requests[0]
+        self.assertEqual([event['id'] for event in body['events']], events[:3])
+        self.assertTrue(headers['X-Webhook-Signature'].startswith('sha256='))
+        self.assertEqual(self.refresh().last_event_id, events[2])
+
+        self.assertEqual(self.deliver(), (1, 0, False))
+        self.assertEqual(self.refresh().last_event_id, events[3])
+        self.assertEqual(self.deliver(), (0, 0, False))
+
+    def test_failure_keeps_the_cursor_and_backs_off(self):
+        self.event()
+        self.status = 500
+        with self.assertLogs('core.webhooks', 'WARNING'):
+            self.assertEqual(self.deliver(), (0, 1, False))
+        endpoint = self.refresh()
+        self.assertEqual((endpoint.last_event_id, endpoint.consecutive_failures, endpoint.last_error),
+                         (0, 1, 'HTTP 500'))
+        self.assertGreater(endpoint.next_attempt_at, timezone.now() + datetime.timedelta(seconds=4))
+
+        # Not due before the backoff runs out, then retried
+        self.status = 200
+        self.assertEqual(self.deliver(), (0, 0, False))
+        WebhookEndpoint.objects.filter(pk=endpoint.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(self.deliver(), (1, 0, False))
+        self.assertEqual((self.refresh().consecutive_failures, self.endpoint.next_attempt_at), (0, None))
+
+    def test_prune_keeps_undelivered_events(self):
+        old = datetime.timedelta(days=8)
+        delivered = self.event(age=old)
+        WebhookEndpoint.objects.filter(pk=self.endpoint.pk).update(last_event_id=delivered)
+        undelivered = self.event(age=old)
+        recent = self.event()
+
+        with self.assertLogs('core.webhooks', 'ERROR') as logs:
+            self.assertEqual(webhooks.prune_outbox(), 1)
+        self.assertIn('http://hooks.example.com/in', logs.output[0])
+        self.assertEqual(set(OutboxEvent.objects.values_list('pk', flat=True)), {undelivered, recent})
+
+        # Events the endpoint doesn't subscribe to, or for inactive endpoints, go
+        WebhookEndpoint.objects.filter(pk=self.endpoint.pk).update(event_types=['transaction.created'])
+        self.assertEqual(webhooks.prune_outbox(), 1)
+        WebhookEndpoint.objects.filter(pk=self.endpoint.pk).update(event_types=[], is_active=False)
+        self.assertEqual(webhooks.prune_outbox(), 0)
+        self.assertEqual(list(OutboxEvent.objects.values_list('pk', flat=True)), [recent])
+
+
+@override_settings(LIVE_EVENTS={'POLL_INTERVAL': 0.01, 'SETTLE_SECONDS': 0, 'HEARTBEAT_SECONDS': 5,
+                                'QUEUE_SIZE': 3, 'REPLAY_LIMIT': 3})
+class LiveStreamTests(TransactionTestCase):
+    def event(self, department_id=None, reseller_id=None, xid=0):
+        event = OutboxEvent.objects.create(event_type='subscription.updated', object_id=1, payload={},
+                                           department_id=department_id, reseller_id=reseller_id)
+        OutboxEvent.objects.filter(pk=event.pk).update(transaction_xid=xid)
+        return event.pk
+
+    async def next_id(self, messages):
+        """Id of the next event in ``messages``, 'reset' for a reset"""
+        while True:
+            message = await asyncio.wait_for(anext(messages), 5)
+            if message.startswith('id: '):
+                return int(message.split('\n')[0][4:])
+            if message.startswith('event: reset'):
+                return 'reset'
+
+    async def open(self, scope, last_event_id=None):
+        messages = live.stream(scope, last_event_id)
+        self.assertTrue((await anext(messages)).startswith('retry: '))
+        return messages
+
+    async def wait_until_published(self, event_id):
+        hub = live.get_hub()
+        while hub.position is None or hub.position[1] < event_id:
+            await asyncio.sleep(0.01)
+
+    def test_committed_events_follow_the_transaction_order(self):
+        late = self.event(xid=20)
+        first = self.event(xid=10)
+        events = lambda **gate: list(live.committed_events(**gate).order_by(  # noqa: E731
+            'transaction_xid', 'id').values_list('pk', flat=True))
+        self.assertEqual(events(), [first, late])
+        self.assertEqual(events(horizon=20), [first])
+        self.assertEqual(live._fetch((10, first), 0, 10)[0], (20, late))
+
+    async def test_scope(self):
+        department = live.Scope(False, frozenset([1]), None)
+        reseller = live.Scope(False, frozenset(), 7)
+        everything = live.Scope(True, frozenset(), None)
+        streams = [await self.open(scope) for scope in (department, reseller, everything)]
+        await live.get_hub().started.wait()
+
+        create = sync_to_async(self.event)
+        other = await create(department_id=2)
+        of_department = await create(department_id=1)
+        of_reseller = await create(department_id=2, reseller_id=7)
+        self.assertEqual([await self.next_id(streams[0])], [of_department])
+        self.assertEqual([await self.next_id(streams[1])], [of_reseller])
+        self.assertEqual([await self.next_id(streams[2]) for _ in range(3)], [other, of_department, of_reseller])
+        for messages in streams:
+            await messages.aclose()
+
+    async def test_replay(self):
+        create = sync_to_async(self.event)
+        seen = await create(department_id=1)
+        missed = [await create(department_id=1), await create(department_id=2), await create(department_id=1)]
+        scope = live.Scope(False, frozenset([1]), None)
+
+        messages = await self.open(scope, last_event_id=seen)
+        self.assertEqual([await self.next_id(messages), await self.next_id(messages)], [missed[0], missed[2]])
+        # Then live, without repeats
+        new = await create(department_id=1)
+        self.assertEqual(await self.next_id(messages), new)
+        await messages.aclose()
+
+    async def test_replay_too_long_or_pruned(self):
+        create = sync_to_async(self.event)
+        seen = await create(department_id=1)
+        for _ in range(4):
+            await create(department_id=1)
+        scope = live.Scope(False, frozenset([1]), None)
+
+        messages = await self.open(scope, last_event_id=seen)
+        self.assertEqual(await self.next_id(messages), 'reset')
+        messages = await self.open(scope, last_event_id=0)
+        self.assertEqual(await self.next_id(messages), 'reset')
+
+    async def test_overflow_resets_the_stream(self):
+        scope = live.Scope(True, frozenset(), None)
+        messages = await self.open(scope)
+        await live.get_hub().started.wait()
+        created = [await sync_to_async(self.event)() for _ in range(5)]
+        await self.wait_until_published(created[-1])
+
+        # The queue holds three, then the client is told to reload
+        self.assertEqual([await self.next_id(messages) for _ in range(4)], created[:3] + ['reset'])
+        with self.assertRaises(StopAsyncIteration):
+            await anext(messages)
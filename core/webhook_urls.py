@@ -0,0 +1,6 @@
+from django.urls import path
+from . import api_views
+
+urlpatterns = [
+    path('lag/', api_views.WebhookLagAPIView.as_view(), name='webhook_lag_api'),
+]
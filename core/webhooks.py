@@ -0,0 +1,286 @@
+"""
+Batched webhook delivery from the outbox (see core/outbox.py).
+
+``manage.py deliver_webhooks`` runs ``deliver_once`` in a loop. Each round
+takes up to ``BATCH_SIZE`` undelivered events per active endpoint and POSTs
+them as one request per endpoint, all endpoints concurrently on an asyncio
+loop:
+
+    POST <endpoint.url>
+    X-Webhook-Timestamp: 1750000000
+    X-Webhook-Signature: sha256=<hex HMAC of "<timestamp>.<body>" with the endpoint secret>
+
+    {"events": [{"id": 41, "type": "subscription.created", "created_at": "...", "data": {...}}]}
+
+A 2xx response moves the endpoint's cursor past the batch. Anything else
+(or a timeout) keeps the cursor and backs the endpoint off exponentially,
+so one slow integrator never holds up the others. Delivery is at least
+once, receivers should ignore event ids they have already seen.
+
+The cursor is the ``(transaction_xid, id)`` of the last delivered event
+and on Postgres only moves over events written by transactions older than
+any still in progress (``pg_snapshot_xmin``). Those have all committed, so
+an event id handed out by a transaction that commits late can't end up
+behind the cursor. Other databases have no transaction ids and only send
+events once ``SETTLE_SECONDS`` old, which a slower commit can slip past.
+
+Each round holds a Postgres advisory lock per endpoint it delivers to and
+skips endpoints another worker holds, so delivery workers can run side by
+side without sending a batch twice (on Postgres; elsewhere run one).
+"""
+import asyncio
+import datetime
+import hashlib
+import hmac
+import json
+import logging
+import random
+import ssl
+import time
+from contextlib import ExitStack
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import OutboxEvent, WebhookEndpoint
+from .outbox import event_data
+from .singleflight import advisory_lock
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryError(Exception):
+    pass
+
+
+def get_webhook_settings():
+    options = {
+        'BATCH_SIZE': 100,
+        'CONCURRENCY': 20,
+        'TIMEOUT': 10,
+        'SETTLE_SECONDS': 2,
+        'RETRY_BASE_SECONDS': 5,
+        'RETRY_MAX_SECONDS': 3600,
+        'POLL_INTERVAL': 1,
+        'RETENTION_DAYS': 7,
+    }
+    options.update(getattr(settings, 'WEBHOOKS', {}))
+    return options
+
+
+def sign(secret, timestamp, body):
+    digest = hmac.new(secret.encode(), f'{timestamp}.'.encode() + body, hashlib.sha256).hexdigest()
+    return f'sha256={digest}'
+
+
+def retry_delay(failures, options):
+    """Seconds to wait after ``failures`` consecutive failures, with jitter"""
+    delay = min(options['RETRY_BASE_SECONDS'] * 2 ** (failures - 1), options['RETRY_MAX_SECONDS'])
+    return delay * random.uniform(0.5, 1)
+
+
+async def post(url, body, headers, timeout):
+    """
+    POST ``body`` to ``url`` and return the response status code.
+
+    Only the status line is read, the payload goes one way, so a bare
+    HTTP/1.1 exchange over ``asyncio.open_connection`` is all it takes.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise DeliveryError(f"Unsupported URL {url}")
+    secure = parts.scheme == 'https'
+    path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+    head = [
+        f'POST {path} HTTP/1.1',
+        f'Host: {parts.netloc}',
+        'Content-Type: application/json',
+        f'Content-Length: {len(body)}',
+        'Connection: close',
+        'User-Agent: myproject-webhooks',
+    ]
+    head += [f'{name}: {value}' for name, value in headers.items()]
+
+    async def exchange():
+        reader, writer = await asyncio.open_connection(
+            parts.hostname, parts.port or (443 if secure else 80),
+            ssl=ssl.create_default_context() if secure else None,
+        )
+        try:
+            writer.write('\r\n'.join(head).encode('latin-1') + b'\r\n\r\n' + body)
+            await writer.drain()
+            return await reader.readline()
+        finally:
+            writer.close()
+
+    status_line = await asyncio.wait_for(exchange(), timeout)
+    try:
+        return int(status_line.split()[1])
+    except (IndexError, ValueError):
+        raise DeliveryError(f"Malformed response {status_line[:50]!r}")
+
+
+def committed_horizon(using=DEFAULT_DB_ALIAS):
+    """
+    The oldest transaction id still in progress, events of transactions
+    below it are all committed or rolled back. None off Postgres.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint')
+        return cursor.fetchone()[0]
+
+
+def past_cursor(xid, event_id):
+    """Filter for the events after the ``(transaction_xid, id)`` cursor"""
+    return Q(transaction_xid__gt=xid) | Q(transaction_xid=xid, id__gt=event_id)
+
+
+def _undelivered(endpoint):
+    """Filter for the events past ``endpoint``'s cursor that it subscribes to"""
+    condition = past_cursor(endpoint.last_event_xid, endpoint.last_event_id)
+    if endpoint.event_types:
+        condition &= Q(event_type__in=endpoint.event_types)
+    if endpoint.reseller_id is not None:
+        condition &= Q(reseller_id=endpoint.reseller_id)
+    return condition
+
+
+def pending_events(endpoint, settled=None, horizon=None):
+    """Undelivered events for ``endpoint``, in cursor order"""
+    events = OutboxEvent.objects.filter(_undelivered(endpoint))
+    if horizon is not None:
+        events = events.filter(transaction_xid__lt=horizon)
+    if settled is not None:
+        events = events.filter(created_at__lte=settled)
+    return events.order_by('transaction_xid', 'id')
+
+
+def render(events):
+    return json.dumps({'events': [event_data(event) for event in events]}, cls=DjangoJSONEncoder).encode()
+
+
+async def _deliver(endpoint, events, semaphore, options):
+    body = render(events)
+    timestamp = str(int(time.time()))
+    headers = {
+        'X-Webhook-Timestamp': timestamp,
+        'X-Webhook-Signature': sign(endpoint.secret, timestamp, body),
+    }
+    async with semaphore:
+        try:
+            status = await post(endpoint.url, body, headers, options['TIMEOUT'])
+        except asyncio.TimeoutError:
+            return "Timed out"
+        except (OSError, DeliveryError) as error:
+            return str(error) or type(error).__name__
+    return None if 200 <= status < 300 else f"HTTP {status}"
+
+
+async def _deliver_all(batches, options):
+    semaphore = asyncio.Semaphore(options['CONCURRENCY'])
+    return await asyncio.gather(*(
+        _deliver(endpoint, events, semaphore, options) for endpoint, events in batches
+    ))
+
+
+def deliver_once():
+    """
+    Deliver one batch to every endpoint that is due. Returns
+    ``(delivered, failed, more)``: events delivered, endpoints that failed,
+    and whether any endpoint has a full batch still waiting.
+    """
+    options = get_webhook_settings()
+    now = timezone.now()
+    due = WebhookEndpoint.objects.filter(is_active=True).filter(
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now)
+    )
+    with ExitStack() as locks:
+        locked = [
+            pk for pk in due.values_list('pk', flat=True)
+            if locks.enter_context(advisory_lock(f'webhooks:endpoint:{pk}', timeout=0))
+        ]
+        horizon = committed_horizon()
+        settled = now - datetime.timedelta(seconds=options['SETTLE_SECONDS']) if horizon is None else None
+        batches = []
+        # Read under the locks, the last holder may have moved the cursors
+        for endpoint in due.filter(pk__in=locked):
+            events = list(pending_events(endpoint, settled, horizon)[:options['BATCH_SIZE']])
+            if events:
+                batches.append((endpoint, events))
+        if not batches:
+            return 0, 0, False
+
+        errors = asyncio.run(_deliver_all(batches, options))
+
+        delivered = failed = 0
+        more = False
+        finished = timezone.now()
+        for (endpoint, events), error in zip(batches, errors):
+            if error is None:
+                delivered += len(events)
+                more = more or len(events) == options['BATCH_SIZE']
+                WebhookEndpoint.objects.filter(pk=endpoint.pk).update(
+                    last_event_xid=events[-1].transaction_xid, last_event_id=events[-1].id,
+                    last_delivered_at=finished, consecutive_failures=0, next_attempt_at=None, last_error='',
+                )
+            else:
+                failed += 1
+                failures = endpoint.consecutive_failures + 1
+                logger.warning("Webhook delivery to %s failed (%s), attempt %s", endpoint.url, error, failures)
+                WebhookEndpoint.objects.filter(pk=endpoint.pk).update(
+                    consecutive_failures=failures, last_error=error[:255],
+                    next_attempt_at=finished + datetime.timedelta(seconds=retry_delay(failures, options)),
+                )
+        return delivered, failed, more
+
+
+def get_lag():
+    """Per endpoint backlog: undelivered events and the age of the oldest one"""
+    now = timezone.now()
+    lag = []
+    for endpoint in WebhookEndpoint.objects.filter(is_active=True).order_by('id'):
+        backlog = pending_events(endpoint).aggregate(pending=Count('id'), oldest=Min('created_at'))
+        lag.append({
+            'id': endpoint.id,
+            'url': endpoint.url,
+            'pending': backlog['pending'],
+            'lag_seconds': round((now - backlog['oldest']).total_seconds(), 1) if backlog['oldest'] else 0,
+            'last_delivered_at': endpoint.last_delivered_at,
+            'consecutive_failures': endpoint.consecutive_failures,
+            'next_attempt_at': endpoint.next_attempt_at,
+            'last_error': endpoint.last_error,
+        })
+    return lag
+
+
+def prune_outbox():
+    """
+    Delete events older than ``RETENTION_DAYS``, returns how many. Events an
+    active endpoint has yet to receive are kept, whatever their age, and
+    the endpoints holding them back are logged.
+    """
+    options = get_webhook_settings()
+    expired = OutboxEvent.objects.filter(
+        created_at__lt=timezone.now() - datetime.timedelta(days=options['RETENTION_DAYS'])
+    )
+    behind = []
+    for endpoint in WebhookEndpoint.objects.filter(is_active=True).order_by('id'):
+        undelivered = _undelivered(endpoint)
+        if expired.filter(undelivered).exists():
+            behind.append(endpoint.url)
+            expired = expired.exclude(undelivered)
+    if behind:
+        logger.error(
+            "Keeping outbox events older than %s days for endpoints that have not received them: %s. "
+            "Fix or deactivate these endpoints to let the outbox shrink.",
+            options['RETENTION_DAYS'], ', '.join(behind),
+        )
+    deleted, _ = expired.delete()
+    return deleted
@@ -1,17 +1,18 @@
 from django.contrib import admin
 from .models import Department, DepartmentAdmin, DepartmentUser
+from core.admin_tools import ScalableModelAdmin
 
 @admin.register(Department)
-class DepartmentModelAdmin(admin.ModelAdmin):
+class DepartmentModelAdmin(ScalableModelAdmin):
     list_display = ('department_id', 'name', 'created_at')
     search_fields = ('name',)
     
 @admin.register(DepartmentAdmin)
-class DepartmentAdminModelAdmin(admin.ModelAdmin):
+class DepartmentAdminModelAdmin(ScalableModelAdmin):
     list_display = ('id', 'department', 'user')
     search_fields = ('department__name', 'user__email')
     
 @admin.register(DepartmentUser)
-class DepartmentUserModelAdmin(admin.ModelAdmin):
+class DepartmentUserModelAdmin(ScalableModelAdmin):
     list_display = ('id', 'department', 'user')
     search_fields = ('department__name', 'user__email')
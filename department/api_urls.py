@@ -1,4 +1,4 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from . import api_views
 
@@ -14,6 +14,7 @@ urlpatterns = [
     path('departments/<int:department_id>/admins/', api_views.DepartmentAdminAPI.as_view(), name='department_admin_api'),
     path('departments/<int:department_id>/users/', api_views.DepartmentUserAPI.as_view(), name='department_user_api'),
     path('departments/<int:department_id>/users/<int:user_id>/', api_views.DepartmentUserAPI.as_view(), name='department_user_detail_api'),
+    re_path(r'^departments/(?P<department_id>\d+)/users/import/(?P<import_format>csv|ndjson)/$', api_views.DepartmentUserImportAPI.as_view(), name='department_user_import_api'),
     
     # Department admin user endpoint
     path('me/admin/', api_views.DepartmentAdminUserAPI.as_view(), name='department_admin_user_api'),
@@ -7,6 +7,12 @@ from django.shortcuts import get_object_or_404
 from .models import Department, DepartmentAdmin, DepartmentUser
 from .serializers import DepartmentSerializer, DepartmentDetailSerializer, DepartmentAdminSerializer, DepartmentUserSerializer
 from user.models import User
+from core.response_cache import cache_response
+from core.db_router import ReplicaReadMixin
+from core.sync import DeltaSyncMixin
+from core.search import SearchMixin
+from myproject.lookup import BulkLookupMixin
+from .imports import import_department_users, iter_rows, summarize
 
 # Custom permission classes
 class IsAdminOrDepartmentAdmin(BasePermission):
@@ -19,8 +25,8 @@ class IsAdminOrDepartmentAdmin(BasePermission):
         if request.user.is_root_admin:
             return True
             
-        # For list and retrieve operations, allow all authenticated users
-        if request.method == 'GET':
+        # For list, retrieve and lookup operations, allow all authenticated users
+        if request.method == 'GET' or view.action == 'lookup':
             return True
             
         # For create operations, only root admins and department admins can create
@@ -43,11 +49,12 @@ class IsAdminOrDepartmentAdmin(BasePermission):
         return DepartmentAdmin.objects.filter(user=request.user, department=obj).exists()
 
 # Department ViewSet
-class DepartmentViewSet(viewsets.ModelViewSet):
+class DepartmentViewSet(ReplicaReadMixin, DeltaSyncMixin, BulkLookupMixin, SearchMixin, viewsets.ModelViewSet):
     """
     API endpoint for departments
     """
     queryset = Department.objects.all()
+    trigram_search_fields = ('name',)
     permission_classes = [IsAuthenticated, IsAdminOrDepartmentAdmin]
     
     def get_queryset(self):
@@ -64,10 +71,10 @@ class DepartmentViewSet(viewsets.ModelViewSet):
             return Department.objects.all()
             
         # Get departments where user is an admin
-        admin_departments = Department.objects.filter(departmentadmin__user=user)
+        admin_departments = Department.objects.filter(admins__user=user)
         
         # Get departments where user is a member
-        member_departments = Department.objects.filter(departmentuser__user=user)
+        member_departments = Department.objects.filter(users__user=user)
         
         # Combine querysets and remove duplicates
         return (admin_departments | member_departments).distinct()
@@ -77,6 +84,10 @@ class DepartmentViewSet(viewsets.ModelViewSet):
             return DepartmentDetailSerializer
         return DepartmentSerializer
     
+    @cache_response('department', tenant_kwarg='pk')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
         department = serializer.save()
         # Automatically make the creator an admin
@@ -131,7 +142,7 @@ class DepartmentAdminAPI(APIView):
         
         # Create department admin relationship
         admin = DepartmentAdmin.objects.create(user=user, department=department)
-        serializer = DepartmentAdminSerializer(admin)
+        serializer = DepartmentAdminSerializer(admin, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
     def delete(self, request, department_id):
@@ -195,7 +206,7 @@ class DepartmentUserAPI(APIView):
         
         # Add user to department
         dept_user = DepartmentUser.objects.create(user=user, department=department)
-        serializer = DepartmentUserSerializer(dept_user)
+        serializer = DepartmentUserSerializer(dept_user, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
     def delete(self, request, department_id, user_id=None):
@@ -222,6 +233,34 @@ class DepartmentUserAPI(APIView):
         
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class DepartmentUserImportAPI(APIView):
+    """
+    API endpoint to bulk import department users from a CSV or NDJSON upload,
+    sent as the request body or as a multipart ``file`` field
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, department_id, import_format):
+        """Import users into department and report on every row"""
+        department = get_object_or_404(Department, department_id=department_id)
+        
+        if not (request.user.is_root_admin or 
+                DepartmentAdmin.objects.filter(user=request.user, department=department).exists()):
+            return Response({"error": "Only department administrators can add users to departments"}, 
+                          status=status.HTTP_403_FORBIDDEN)
+        
+        # Read the upload as a stream instead of through request.data
+        if request.content_type.startswith('multipart/'):
+            upload = request.FILES.get('file')
+        else:
+            upload = request.stream
+        if upload is None:
+            return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        rows = iter_rows(upload, import_format)
+        report = list(import_department_users(department, rows))
+        return Response({"summary": summarize(report), "rows": report}, status=status.HTTP_200_OK)
+
 # Department Admin User API
 class DepartmentAdminUserAPI(APIView):
     """
@@ -0,0 +1,195 @@
+"""
+Bulk import of department users from CSV or NDJSON.
+
+The upload is parsed as a stream and processed in batches of
+``batch_size`` rows. Each batch costs a handful of queries, whatever its
+size:
+
+- one ``email IN (...)`` lookup for existing users
+- one ``user_id IN (...)`` lookup for existing memberships
+- one ``bulk_create`` of the new users and one lookup of their ids
+- one ``bulk_create(ignore_conflicts=True)`` of the memberships, one
+  lookup of their ids and one ``bulk_create`` of their outbox events
+
+The rows are checked, existing users looked up and new users' passwords
+hashed (in parallel) before the batch's transaction opens, so it isn't
+held open for the slow part.
+
+Rows take the same fields as ``DepartmentUserAPI.post``: ``email``,
+``full_name`` and, for users that don't exist yet, ``password``. Every row
+gets an entry in the report:
+
+    {"row": 2, "email": "a@example.com", "status": "created", "user_id": 7}
+
+with ``status`` one of ``created`` (new user added), ``added`` (existing
+user added), ``exists`` (already in the department) or ``error`` (with an
+``error`` message).
+"""
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from core.dependencies import department_users_changed
+from core.outbox import record_events
+from core.response_cache import invalidate_on_commit
+from user.hashing import hash_many
+from user.models import User
+
+from .models import DepartmentUser
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+
+def iter_rows(lines, import_format):
+    """
+    Yield ``(row_number, fields)`` from an iterable of raw byte lines.
+
+    Rows that can't be parsed come through as ``(row_number, error)``
+    with ``error`` a string.
+    """
+    text = codecs.iterdecode(lines, 'utf-8-sig')
+    if import_format == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            # Header is line 1
+            yield reader.line_num, row
+        return
+
+    for number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, "Invalid JSON"
+            continue
+        yield number, row if isinstance(row, dict) else "Expected a JSON object"
+
+
+def _clean(fields):
+    """Return (email, full_name, password) or raise ValidationError"""
+    if not isinstance(fields, dict):
+        raise ValidationError(fields)
+    email = str(fields.get('email') or '').strip()
+    full_name = str(fields.get('full_name') or '').strip()
+    if not email or not full_name:
+        raise ValidationError("Email and full name are required")
+    validate_email(email)
+    return User.objects.normalize_email(email), full_name, fields.get('password') or None
+
+
+def _prepare_batch(batch, seen):
+    """
+    Clean ``batch`` and hash the new users' passwords, outside any
+    transaction. Returns (report, valid rows, user ids by email, new rows,
+    hashes of the new rows).
+    """
+    report = []
+    valid = []
+    for number, fields in batch:
+        email = fields.get('email') if isinstance(fields, dict) else None
+        try:
+            email, full_name, password = _clean(fields)
+        except ValidationError as error:
+            report.append({'row': number, 'email': email, 'status': 'error', 'error': error.messages[0]})
+            continue
+        if email in seen:
+            report.append({'row': number, 'email': email, 'status': 'error', 'error': "Duplicate email in upload"})
+            continue
+        seen.add(email)
+        valid.append((number, email, full_name, password))
+
+    user_ids = dict(User.objects.filter(email__in=[row[1] for row in valid]).values_list('email', 'user_id'))
+    new_rows = []
+    for number, email, full_name, password in valid:
+        if email not in user_ids:
+            if password is None:
+                report.append({'row': number, 'email': email, 'status': 'error',
+                               'error': "Password is required for new users"})
+            else:
+                new_rows.append((number, email, full_name, password))
+    hashes = hash_many(row[3] for row in new_rows) if new_rows else []
+    return report, valid, user_ids, new_rows, hashes
+
+
+def _import_batch(department, prepared):
+    report, valid, user_ids, new_rows, hashes = prepared
+    members = set(
+        DepartmentUser.objects.filter(department=department, user_id__in=user_ids.values())
+        .values_list('user_id', flat=True)
+    )
+
+    created = {}
+    if new_rows:
+        User.objects.bulk_create(
+            [User(email=email, full_name=full_name, password=encoded)
+             for (_, email, full_name, _), encoded in zip(new_rows, hashes)],
+            ignore_conflicts=True,
+        )
+        # Salted hashes tell our rows from users created concurrently
+        ours = dict(zip((row[1] for row in new_rows), hashes))
+        for email, user_id, encoded in User.objects.filter(email__in=list(ours)).values_list(
+                'email', 'user_id', 'password'):
+            user_ids[email] = user_id
+            if encoded == ours[email]:
+                created[email] = user_id
+
+    links = []
+    for number, email, full_name, password in valid:
+        user_id = user_ids.get(email)
+        if user_id is None:
+            continue
+        if user_id in members:
+            report.append({'row': number, 'email': email, 'status': 'exists', 'user_id': user_id})
+            continue
+        links.append(DepartmentUser(user_id=user_id, department=department))
+        report.append({'row': number, 'email': email, 'status': 'created' if email in created else 'added',
+                       'user_id': user_id})
+    DepartmentUser.objects.bulk_create(links, ignore_conflicts=True)
+    if links:
+        # ignore_conflicts leaves the primary keys unset, read the rows back
+        # for their outbox events (see core/outbox.py)
+        record_events(
+            DepartmentUser.objects.filter(department=department, user_id__in=[link.user_id for link in links]),
+            'created',
+        )
+
+    report.sort(key=lambda entry: entry['row'])
+    return report
+
+
+def import_department_users(department, rows, batch_size=500):
+    """
+    Import ``rows`` (from ``iter_rows``) into ``department``, yielding the
+    report entries batch by batch. Each batch commits on its own.
+    """
+    rows = iter(rows)
+    seen = set()
+    imported = False
+    try:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            prepared = _prepare_batch(batch, seen)
+            with transaction.atomic():
+                report = _import_batch(department, prepared)
+            imported = imported or any(entry['status'] in ('created', 'added') for entry in report)
+            yield from report
+    finally:
+        if imported:
+            # bulk_create sends no post_save, see core/dependencies.py
+            invalidate_on_commit(department_users_changed(department.pk))
+
+
+def summarize(report):
+    """Count report entries by status"""
+    counts = {'created': 0, 'added': 0, 'exists': 0, 'error': 0}
+    for entry in report:
+        counts[entry['status']] += 1
+    return counts
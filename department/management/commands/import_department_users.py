@@ -0,0 +1,54 @@
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from department.imports import IMPORT_FORMATS, import_department_users, iter_rows
+from department.models import Department
+
+
+class Command(BaseCommand):
+    help = "Bulk import users into a department from a CSV or NDJSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('department_id', type=int)
+        parser.add_argument('path', help="CSV or NDJSON file, '-' for stdin")
+        parser.add_argument('--format', choices=IMPORT_FORMATS,
+                            help="Defaults to the file extension")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--report', help="Write the per-row report to this file as NDJSON")
+
+    def handle(self, *args, **options):
+        try:
+            department = Department.objects.get(department_id=options['department_id'])
+        except Department.DoesNotExist:
+            raise CommandError("Department not found")
+
+        path = options['path']
+        import_format = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if import_format not in IMPORT_FORMATS:
+            raise CommandError("Pass --format csv or --format ndjson")
+
+        report_file = open(options['report'], 'w') if options['report'] else None
+        upload = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        counts = {'created': 0, 'added': 0, 'exists': 0, 'error': 0}
+        try:
+            for entry in import_department_users(department, iter_rows(upload, import_format),
+                                                 options['batch_size']):
+                counts[entry['status']] += 1
+                if report_file:
+                    report_file.write(json.dumps(entry) + '\n')
+                elif entry['status'] == 'error':
+                    self.stderr.write(f"Row {entry['row']}: {entry['error']}")
+        finally:
+            if upload is not sys.stdin.buffer:
+                upload.close()
+            if report_file:
+                report_file.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{counts['created']} created, {counts['added']} added, "
+            f"{counts['exists']} already members, {counts['error']} errors"
+        ))
+
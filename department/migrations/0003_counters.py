@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 22:56
+
+from django.db import migrations, models
+
+from core.counters import drop_triggers, install_triggers
+
+
+def create_counter_triggers(apps, schema_editor):
+    install_triggers(schema_editor, 'departments')
+
+
+def drop_counter_triggers(apps, schema_editor):
+    drop_triggers(schema_editor, 'departments')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('department', '0002_department_customer_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='department',
+            name='admin_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='department',
+            name='user_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(create_counter_triggers, drop_counter_triggers),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 23:00
+
+from django.db import migrations, models
+
+from core.counters import install_triggers
+
+
+def recreate_counter_triggers(apps, schema_editor):
+    # The triggers now also bump updated_at
+    install_triggers(schema_editor, 'departments')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('department', '0003_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='department',
+            index=models.Index(fields=['updated_at', 'department_id'], name='departments_updated_idx'),
+        ),
+        migrations.RunPython(recreate_counter_triggers, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
 from user.models import User
+from core.counters import CounterFieldsMixin
+from core.outbox import OutboxMixin
 
-class Department(models.Model):
+class Department(CounterFieldsMixin, models.Model):
     """
     Department model to organize users in the SaaS platform.
     """
@@ -17,14 +19,24 @@ class Department(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Maintained by database triggers, see core/counters.py
+    user_count = models.PositiveIntegerField(default=0, editable=False)
+    admin_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    counter_fields = ('user_count', 'admin_count')
+    
     class Meta:
         db_table = 'departments'
+        indexes = [
+            # Delta sync, see core/sync.py
+            models.Index(fields=['updated_at', 'department_id'], name='departments_updated_idx'),
+        ]
     
     def __str__(self):
         return self.name
 
 
-class DepartmentAdmin(models.Model):
+class DepartmentAdmin(OutboxMixin, models.Model):
     """
     Links users to departments as administrators.
     A department admin can manage users within their department.
@@ -42,7 +54,7 @@ class DepartmentAdmin(models.Model):
         return f"{self.user.full_name} - {self.department.name} Admin"
 
 
-class DepartmentUser(models.Model):
+class DepartmentUser(OutboxMixin, models.Model):
     """
     Links regular users to departments.
     """
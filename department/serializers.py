@@ -1,12 +1,14 @@
 from rest_framework import serializers
 from .models import Department, DepartmentAdmin, DepartmentUser
 from user.serializers import UserSerializer
+from myproject.expansion import ExpandableFieldsMixin
 
 class DepartmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Department
-        fields = ['department_id', 'name', 'description', 'created_at', 'updated_at']
-        read_only_fields = ['department_id', 'created_at', 'updated_at']
+        fields = ['department_id', 'name', 'description', 'created_at', 'updated_at',
+                  'user_count', 'admin_count']
+        read_only_fields = ['department_id', 'created_at', 'updated_at', 'user_count', 'admin_count']
 
 class DepartmentDetailSerializer(serializers.ModelSerializer):
     admins = serializers.SerializerMethodField()
@@ -31,19 +33,23 @@ class DepartmentDetailSerializer(serializers.ModelSerializer):
             many=True
         ).data
 
-class DepartmentAdminSerializer(serializers.ModelSerializer):
+class DepartmentAdminSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     user_details = UserSerializer(source='user', read_only=True)
     department_details = DepartmentSerializer(source='department', read_only=True)
     
+    expandable_fields = {'user': 'user_details', 'department': 'department_details'}
+    
     class Meta:
         model = DepartmentAdmin
         fields = ['id', 'user', 'department', 'assigned_at', 'user_details', 'department_details']
         read_only_fields = ['id', 'assigned_at', 'user_details', 'department_details']
 
-class DepartmentUserSerializer(serializers.ModelSerializer):
+class DepartmentUserSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     user_details = UserSerializer(source='user', read_only=True)
     department_details = DepartmentSerializer(source='department', read_only=True)
     
+    expandable_fields = {'user': 'user_details', 'department': 'department_details'}
+    
     class Meta:
         model = DepartmentUser
         fields = ['id', 'user', 'department', 'user_details', 'department_details']
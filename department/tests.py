@@ -1,3 +1,176 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from user.models import User
+
+from .imports import import_department_users, iter_rows
+from .models import Department, DepartmentAdmin, DepartmentUser
+
+
+class DepartmentLookupTests(TestCase):
+    url = '/api/departments/departments/lookup/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.departments = Department.objects.bulk_create(Department(name=f'Department {i}') for i in range(3))
+        cls.member = User.objects.create_user('member@example.com', 'Member', 'unused')
+        DepartmentUser.objects.create(user=cls.member, department=cls.departments[2])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+
+    def test_results_in_the_order_asked(self):
+        root = User.objects.create_user('root@example.com', 'Root', 'unused', is_root_admin=True)
+        self.client.force_authenticate(root)
+        first, second, third = (department.pk for department in self.departments)
+        response = self.client.get(self.url, {'ids': f'{third},{first},{third},0'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['department_id'] for row in response.data['results']], [third, first])
+        self.assertEqual(response.data['missing'], [0])
+
+    def test_post_body(self):
+        third = self.departments[2].pk
+        response = self.client.post(self.url, {'ids': [third]}, format='json')
+        self.assertEqual([row['department_id'] for row in response.data['results']], [third])
+
+    def test_out_of_scope_ids_are_missing(self):
+        first, _, third = (department.pk for department in self.departments)
+        response = self.client.get(self.url, {'ids': f'{first},{third}'})
+        self.assertEqual([row['department_id'] for row in response.data['results']], [third])
+        self.assertEqual(response.data['missing'], [first])
+
+    def test_invalid_ids(self):
+        for ids in ('', 'a,1'):
+            with self.subTest(ids=ids):
+                response = self.client.get(self.url, {'ids': ids})
+                self.assertEqual(response.status_code, 400)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class DepartmentUserImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name='Department')
+        cls.admin = User.objects.create_user('admin@example.com', 'Admin', 'unused')
+        DepartmentAdmin.objects.create(user=cls.admin, department=cls.department)
+        cls.member = User.objects.create_user('member@example.com', 'Member', 'unused')
+        DepartmentUser.objects.create(user=cls.member, department=cls.department)
+        cls.outsider = User.objects.create_user('outsider@example.com', 'Outsider', 'unused')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def upload(self, import_format, body):
+        content_type = 'text/csv' if import_format == 'csv' else 'application/x-ndjson'
+        url = f'/api/departments/departments/{self.department.pk}/users/import/{import_format}/'
+        response = self.client.post(url, body, content_type=content_type)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def statuses(self, data):
+        return [(entry['row'], entry['email'], entry['status']) for entry in data['rows']]
+
+    def test_report(self):
+        data = self.upload('csv', '\n'.join([
+            'email,full_name,password',
+            'new@example.com,New,secret',
+            'outsider@EXAMPLE.com,Outsider,',
+            'member@example.com,Member,',
+            'nopassword@example.com,No Password,',
+            'not-an-email,Broken,secret',
+            'new@example.com,Again,secret',
+        ]))
+        self.assertEqual(self.statuses(data), [
+            (2, 'new@example.com', 'created'),
+            (3, 'outsider@example.com', 'added'),
+            (4, 'member@example.com', 'exists'),
+            (5, 'nopassword@example.com', 'error'),
+            (6, 'not-an-email', 'error'),
+            (7, 'new@example.com', 'error'),
+        ])
+        self.assertEqual(data['summary'], {'created': 1, 'added': 1, 'exists': 1, 'error': 3})
+        self.assertEqual(data['rows'][3]['error'], "Password is required for new users")
+        self.assertEqual(data['rows'][5]['error'], "Duplicate email in upload")
+
+        new = User.objects.get(email='new@example.com')
+        self.assertEqual(data['rows'][0]['user_id'], new.pk)
+        self.assertTrue(new.check_password('secret'))
+        self.assertEqual(
+            set(DepartmentUser.objects.filter(department=self.department).values_list('user_id', flat=True)),
+            {self.member.pk, self.outsider.pk, new.pk},
+        )
+
+    def test_existing_user_is_added(self):
+        data = self.upload('ndjson', json.dumps({'email': 'outsider@example.com', 'full_name': 'Outsider'}))
+        self.assertEqual(self.statuses(data), [(1, 'outsider@example.com', 'added')])
+        self.assertEqual(data['rows'][0]['user_id'], self.outsider.pk)
+        self.assertTrue(DepartmentUser.objects.filter(department=self.department, user=self.outsider).exists())
+
+    def test_malformed_ndjson(self):
+        data = self.upload('ndjson', '\n'.join([
+            '{"email": "first@example.com", "full_name": "First", "password": "secret"}',
+            '{"email": "broken@example.com",',
+            '',
+            '["second@example.com"]',
+            '{"email": "second@example.com"}',
+            '{"email": "third@example.com", "full_name": "Third", "password": "secret"}',
+        ]))
+        self.assertEqual([(entry['row'], entry['status'], entry.get('error')) for entry in data['rows']], [
+            (1, 'created', None),
+            (2, 'error', "Invalid JSON"),
+            (4, 'error', "Expected a JSON object"),
+            (5, 'error', "Email and full name are required"),
+            (6, 'created', None),
+        ])
+
+    def test_malformed_csv(self):
+        data = self.upload('csv', '\n'.join([
+            'email,full_name,password',
+            'short@example.com',
+            'extra@example.com,Extra,secret,unexpected',
+            '"unterminated@example.com,Unterminated,secret',
+        ]))
+        self.assertEqual([(entry['row'], entry['status']) for entry in data['rows']], [
+            (2, 'error'), (3, 'created'), (4, 'error'),
+        ])
+
+    def test_batches(self):
+        rows = [
+            (number, {'email': f'user{number}@example.com', 'full_name': f'User {number}', 'password': 'secret'})
+            for number in range(1, 504)
+        ]
+        # Repeats across the batch boundary are still caught
+        rows.append((504, {'email': 'user1@example.com', 'full_name': 'Again', 'password': 'secret'}))
+        rows.append((505, {'email': 'member@example.com', 'full_name': 'Member'}))
+
+        report = list(import_department_users(self.department, rows))
+        self.assertEqual([entry['row'] for entry in report], list(range(1, 506)))
+        self.assertEqual([entry['status'] for entry in report], ['created'] * 503 + ['error', 'exists'])
+        self.assertEqual(DepartmentUser.objects.filter(department=self.department).count(), 504)
+
+    def test_queries_per_batch_are_constant(self):
+        uploads = iter(range(100))
+
+        def queries(count, batch_size):
+            upload = next(uploads)
+            rows = [
+                (number, {'email': f'user{upload}-{number}@example.com', 'full_name': 'User', 'password': 'secret'})
+                for number in range(count)
+            ]
+            with CaptureQueriesContext(connection) as context:
+                list(import_department_users(self.department, rows, batch_size=batch_size))
+            return len(context.captured_queries)
+
+        one, two, three = queries(10, 10), queries(20, 10), queries(30, 10)
+        self.assertEqual(three - two, two - one)
+        self.assertEqual(queries(40, 40), one)
+
+    def test_iter_rows_numbers_csv_lines(self):
+        lines = [b'\xef\xbb\xbfemail,full_name\n', b'a@example.com,A\n', b'b@example.com,B\n']
+        self.assertEqual([number for number, _ in iter_rows(lines, 'csv')], [2, 3])
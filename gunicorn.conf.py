@@ -0,0 +1,15 @@
+"""
+Gunicorn settings. Each worker process sizes its database connection pool
+from the same GUNICORN_THREADS value (see DATABASES in myproject/settings.py).
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+# Recycle workers now and then, pools are rebuilt in the new process
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = 200
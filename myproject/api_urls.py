@@ -1,5 +1,7 @@
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenRefreshView
+from .batch import BatchAPIView
+from .dashboard import DashboardAPIView
 
 urlpatterns = [
     # API endpoints for each app
@@ -7,6 +9,19 @@ urlpatterns = [
     path('departments/', include('department.api_urls')),
     path('services/', include('service_package.api_urls')),
     path('resellers/', include('reseller.api_urls')),
+    path('cache/', include('core.api_urls')),
+    path('db/', include('core.db_urls')),
+    path('webhooks/', include('core.webhook_urls')),
+    path('jobs/', include('core.job_urls')),
+    
+    # Several API requests in one round trip
+    path('batch/', BatchAPIView.as_view(), name='batch_api'),
+    
+    # Everything the dashboard loads at start, per role
+    path('dashboard/', DashboardAPIView.as_view(), name='dashboard_api'),
+    
+    # Async (ASGI) variants of the hot read endpoints
+    path('async/', include('myproject.async_urls')),
     
     # JWT token refresh endpoint
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
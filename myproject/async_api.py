@@ -0,0 +1,100 @@
+"""
+Helpers for the async (ASGI) read endpoints.
+
+DRF views are synchronous, so the hot read paths also exist as plain
+Django ``async def`` views under ``/api/async/``. Under ASGI a request
+waiting on the database no longer holds a worker thread, and a slow query
+doesn't stall the fast requests behind it. The views return the same JSON
+as their DRF counterparts.
+
+    @async_api_view()
+    async def profile(request):
+        ...
+        return api_response(data)
+"""
+from functools import wraps
+
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+
+class AuthenticationFailed(Exception):
+    pass
+
+
+def api_response(data, status=status.HTTP_200_OK, headers=None):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False, headers=headers)
+
+
+async def authenticate(request, user_queryset=None, stateless=False, query_token=False):
+    """
+    Validate the request's JWT and return its user.
+
+    Token checks are pure CPU; the user row is loaded with the async ORM,
+    from ``user_queryset`` when given (e.g. with prefetches). Stateless
+    authentication returns a ``TokenUser`` built from the claims alone.
+    With ``query_token`` the token may also come as ``?access_token=``,
+    for clients such as ``EventSource`` that can't set headers.
+    Returns None when the request carries no token.
+    """
+    from user.models import User
+
+    backend = JWTAuthentication()
+    header = backend.get_header(request)
+    if header is not None:
+        raw_token = backend.get_raw_token(header)
+    elif query_token and request.GET.get('access_token'):
+        raw_token = request.GET['access_token'].encode()
+    else:
+        raw_token = None
+    if raw_token is None:
+        return None
+    try:
+        token = backend.get_validated_token(raw_token)
+    except (InvalidToken, TokenError) as error:
+        raise AuthenticationFailed(str(error))
+
+    if stateless:
+        return TokenUser(token)
+
+    user_id = token.get(jwt_settings.USER_ID_CLAIM)
+    if user_id is None:
+        raise AuthenticationFailed("Token contained no recognizable user identification")
+    queryset = user_queryset if user_queryset is not None else User.objects.all()
+    user = await queryset.filter(**{jwt_settings.USER_ID_FIELD: user_id}).afirst()
+    if user is None or not user.is_active:
+        raise AuthenticationFailed("User not found")
+    return user
+
+
+def async_api_view(user_queryset=None, stateless=False, query_token=False):
+    """
+    Decorate an ``async def`` GET view: authenticate the caller into
+    ``request.user`` and answer 401/405 the way the DRF views do.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return api_response(
+                    {"detail": f'Method "{request.method}" not allowed.'},
+                    status=status.HTTP_405_METHOD_NOT_ALLOWED,
+                )
+            try:
+                user = await authenticate(request, user_queryset, stateless, query_token)
+            except AuthenticationFailed as error:
+                return api_response({"detail": str(error)}, status=status.HTTP_401_UNAUTHORIZED,
+                                    headers={'WWW-Authenticate': 'Bearer realm="api"'})
+            if user is None:
+                return api_response({"detail": "Authentication credentials were not provided."},
+                                    status=status.HTTP_401_UNAUTHORIZED,
+                                    headers={'WWW-Authenticate': 'Bearer realm="api"'})
+            request.user = user
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,15 @@
+from django.urls import path
+from core import async_views as core_views
+from service_package import async_views as service_package_views
+from user import async_views as user_views
+
+# Async variants of the hot read endpoints, mirroring the paths under /api/
+urlpatterns = [
+    path('users/profile/', user_views.profile, name='async_user_profile_api'),
+    path('services/packages/', service_package_views.package_catalog, name='async_service_package_list_api'),
+    path('services/subscriptions/', service_package_views.subscription_list, name='async_subscription_list_api'),
+    path('services/entitlements/<int:package_id>/', service_package_views.entitlement, name='async_entitlement_api'),
+    
+    # Live event stream (Server-Sent Events), ASGI only
+    path('events/', core_views.event_stream, name='async_event_stream_api'),
+]
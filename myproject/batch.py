@@ -0,0 +1,202 @@
+"""
+Batched API calls: ``POST /api/batch/`` runs several API requests in one
+round trip.
+
+    POST /api/batch/
+    {"requests": [
+        {"id": "profile", "method": "GET", "path": "/api/users/profile/"},
+        {"id": "departments", "method": "GET", "path": "/api/departments/departments/?page_size=50"},
+        {"id": "cancel", "method": "PATCH", "path": "/api/services/subscriptions/7/",
+         "body": {"status": "cancelled"}}
+    ]}
+
+Each sub-request is dispatched in process to the view its path resolves to,
+as the caller: the batch is authenticated once and the sub-requests reuse
+its user through DRF's forced authentication, while each view still runs
+its own permission checks. The responses come back in request order:
+
+    {"responses": [{"id": "profile", "status": 200, "headers": {...}, "body": {...}}, ...]}
+
+A failing sub-request doesn't fail the batch, it gets its own status.
+
+Writes run one at a time, in order, on the request thread. The reads
+between two writes run concurrently (see core/parallel.py) and see the
+writes before them. Streaming responses (exports) and the async endpoints
+aren't available in a batch.
+"""
+import io
+import json
+import logging
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import StreamingHttpResponse
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.views import APIView
+
+from core.parallel import run_parallel
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+METHODS = READ_METHODS | {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+# Request headers a sub-request may set; authentication comes from the batch
+HEADERS = {'accept-language', 'if-match', 'if-modified-since', 'if-none-match'}
+
+# Parent request META not passed on to the sub-requests
+SKIPPED_META = {
+    'CONTENT_LENGTH', 'CONTENT_TYPE', 'PATH_INFO', 'QUERY_STRING', 'REQUEST_METHOD', 'wsgi.input',
+    'HTTP_ACCEPT_LANGUAGE', 'HTTP_IF_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_NONE_MATCH',
+}
+
+# Response headers the client has no use for in a batch
+SKIPPED_HEADERS = {'allow', 'content-length', 'content-type', 'vary', 'x-frame-options'}
+
+
+class InvalidSubRequest(Exception):
+    pass
+
+
+def get_batch_settings():
+    options = {
+        'MAX_REQUESTS': 20,
+    }
+    options.update(getattr(settings, 'BATCH', {}))
+    return options
+
+
+def parse_sub_request(item, batch_path):
+    """Validate one entry of ``requests``, returns it normalized"""
+    if not isinstance(item, dict):
+        raise InvalidSubRequest("should be an object")
+    method = str(item.get('method', 'GET')).upper()
+    if method not in METHODS:
+        raise InvalidSubRequest(f"unsupported method {method}")
+    path = item.get('path')
+    if not isinstance(path, str) or not path.startswith('/api/'):
+        raise InvalidSubRequest("path should start with /api/")
+    if path.partition('?')[0] == batch_path:
+        raise InvalidSubRequest("batches can't be nested")
+    headers = item.get('headers') or {}
+    if not isinstance(headers, dict) or any(name.lower() not in HEADERS for name in headers):
+        raise InvalidSubRequest(f"headers may only be {', '.join(sorted(HEADERS))}")
+    return {
+        'id': item.get('id'),
+        'method': method,
+        'path': path,
+        'headers': {name: str(value) for name, value in headers.items()},
+        'body': item.get('body'),
+    }
+
+
+def build_request(request, item):
+    """A WSGI request for ``item``, authenticated as the batch's caller"""
+    path, _, query = item['path'].partition('?')
+    body = b'' if item['body'] is None else json.dumps(item['body'], cls=JSONEncoder).encode()
+    environ = {key: value for key, value in request.META.items() if key not in SKIPPED_META}
+    environ.update({
+        'REQUEST_METHOD': item['method'],
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    })
+    for name, value in item['headers'].items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    sub_request = WSGIRequest(environ)
+    # Read by rest_framework.request.Request in place of the authenticators
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def _error(item, status_code, message):
+    return {'id': item['id'], 'status': status_code, 'headers': {}, 'body': {'error': message}}
+
+
+def dispatch(request, item):
+    """Run ``item`` through its view, returns its entry of ``responses``"""
+    try:
+        match = resolve(item['path'].partition('?')[0])
+    except Resolver404:
+        return _error(item, status.HTTP_404_NOT_FOUND, "Not found")
+    if iscoroutinefunction(match.func) or not hasattr(match.func, 'cls'):
+        return _error(item, status.HTTP_400_BAD_REQUEST, "This endpoint isn't available in a batch")
+
+    sub_request = build_request(request, item)
+    sub_request.resolver_match = match
+    try:
+        response = match.func(sub_request, *match.args, **match.kwargs)
+    except Exception:
+        logger.exception("Batch sub-request %s %s failed", item['method'], item['path'])
+        return _error(item, status.HTTP_500_INTERNAL_SERVER_ERROR, "Internal server error")
+
+    if isinstance(response, StreamingHttpResponse):
+        response.close()
+        return _error(item, status.HTTP_400_BAD_REQUEST, "Streaming responses aren't available in a batch")
+    if item['method'] == 'HEAD':
+        body = None
+    elif isinstance(response, Response):
+        # Rendered once, with the whole batch
+        body = response.data
+    elif response.get('Content-Type', '').startswith('application/json'):
+        body = json.loads(response.content)
+    else:
+        body = response.content.decode(response.charset) or None
+    headers = {name: value for name, value in response.items() if name.lower() not in SKIPPED_HEADERS}
+    return {'id': item['id'], 'status': response.status_code, 'headers': headers, 'body': body}
+
+
+def run_batch(request, items):
+    """Dispatch ``items`` as described above, returns the responses in order"""
+    responses = [None] * len(items)
+    reads = []
+
+    def run_reads():
+        results = run_parallel((dispatch, (request, items[index])) for index in reads)
+        for index, response in zip(reads, results):
+            responses[index] = response
+        reads.clear()
+
+    for index, item in enumerate(items):
+        if item['method'] in READ_METHODS:
+            reads.append(index)
+        else:
+            run_reads()
+            responses[index] = dispatch(request, item)
+    run_reads()
+    return responses
+
+
+class BatchAPIView(APIView):
+    """
+    API endpoint running a list of API requests in one round trip
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        items = request.data.get('requests') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response({"error": "requests should be a non-empty list"},
+                          status=status.HTTP_400_BAD_REQUEST)
+        max_requests = get_batch_settings()['MAX_REQUESTS']
+        if len(items) > max_requests:
+            return Response({"error": f"A batch holds at most {max_requests} requests"},
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        parsed = []
+        for index, item in enumerate(items):
+            try:
+                parsed.append(parse_sub_request(item, request.path))
+            except InvalidSubRequest as e:
+                return Response({"error": f"Request {index}: {e}"},
+                              status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"responses": run_batch(request, parsed)})
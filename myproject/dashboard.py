@@ -0,0 +1,155 @@
+"""
+Everything the dashboard SPA loads at start in one call:
+``GET /api/dashboard/``, shaped by the caller's role.
+
+    {
+      "role": "department_admin",
+      "profile": {...},
+      "reseller": null,
+      "departments": [...],
+      "subscriptions": [...],
+      "transactions": [...],
+      "catalog": [...]
+    }
+
+``profile`` is what ``/api/users/profile/`` returns and ``catalog`` the
+active packages of ``/api/services/packages/``. ``departments`` are the
+ones the caller administers with their counters: for root admins the most
+recently updated ones, for reseller admins their customers, who also get
+their ``reseller``. ``subscriptions`` are the active ones ending soonest,
+``transactions`` the most recent. Lists hold at most ``DASHBOARD['LIMIT']``
+rows and show what the matching list endpoints would.
+
+The sections are independent queries and run concurrently (see
+core/parallel.py). The response is cached per user and invalidated through
+the ``dashboard`` namespace (see core/dependencies.py); the catalog has a
+cache of its own and is added to the cached sections on the way out.
+"""
+import collections
+
+from django.conf import settings
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.parallel import run_parallel
+from core.response_cache import cache_response
+from department.models import Department, DepartmentAdmin
+from department.serializers import DepartmentSerializer
+from reseller.models import Reseller, ResellerAdmin
+from reseller.serializers import ResellerSerializer
+from service_package.api_views import get_visible_subscriptions, get_visible_transactions
+from service_package.catalog import get_catalog
+from service_package.serializers import SubscriptionSerializer, TransactionSerializer
+from user.serializers import UserSerializer
+
+
+def get_dashboard_settings():
+    options = {
+        'LIMIT': 10,
+        'TIMEOUT': 300,
+    }
+    options.update(getattr(settings, 'DASHBOARD', {}))
+    return options
+
+
+class Role(collections.namedtuple('Role', 'name reseller_admin department_ids')):
+    """The caller's role, with the rows that scope what they see"""
+
+
+def get_role(user):
+    if user.is_root_admin:
+        return Role('root_admin', None, [])
+    department_ids = list(DepartmentAdmin.objects.filter(user=user).values_list('department_id', flat=True))
+    reseller_admin = ResellerAdmin.objects.filter(user=user).first() if user.is_reseller_admin else None
+    if reseller_admin is not None:
+        return Role('reseller_admin', reseller_admin, department_ids)
+    if department_ids:
+        return Role('department_admin', None, department_ids)
+    return Role('user', None, [])
+
+
+def dashboard_dependencies(view, request):
+    role = view.get_role(request)
+    pairs = [('dashboard', f'user:{request.user.pk}')]
+    if role.name == 'root_admin':
+        pairs.append(('dashboard', 'root'))
+    if role.reseller_admin is not None:
+        pairs.append(('dashboard', f'reseller:{role.reseller_admin.reseller_id}'))
+    pairs += [('dashboard', f'department:{department_id}') for department_id in role.department_ids]
+    return pairs
+
+
+def user_scope(request):
+    # The profile makes every dashboard personal, root admins included
+    return f'user:{request.user.pk}'
+
+
+def load_profile(user):
+    return UserSerializer(user).data
+
+
+def load_reseller(reseller_id):
+    return ResellerSerializer(Reseller.objects.get(pk=reseller_id)).data
+
+
+def load_departments(role, limit):
+    if role.name == 'root_admin':
+        departments = Department.objects.order_by('-updated_at', '-department_id')
+    elif role.name == 'reseller_admin':
+        departments = Department.objects.filter(
+            reseller__reseller_id=role.reseller_admin.reseller_id, reseller__is_active=True,
+        ).order_by('name', 'department_id')
+    else:
+        departments = Department.objects.filter(department_id__in=role.department_ids).order_by('name', 'department_id')
+    return DepartmentSerializer(departments[:limit], many=True).data
+
+
+def load_subscriptions(user, role, limit):
+    subscriptions = get_visible_subscriptions(user, role.reseller_admin).filter(status='active')
+    return SubscriptionSerializer(subscriptions.order_by('end_date', 'id')[:limit], many=True).data
+
+
+def load_transactions(user, limit):
+    transactions = get_visible_transactions(user).order_by('-payment_date', '-id')
+    return TransactionSerializer(transactions[:limit], many=True).data
+
+
+class DashboardAPIView(APIView):
+    """
+    API endpoint returning the caller's dashboard in one response
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_role(self, request):
+        if getattr(self, '_role', None) is None:
+            self._role = get_role(request.user)
+        return self._role
+
+    def get(self, request):
+        response = self.sections(request)
+        data = dict(response.data, catalog=get_catalog(active_only=True)['data'])
+        return Response(data, headers={'X-Cache': response['X-Cache']})
+
+    @cache_response(dependencies=dashboard_dependencies, scope=user_scope,
+                    timeout=get_dashboard_settings()['TIMEOUT'])
+    def sections(self, request):
+        user = request.user
+        role = self.get_role(request)
+        limit = get_dashboard_settings()['LIMIT']
+        calls = {'profile': (load_profile, (user,))}
+        if role.reseller_admin is not None:
+            calls['reseller'] = (load_reseller, (role.reseller_admin.reseller_id,))
+        if role.name != 'user':
+            calls['departments'] = (load_departments, (role, limit))
+            calls['subscriptions'] = (load_subscriptions, (user, role, limit))
+            calls['transactions'] = (load_transactions, (user, limit))
+        sections = dict(zip(calls, run_parallel(calls.values())))
+        return Response({
+            'role': role.name,
+            'profile': sections['profile'],
+            'reseller': sections.get('reseller'),
+            'departments': sections.get('departments', []),
+            'subscriptions': sections.get('subscriptions', []),
+            'transactions': sections.get('transactions', []),
+        })
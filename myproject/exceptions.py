@@ -0,0 +1,18 @@
+"""
+Project-wide DRF exception handler.
+
+Errors this project raises as exceptions get the same ``{"error": ...}``
+body the views return themselves, and a Retry-After when they say how
+long to wait. Everything else is DRF's default handling.
+"""
+from rest_framework.views import exception_handler as drf_exception_handler
+
+from user.hashing import PasswordHashingBusy
+
+
+def exception_handler(exc, context):
+    response = drf_exception_handler(exc, context)
+    if response is not None and isinstance(exc, PasswordHashingBusy):
+        response.data = {"error": str(exc.detail)}
+        response['Retry-After'] = str(exc.retry_after)
+    return response
@@ -0,0 +1,160 @@
+"""
+Sparse fieldsets and opt-in expansion for the nested ``*_details`` fields.
+
+Serializers using ``ExpandableFieldsMixin`` return flat foreign key IDs by
+default. Clients ask for nested objects with ``?expand=`` and trim the
+payload with ``?fields=``:
+
+    /api/services/subscriptions/?expand=department,service_package
+    /api/services/transactions/?expand=subscription.department&fields=id,amount
+"""
+from rest_framework.serializers import ListSerializer
+
+
+def split_param(value):
+    """Split a comma separated query parameter into a list of names"""
+    if not value:
+        return []
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def get_query_params(request):
+    """Query parameters of a DRF or a plain Django request"""
+    return getattr(request, 'query_params', request.GET)
+
+
+def parse_paths(paths):
+    """
+    Turn dotted paths into a one level tree:
+    ['subscription.department', 'user'] -> {'subscription': ['department'], 'user': []}
+    """
+    tree = {}
+    for path in paths:
+        head, _, rest = path.partition('.')
+        nested = tree.setdefault(head, [])
+        if rest:
+            nested.append(rest)
+    return tree
+
+
+class ExpandableFieldsMixin:
+    """
+    Serializer mixin that drops the ``*_details`` fields unless expanded.
+
+    ``expandable_fields`` maps an expand key to the nested field it enables,
+    e.g. ``{'department': 'department_details'}``. The key doubles as the
+    ``select_related`` path used by ``setup_eager_loading``.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        self._expand = kwargs.pop('expand', None)
+        self._sparse_fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+    def _is_top_level(self):
+        parent = self.parent
+        if isinstance(parent, ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def _query_param(self, name):
+        request = self.context.get('request')
+        if request is None or not self._is_top_level():
+            return None
+        return get_query_params(request).get(name)
+
+    def get_expand_tree(self):
+        if self._expand is None:
+            self._expand = split_param(self._query_param('expand'))
+        return parse_paths(self._expand)
+
+    def get_sparse_fields(self):
+        if self._sparse_fields is None:
+            raw = self._query_param('fields')
+            if raw is None:
+                return None
+            self._sparse_fields = split_param(raw)
+        return parse_paths(self._sparse_fields)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expand = self.get_expand_tree()
+        sparse = self.get_sparse_fields() or {}
+
+        for key, field_name in self.expandable_fields.items():
+            if key not in expand:
+                fields.pop(field_name, None)
+                continue
+            nested = fields.get(field_name)
+            if isinstance(nested, ExpandableFieldsMixin):
+                nested._expand = expand[key]
+                nested._sparse_fields = sparse.get(key) or None
+
+        self._readable_names = None
+        if self._sparse_fields is not None:
+            # Expanded objects are always kept, the client asked for them explicitly
+            self._readable_names = set(sparse)
+            for key in set(expand) | {key for key, nested in sparse.items() if nested}:
+                if key in self.expandable_fields:
+                    self._readable_names.add(self.expandable_fields[key])
+        return fields
+
+    @property
+    def _readable_fields(self):
+        fields = self.fields.values()
+        if self._readable_names is None:
+            return (field for field in fields if not field.write_only)
+        return (
+            field for field in fields
+            if not field.write_only and field.field_name in self._readable_names
+        )
+
+    @classmethod
+    def get_eager_loading(cls, expand, prefix=''):
+        """
+        Return the (select_related, prefetch_related) paths needed to
+        render ``expand`` without per-row queries.
+        """
+        select, prefetch = [], []
+        for key, nested_keys in parse_paths(expand).items():
+            field_name = cls.expandable_fields.get(key)
+            if field_name is None:
+                continue
+            path = prefix + key
+            select.append(path)
+
+            nested = cls._declared_fields.get(field_name)
+            for related in getattr(nested, 'eager_prefetch', ()):
+                prefetch.append(f'{path}__{related}')
+            if isinstance(nested, ExpandableFieldsMixin) and nested_keys:
+                nested_select, nested_prefetch = nested.get_eager_loading(
+                    nested_keys, prefix=f'{path}__'
+                )
+                select.extend(nested_select)
+                prefetch.extend(nested_prefetch)
+        return select, prefetch
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, request=None, expand=None):
+        """Apply the joins matching the requested expansion to ``queryset``"""
+        if expand is None:
+            expand = split_param(get_query_params(request).get('expand')) if request else []
+        select, prefetch = cls.get_eager_loading(expand)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+
+class ExpandableQuerysetMixin:
+    """
+    ViewSet mixin that makes list/retrieve querysets follow ``?expand=``.
+    """
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, ExpandableFieldsMixin):
+            queryset = serializer_class.setup_eager_loading(queryset, self.request)
+        return queryset
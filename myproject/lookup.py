@@ -0,0 +1,101 @@
+"""
+Bulk reads by primary key.
+
+ViewSets using ``BulkLookupMixin`` get a ``lookup/`` route resolving a list
+of IDs in one query, either from the query string or, for long lists, from
+a POST body:
+
+    GET /api/departments/departments/lookup/?ids=4,1,9
+    POST /api/departments/departments/lookup/  {"ids": [4, 1, 9]}
+
+    {
+        "results": [{"department_id": 4, ...}, {"department_id": 1, ...}],
+        "missing": [9]
+    }
+
+Results are in the order asked for, shaped like the list endpoint
+(``?expand=``/``?fields=`` apply) and scoped like it: IDs that don't exist
+and IDs the caller can't see are both reported in ``missing``, so a lookup
+reveals nothing a list wouldn't. Repeated IDs are returned once.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from myproject.expansion import split_param
+from myproject.readers import get_values_reader
+
+
+class InvalidLookup(Exception):
+    pass
+
+
+def get_lookup_settings():
+    options = {
+        'MAX_IDS': 500,
+    }
+    options.update(getattr(settings, 'LOOKUP', {}))
+    return options
+
+
+def parse_ids(values, pk_field):
+    """Return ``values`` as primary keys, in order and without repeats"""
+    ids = []
+    for value in values:
+        try:
+            pk = pk_field.to_python(value)
+        except (ValidationError, TypeError):
+            pk = None
+        if pk is None or pk == '':
+            raise InvalidLookup(f"Invalid id: {value!r}")
+        ids.append(pk)
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise InvalidLookup("ids is required")
+    max_ids = get_lookup_settings()['MAX_IDS']
+    if len(ids) > max_ids:
+        raise InvalidLookup(f"A lookup resolves at most {max_ids} ids")
+    return ids
+
+
+class BulkLookupMixin:
+    """
+    ViewSet mixin adding a ``lookup/`` route resolving many IDs at once, see
+    the module docstring.
+    """
+    def get_lookup_ids(self, request):
+        if request.method == 'POST':
+            values = request.data.get('ids') if isinstance(request.data, dict) else None
+            if not isinstance(values, list):
+                raise InvalidLookup("ids should be a list")
+        else:
+            values = split_param(request.query_params.get('ids'))
+        return parse_ids(values, self.get_queryset().model._meta.pk)
+
+    @action(detail=False, methods=['get', 'post'], url_path='lookup')
+    def lookup(self, request):
+        try:
+            ids = self.get_lookup_ids(request)
+        except InvalidLookup as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        pk_name = queryset.model._meta.pk.name
+        queryset = queryset.filter(pk__in=ids).order_by()
+        serializer_class = self.get_serializer_class()
+        reader = get_values_reader(serializer_class, request)
+        if reader is not None:
+            rows = list(queryset.prefetch_related(None).values_list(pk_name, *reader.paths))
+            found = dict(zip((row[0] for row in rows), reader.build(row[1:] for row in rows)))
+        else:
+            instances = {instance.pk: instance for instance in queryset}
+            ordered = [instances[pk] for pk in ids if pk in instances]
+            data = serializer_class(ordered, many=True, context=self.get_serializer_context()).data
+            found = {instance.pk: item for instance, item in zip(ordered, data)}
+
+        return Response({
+            "results": [found[pk] for pk in ids if pk in found],
+            "missing": [pk for pk in ids if pk not in found],
+        })
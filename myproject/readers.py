@@ -0,0 +1,227 @@
+"""
+Values-based read path for hot list endpoints.
+
+``ValuesReader`` compiles a serializer into a plan over ``values_list()``
+columns, so list responses are built from plain tuples instead of model
+instances and per-row field lookups. The output is identical to
+``serializer.data``: values go through the serializer's own
+``to_representation`` unless the field is known to return database
+values unchanged, or is a plain ISO 8601 date/datetime field.
+
+Serializers that use fields the plan can't express (custom sources,
+method fields without a ``get_<name>_bulk`` variant, ...) are not
+compiled, and callers fall back to the regular serializer.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.relations import RelatedField
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from myproject.expansion import ExpandableFieldsMixin, get_query_params, split_param
+
+
+class Unsupported(Exception):
+    """Raised while compiling when a field has no values-based equivalent"""
+
+
+# Fields whose to_representation() returns database values unchanged
+_PASSTHROUGH = {
+    serializers.CharField.to_representation,
+    serializers.IntegerField.to_representation,
+    serializers.BooleanField.to_representation,
+    serializers.ChoiceField.to_representation,
+}
+
+
+def _is_passthrough(field):
+    if isinstance(field, serializers.JSONField):
+        return not field.binary
+    return type(field).to_representation in _PASSTHROUGH
+
+
+def _is_iso_format(field, default):
+    output_format = getattr(field, 'format', default)
+    return isinstance(output_format, str) and output_format.lower() == ISO_8601
+
+
+def _datetime_converter(field):
+    """
+    DateTimeField.to_representation with the current timezone looked up once
+    per page instead of once per value.
+    """
+    fallback = field.to_representation
+
+    def convert(value, tz):
+        if tz is None or timezone.is_naive(value):
+            return fallback(value)
+        value = value.astimezone(tz).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+class ValuesReader:
+    """
+    Read plan for one serializer configuration.
+
+    The plan is compiled into a single function mapping a ``values_list()``
+    row to the response dictionary. Method fields are supported through a
+    ``get_<name>_bulk(pks)`` method on the serializer which returns
+    ``{pk: value}`` for a whole page.
+    """
+    def __init__(self, serializer):
+        self.field_names = [field.field_name for field in serializer._readable_fields]
+        self.paths = []
+        self._columns = {}
+        self._bulk = []
+        self._namespace = {}
+        expression = self._compile(serializer, prefix='')
+        source = f'def build(row, bulk, tz):\n    return {expression}\n'
+        exec(compile(source, f'<values reader {type(serializer).__name__}>', 'exec'), self._namespace)
+        self._build = self._namespace['build']
+
+    def _column(self, path):
+        if path not in self._columns:
+            self._columns[path] = len(self.paths)
+            self.paths.append(path)
+        return self._columns[path]
+
+    def _bind(self, value):
+        name = f'_c{len(self._namespace)}'
+        self._namespace[name] = value
+        return name
+
+    def _compile(self, serializer, prefix):
+        """Return the source of a dict expression rendering ``serializer``"""
+        model = serializer.Meta.model
+        items = []
+
+        for field in serializer._readable_fields:
+            name = field.field_name
+            source = field.source
+
+            if isinstance(field, serializers.ListSerializer):
+                raise Unsupported(name)
+
+            if isinstance(field, serializers.ModelSerializer):
+                # Nested object reached through a foreign key on this model
+                index = self._column(prefix + source)
+                nested = self._compile(field, f'{prefix}{source}__')
+                items.append((name, f'None if row[{index}] is None else {nested}'))
+                continue
+
+            if isinstance(field, serializers.SerializerMethodField):
+                bulk = getattr(serializer, f'{field.method_name}_bulk', None)
+                if bulk is None:
+                    raise Unsupported(name)
+                index = self._column(prefix + model._meta.pk.name)
+                self._bulk.append((index, bulk))
+                slot = len(self._bulk) - 1
+                items.append((name, f'None if row[{index}] is None else bulk[{slot}].get(row[{index}])'))
+                continue
+
+            if source == '*' or '.' in source:
+                raise Unsupported(name)
+            try:
+                model_field = model._meta.get_field(source)
+            except FieldDoesNotExist:
+                raise Unsupported(name)
+            if not model_field.concrete or model_field.many_to_many:
+                raise Unsupported(name)
+
+            index = self._column(prefix + source)
+            value = f'row[{index}]'
+            if isinstance(field, RelatedField) or _is_passthrough(field):
+                # values_list() already yields the primary key of a relation
+                items.append((name, value))
+            elif type(field) is serializers.DateTimeField and not hasattr(field, 'timezone') \
+                    and _is_iso_format(field, api_settings.DATETIME_FORMAT):
+                convert = self._bind(_datetime_converter(field))
+                items.append((name, f'None if {value} is None else {convert}({value}, tz)'))
+            elif type(field) is serializers.DateField \
+                    and _is_iso_format(field, api_settings.DATE_FORMAT):
+                items.append((name, f'None if {value} is None else {value}.isoformat()'))
+            else:
+                convert = self._bind(field.to_representation)
+                items.append((name, f'None if {value} is None else {convert}({value})'))
+
+        body = ', '.join(f'{name!r}: ({expression})' for name, expression in items)
+        return '{' + body + '}'
+
+    @property
+    def needs_queries(self):
+        """Whether ``build`` runs queries of its own (for ``get_<name>_bulk`` fields)"""
+        return bool(self._bulk)
+
+    def values(self, queryset):
+        """Return ``queryset`` as a values_list() queryset with the plan's columns"""
+        return queryset.prefetch_related(None).values_list(*self.paths)
+
+    def build(self, rows):
+        """Turn fetched ``values_list()`` rows into response dictionaries"""
+        rows = list(rows)
+        bulk = []
+        for index, resolve in self._bulk:
+            pks = {row[index] for row in rows if row[index] is not None}
+            bulk.append(resolve(pks) if pks else {})
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        build = self._build
+        return [build(row, bulk, tz) for row in rows]
+
+    def read(self, queryset):
+        return self.build(self.values(queryset))
+
+
+@lru_cache(maxsize=128)
+def _compile_reader(serializer_class, expand, fields):
+    if issubclass(serializer_class, ExpandableFieldsMixin):
+        serializer = serializer_class(
+            expand=list(expand),
+            fields=list(fields) if fields is not None else None,
+        )
+    else:
+        serializer = serializer_class()
+    try:
+        return ValuesReader(serializer)
+    except Unsupported:
+        return None
+
+
+def get_values_reader(serializer_class, request=None, expand=None):
+    """
+    Return the compiled ``ValuesReader`` for ``serializer_class`` and the
+    ``?expand=``/``?fields=`` of ``request``, or ``None`` when the serializer
+    can't be served from ``values_list()``. ``expand`` overrides the
+    request's expansion.
+    """
+    fields = None
+    if request is not None and issubclass(serializer_class, ExpandableFieldsMixin):
+        query_params = get_query_params(request)
+        if expand is None:
+            expand = split_param(query_params.get('expand'))
+        if 'fields' in query_params:
+            fields = tuple(split_param(query_params.get('fields')))
+    return _compile_reader(serializer_class, tuple(expand or ()), fields)
+
+
+class ValuesListMixin:
+    """
+    ViewSet mixin serving ``list`` from ``values_list()`` when possible.
+    """
+    def list(self, request, *args, **kwargs):
+        reader = get_values_reader(self.get_serializer_class(), request)
+        if reader is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = reader.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(reader.build(page))
+        return Response(reader.build(queryset))
+
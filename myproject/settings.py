@@ -63,6 +63,7 @@ INSTALLED_APPS = [
     'department',
     'service_package',
     'reseller',
+    'core',
 ]
 
 # JWT Settings
@@ -70,6 +71,7 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'EXCEPTION_HANDLER': 'myproject.exceptions.exception_handler',
 }
 # JWT settings
 from datetime import timedelta
@@ -114,6 +116,7 @@ MIDDLEWARE = [
 
     'allauth.account.middleware.AccountMiddleware',
     "user.middleware.JWTAuthenticationMiddleware",
+    "core.middleware.ReadYourWritesMiddleware",
 ]
 
 # Static files configuration
@@ -196,15 +199,73 @@ ACCOUNT_DEFAULT_HTTP_PROTOCOL = 'http'  # Change to 'https' in production
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# Each worker process keeps a psycopg 3 connection pool per database, sized
+# to its thread count (GUNICORN_THREADS, see gunicorn.conf.py) and the
+# threads running parallel request work (PARALLEL_WORKERS, see
+# core/parallel.py) plus a little headroom for background threads. Without psycopg_pool,
+# connections persist per thread instead. Pool metrics: /api/db/pools/
+try:
+    import psycopg_pool  # noqa: F401
+    DB_POOL_AVAILABLE = True
+except ImportError:
+    DB_POOL_AVAILABLE = False
+
+DB_POOL_ENABLED = DB_POOL_AVAILABLE and os.environ.get('DB_POOL', 'True').lower() == 'true'
+PARALLEL_WORKERS = int(os.environ.get('PARALLEL_WORKERS', '4'))
+DB_POOL_MAX_SIZE = int(os.environ.get(
+    'DB_POOL_MAX_SIZE', int(os.environ.get('GUNICORN_THREADS', '1')) + PARALLEL_WORKERS + 2
+))
+DB_POOL_OPTIONS = {
+    'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '1')),
+    'max_size': DB_POOL_MAX_SIZE,
+    # Seconds a request waits for a free connection before failing
+    'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+    'max_idle': 300,
+    'max_lifetime': 1800,
+}
+
+
+def database_settings(host, statement_timeout_ms):
+    options = {'options': f'-c statement_timeout={statement_timeout_ms}'}
+    if DB_POOL_ENABLED:
+        options['pool'] = dict(DB_POOL_OPTIONS)
+    return {
         'ENGINE': 'django.db.backends.postgresql',
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASSWORD'),
-        'HOST': os.environ.get('DB_HOST'),
+        'HOST': host,
         'PORT': os.environ.get('DB_PORT', '5432'),
+        # Pooled connections are returned at the end of each request
+        'CONN_MAX_AGE': 0 if DB_POOL_ENABLED else 60,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': options,
+    }
+
+
+DATABASES = {
+    'default': database_settings(
+        os.environ.get('DB_HOST'),
+        int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', '30000')),
+    ),
+}
+
+# Read replicas (comma separated hosts, same credentials as the primary).
+# List/retrieve reads of the API viewsets go to a replica, see core/db_router.py.
+# Exports run there too, so replicas allow longer statements.
+DB_REPLICA_HOSTS = [host.strip() for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+for index, host in enumerate(DB_REPLICA_HOSTS, start=1):
+    DATABASES[f'replica{index}'] = {
+        **database_settings(host, int(os.environ.get('DB_REPLICA_STATEMENT_TIMEOUT_MS', '120000'))),
+        'TEST': {'MIRROR': 'default'},
     }
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+DATABASE_REPLICATION = {
+    'REPLICAS': [f'replica{index}' for index in range(1, len(DB_REPLICA_HOSTS) + 1)],
+    'MAX_LAG': float(os.environ.get('DB_REPLICA_MAX_LAG', '5')),
+    'PIN_SECONDS': int(os.environ.get('DB_REPLICA_PIN_SECONDS', '15')),
 }
 
 
@@ -227,6 +288,21 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Login and registration hash passwords on a small thread pool per worker
+# (see user/hashing.py). At most MAX_PENDING hashes run or queue at once, by
+# default half the worker's threads, so a login storm can't take every
+# thread away from the read endpoints. Callers that can't get a slot within
+# WAIT seconds get a 503. WORKERS=0 hashes inline
+PASSWORD_HASHING = {
+    'WORKERS': int(os.environ.get('PASSWORD_HASHING_WORKERS', '1')),
+    'MAX_PENDING': int(os.environ.get(
+        'PASSWORD_HASHING_MAX_PENDING', max(1, int(os.environ.get('GUNICORN_THREADS', '1')) // 2)
+    )),
+    'WAIT': float(os.environ.get('PASSWORD_HASHING_WAIT', '0.5')),
+    # Bulk user imports hash on their own pool of this many threads
+    'BULK_WORKERS': int(os.environ.get('PASSWORD_HASHING_BULK_WORKERS', os.cpu_count() or 2)),
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -252,3 +328,137 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # Tell Django to use our custom User model
 AUTH_USER_MODEL = 'user.User'
+
+# Caches: process-local by default. CACHE_BACKEND=postgres shares entries
+# between workers through an UNLOGGED table (core/cache_backends.py) with a
+# short-lived local L1 in front of it
+if os.environ.get('CACHE_BACKEND') == 'postgres':
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.TwoTierCache',
+            'OPTIONS': {'L1': 'local', 'L2': 'shared'},
+        },
+        'local': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'TIMEOUT': int(os.environ.get('CACHE_L1_TIMEOUT', '5')),
+        },
+        'shared': {
+            'BACKEND': 'core.cache_backends.PostgresCache',
+            'LOCATION': 'core_cache_entries',
+            'TIMEOUT': 300,
+            'OPTIONS': {
+                'EXPIRY_INTERVAL': int(os.environ.get('CACHE_EXPIRY_INTERVAL', '60')),
+                'EXPIRY_BATCH': 1000,
+            },
+        },
+    }
+else:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    }
+
+# Delta sync (the changes/ routes, see core/sync.py)
+DELTA_SYNC = {
+    'PAGE_SIZE': 500,
+    # Rows are reported once this old, so slow transactions aren't skipped
+    'SETTLE_SECONDS': int(os.environ.get('DELTA_SYNC_SETTLE_SECONDS', '5')),
+    # Deletes are remembered this long; older watermarks must do a full sync
+    'TOMBSTONE_RETENTION_DAYS': int(os.environ.get('DELTA_SYNC_TOMBSTONE_RETENTION_DAYS', '30')),
+}
+
+# Outbox webhook delivery, see core/webhooks.py
+WEBHOOKS = {
+    'BATCH_SIZE': int(os.environ.get('WEBHOOKS_BATCH_SIZE', '100')),
+    # Endpoints delivered to at the same time
+    'CONCURRENCY': int(os.environ.get('WEBHOOKS_CONCURRENCY', '20')),
+    'TIMEOUT': 10,
+    # Retries back off from RETRY_BASE_SECONDS, doubling up to RETRY_MAX_SECONDS
+    'RETRY_BASE_SECONDS': 5,
+    'RETRY_MAX_SECONDS': 3600,
+    # Events are deleted after this many days, unless an active endpoint
+    # has yet to receive them
+    'RETENTION_DAYS': int(os.environ.get('WEBHOOKS_RETENTION_DAYS', '7')),
+}
+
+# Live event stream for admin UIs (ASGI only), see core/live.py
+LIVE_EVENTS = {
+    # One outbox query per worker per interval, however many streams are open
+    'POLL_INTERVAL': float(os.environ.get('LIVE_EVENTS_POLL_INTERVAL', '1')),
+    'HEARTBEAT_SECONDS': 15,
+    # Events buffered per stream before a slow client is told to reconnect
+    'QUEUE_SIZE': 100,
+}
+
+# Background jobs run by manage.py run_worker, see core/jobs.py
+JOBS = {
+    'CONCURRENCY': int(os.environ.get('JOBS_CONCURRENCY', '4')),
+    'POLL_INTERVAL': 1,
+    # Seconds a claimed job stays locked, extended while it runs
+    'VISIBILITY_TIMEOUT': int(os.environ.get('JOBS_VISIBILITY_TIMEOUT', '300')),
+    # Failed jobs retry after RETRY_BASE_SECONDS, doubling up to RETRY_MAX_SECONDS
+    'RETRY_BASE_SECONDS': 10,
+    'RETRY_MAX_SECONDS': 3600,
+    # Finished jobs are deleted after this many days
+    'RETENTION_DAYS': 7,
+}
+
+# Periodic jobs enqueued by manage.py run_scheduler, see core/scheduler.py.
+# Cron fields are minute, hour, day of month, month, day of week, in TIME_ZONE.
+SCHEDULE = {
+    'expire-subscriptions': {'cron': '5 0 * * *', 'task': 'service_package.expire_subscriptions'},
+    'prune-tombstones': {'cron': '15 3 * * *', 'task': 'core.prune_tombstones'},
+    'prune-outbox': {'cron': '30 3 * * *', 'task': 'core.prune_outbox'},
+    'prune-jobs': {'cron': '45 3 * * *', 'task': 'core.prune_jobs'},
+    'prune-scheduled-runs': {'cron': '50 3 * * *', 'task': 'core.prune_scheduled_runs'},
+    'repair-counters': {'cron': '0 4 * * 0', 'task': 'core.repair_counters'},
+}
+
+SCHEDULER = {
+    # Seconds between checks for due windows and for the leader lock
+    'TICK': 5,
+    # Windows missed while no scheduler ran are fired up to this far back
+    'MAX_CATCH_UP_DAYS': 7,
+    # Run history is kept this long (each entry's latest run is always kept)
+    'HISTORY_DAYS': 90,
+}
+
+# Threads per worker process running independent queries of a request
+# concurrently, for batches and the dashboard (see core/parallel.py)
+PARALLEL = {
+    'WORKERS': PARALLEL_WORKERS,
+}
+
+# Requests per POST /api/batch/ (see myproject/batch.py)
+BATCH = {
+    'MAX_REQUESTS': 20,
+}
+
+# GET /api/dashboard/ (see myproject/dashboard.py): rows per list, and
+# seconds a dashboard stays cached unless invalidated first
+DASHBOARD = {
+    'LIMIT': 10,
+    'TIMEOUT': 300,
+}
+
+# IDs per lookup/ request (see myproject/lookup.py)
+LOOKUP = {
+    'MAX_IDS': 500,
+}
+
+# search/ routes (see core/search.py): shortest term, results per search
+SEARCH = {
+    'MIN_LENGTH': 3,
+    'LIMIT': 20,
+}
+
+# Admin changelists count exactly up to this many rows and use the
+# planner's estimate past it (see core/admin_tools.py)
+ADMIN = {
+    'EXACT_COUNT_LIMIT': 10000,
+}
+
+# Cross-worker cache invalidation over Postgres LISTEN/NOTIFY (see core/bus.py)
+CACHE_INVALIDATION_BUS = {
+    'ENABLED': os.environ.get('CACHE_INVALIDATION_BUS_ENABLED', 'True').lower() == 'true',
+    'CHANNEL': 'cache_invalidation',
+}
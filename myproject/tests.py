@@ -0,0 +1,123 @@
+import datetime
+import itertools
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from department.models import Department
+from reseller.models import Reseller
+from service_package.models import ServiceAccess, ServicePackage, Subscription, Transaction
+from service_package.serializers import ServiceAccessSerializer, SubscriptionSerializer, TransactionSerializer
+from user.models import User
+
+from .batch import run_batch
+from .lookup import InvalidLookup, parse_ids
+from .readers import _compile_reader
+
+
+class ParseIdsTests(SimpleTestCase):
+    pk_field = User._meta.pk
+
+    def test_order_kept_and_repeats_dropped(self):
+        self.assertEqual(parse_ids(['4', 1, '9', '4', 1], self.pk_field), [4, 1, 9])
+
+    def test_invalid(self):
+        for values in ([], ['a'], [None], ['1', '']):
+            with self.subTest(values=values), self.assertRaises(InvalidLookup):
+                parse_ids(values, self.pk_field)
+
+    @override_settings(LOOKUP={'MAX_IDS': 2})
+    def test_limit_counts_distinct_ids(self):
+        self.assertEqual(parse_ids(['1', '2', '1'], self.pk_field), [1, 2])
+        with self.assertRaises(InvalidLookup):
+            parse_ids(['1', '2', '3'], self.pk_field)
+
+
+class RunBatchTests(SimpleTestCase):
+    def test_writes_split_the_concurrent_reads(self):
+        calls = []
+
+        def dispatch(request, item):
+            calls.append(item['id'])
+            return item['id']
+
+        def run_parallel(pairs):
+            pairs = list(pairs)
+            if pairs:
+                calls.append([args[1]['id'] for _, args in pairs])
+            return [function(*args) for function, args in pairs]
+
+        items = [
+            {'id': 'a', 'method': 'GET'},
+            {'id': 'b', 'method': 'GET'},
+            {'id': 'c', 'method': 'POST'},
+            {'id': 'd', 'method': 'DELETE'},
+            {'id': 'e', 'method': 'GET'},
+        ]
+        with mock.patch('myproject.batch.dispatch', dispatch), \
+                mock.patch('myproject.batch.run_parallel', run_parallel):
+            responses = run_batch(None, items)
+
+        self.assertEqual(responses, ['a', 'b', 'c', 'd', 'e'])
+        # The reads before a write finish before it starts
+        self.assertEqual(calls, [['a', 'b'], 'a', 'b', 'c', 'd', ['e'], 'e'])
+
+
+class ValuesReaderTests(TestCase):
+    """The compiled readers render the same bytes as the serializers they replace"""
+    cases = [
+        (SubscriptionSerializer, ['department', 'service_package', 'reseller'],
+         [None, (), ('id',), ('id', 'status', 'end_date'), ('department', 'reseller.name'),
+          ('id', 'nonexistent')]),
+        (TransactionSerializer, ['subscription', 'subscription.department', 'subscription.reseller'],
+         [None, ('id', 'amount'), ('payment_date', 'subscription.status'), ('subscription.department.name',)]),
+        (ServiceAccessSerializer, ['user', 'subscription', 'subscription.service_package'],
+         [None, ('id', 'granted_at'), ('subscription.id', 'user.email')]),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        reseller = Reseller.objects.create(name='Reseller')
+        package = ServicePackage.objects.create(name='Package', description='Text', price='19.90',
+                                                features={'seats': 5, 'tags': ['a', 'ü']})
+        today = datetime.date(2026, 3, 1)
+        for i, reseller_or_none in enumerate([reseller, None]):
+            department = Department.objects.create(name=f'Department {i}')
+            user = User.objects.create_user(f'user{i}@example.com', f'User {i}', 'password')
+            subscription = Subscription.objects.create(
+                department=department, service_package=package, start_date=today,
+                end_date=today + datetime.timedelta(days=30), status='active', reseller=reseller_or_none,
+            )
+            ServiceAccess.objects.create(user=user, service_package=package, subscription=subscription)
+            Transaction.objects.create(
+                subscription=subscription, amount='19.90', payment_date=timezone.now(),
+                payment_method='card', transaction_id=f'tx-{i}', status='completed',
+            )
+
+    def combinations(self, expandable):
+        for size in range(len(expandable) + 1):
+            yield from itertools.combinations(expandable, size)
+
+    def test_output_matches_serializer(self):
+        renderer = JSONRenderer()
+        for serializer_class, expandable, field_sets in self.cases:
+            queryset = serializer_class.Meta.model.objects.order_by('pk')
+            for expand, fields in itertools.product(self.combinations(expandable), field_sets):
+                with self.subTest(serializer=serializer_class.__name__, expand=expand, fields=fields):
+                    reader = _compile_reader(serializer_class, expand, fields)
+                    self.assertIsNotNone(reader)
+                    serializer = serializer_class(
+                        queryset, many=True, expand=list(expand),
+                        fields=list(fields) if fields is not None else None,
+                    )
+                    self.assertEqual(renderer.render(reader.read(queryset)), renderer.render(serializer.data))
+
+    @override_settings(TIME_ZONE='Europe/Berlin')
+    def test_datetimes_in_the_current_timezone(self):
+        queryset = Transaction.objects.order_by('pk')
+        reader = _compile_reader(TransactionSerializer, (), ('payment_date',))
+        expected = TransactionSerializer(queryset, many=True, fields=['payment_date']).data
+        self.assertEqual(reader.read(queryset), expected)
+        self.assertTrue(reader.read(queryset)[0]['payment_date'].endswith(('+01:00', '+02:00')))
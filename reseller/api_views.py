@@ -3,12 +3,19 @@ from rest_framework.permissions import IsAuthenticated, BasePermission
 from rest_framework.response import Response
 from rest_framework import status, viewsets
 from rest_framework.views import APIView
+from django.db import IntegrityError
 from django.shortcuts import get_object_or_404
 from .models import Reseller, ResellerAdmin, ResellerCustomer
 from .serializers import ResellerSerializer, ResellerDetailSerializer, ResellerAdminSerializer, ResellerCustomerSerializer
 from user.models import User
-from department.models import Department
 from service_package.models import Subscription, ServicePackage
+from myproject.readers import get_values_reader
+from core.response_cache import cache_response
+from core.db_router import ReplicaReadMixin
+from core.sync import DeltaSyncMixin
+from core.search import SearchMixin
+from myproject.lookup import BulkLookupMixin
+from .provisioning import ProvisioningError, provision_customers, subscription_end_date
 import datetime
 
 # Custom permissions
@@ -21,8 +28,13 @@ class IsRootAdminOrResellerAdmin(BasePermission):
         if request.user.is_root_admin:
             return True
             
-        # For list and retrieve operations, allow reseller admins
-        if request.method == 'GET':
+        # Delta sync is scoped to the caller, and the admins of a deleted
+        # reseller have no ResellerAdmin row left to fetch its tombstone with
+        if view.action == 'changes':
+            return True
+            
+        # For list, retrieve and lookup operations, allow reseller admins
+        if request.method == 'GET' or view.action == 'lookup':
             return ResellerAdmin.objects.filter(user=request.user).exists()
             
         # For create operations, only root admins can create resellers
@@ -45,11 +57,12 @@ class IsRootAdminOrResellerAdmin(BasePermission):
         return request.user.is_root_admin
 
 # Reseller ViewSet
-class ResellerViewSet(viewsets.ModelViewSet):
+class ResellerViewSet(ReplicaReadMixin, DeltaSyncMixin, BulkLookupMixin, SearchMixin, viewsets.ModelViewSet):
     """
     API endpoint for resellers/partners
     """
     queryset = Reseller.objects.all()
+    trigram_search_fields = ('name',)
     permission_classes = [IsAuthenticated, IsRootAdminOrResellerAdmin]
     
     def get_queryset(self):
@@ -71,6 +84,10 @@ class ResellerViewSet(viewsets.ModelViewSet):
         if self.action == 'retrieve':
             return ResellerDetailSerializer
         return ResellerSerializer
+    
+    @cache_response('reseller', tenant_kwarg='pk')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
 # Reseller Admin API
 class ResellerAdminAPI(APIView):
@@ -129,7 +146,7 @@ class ResellerAdminAPI(APIView):
         
         # Create reseller admin relationship
         admin = ResellerAdmin.objects.create(user=user, reseller=reseller)
-        serializer = ResellerAdminSerializer(admin)
+        serializer = ResellerAdminSerializer(admin, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
     def delete(self, request, reseller_id):
@@ -150,6 +167,17 @@ class ResellerAdminAPI(APIView):
         
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+def can_view_customers(view, request, reseller_id):
+    """
+    Check if user has permission to view this reseller's customers. Runs
+    before the response cache, so a removed admin never gets a cached page.
+    """
+    if not (request.user.is_root_admin or 
+            ResellerAdmin.objects.filter(user=request.user, reseller_id=reseller_id).exists()):
+        return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
+    return None
+
+
 # Reseller Customer API
 class ResellerCustomerAPI(APIView):
     """
@@ -157,21 +185,26 @@ class ResellerCustomerAPI(APIView):
     """
     permission_classes = [IsAuthenticated]
     
+    @cache_response('reseller_customers', tenant_kwarg='reseller_id', stale_timeout=60,
+                    permission=can_view_customers)
     def get(self, request, reseller_id):
         """Get all customers for a reseller"""
         reseller = get_object_or_404(Reseller, reseller_id=reseller_id)
-        
-        # Check if user has permission to view this reseller's customers
-        if not (request.user.is_root_admin or 
-                ResellerAdmin.objects.filter(user=request.user, reseller=reseller).exists()):
-            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-        
         customers = ResellerCustomer.objects.filter(reseller=reseller)
-        serializer = ResellerCustomerSerializer(customers, many=True)
+        reader = get_values_reader(ResellerCustomerSerializer, request)
+        if reader is not None:
+            return Response(reader.read(customers))
+        
+        customers = ResellerCustomerSerializer.setup_eager_loading(customers, request)
+        serializer = ResellerCustomerSerializer(customers, many=True, context={'request': request})
         return Response(serializer.data)
     
     def post(self, request, reseller_id):
-        """Add a customer to a reseller"""
+        """
+        Add a customer to a reseller, optionally with an admin user and an
+        initial subscription. A list body provisions a batch of customers,
+        all or nothing.
+        """
         reseller = get_object_or_404(Reseller, reseller_id=reseller_id)
         
         # Check if user has permission to add customers to this reseller
@@ -179,29 +212,26 @@ class ResellerCustomerAPI(APIView):
                 ResellerAdmin.objects.filter(user=request.user, reseller=reseller).exists()):
             return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
         
-        # Create a new department for the customer
-        name = request.data.get('name')
-        description = request.data.get('description')
-        
-        if not name:
-            return Response({"error": "Customer name is required"}, status=status.HTTP_400_BAD_REQUEST)
+        many = isinstance(request.data, list)
+        customers = request.data if many else [request.data]
+        if not customers:
+            return Response({"error": "No customers given"}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Create the department with customer_type set to 'reseller'
-        department = Department.objects.create(
-            name=name,
-            description=description,
-            customer_type='reseller'
-        )
+        try:
+            results = provision_customers(reseller, customers)
+        except ProvisioningError as error:
+            if many:
+                return Response({"error": "Invalid customers", "customers": error.errors},
+                                status=status.HTTP_400_BAD_REQUEST)
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        except IntegrityError:
+            # An admin email was taken after validation
+            return Response({"error": "A user with this email already exists"}, status=status.HTTP_409_CONFLICT)
         
-        # Create the reseller-customer relationship
-        customer = ResellerCustomer.objects.create(
-            reseller=reseller,
-            department=department,
-            is_active=True
+        serializer = ResellerCustomerSerializer(
+            [result['customer'] for result in results], many=True, context={'request': request}
         )
-        
-        serializer = ResellerCustomerSerializer(customer)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.data if many else serializer.data[0], status=status.HTTP_201_CREATED)
     
     def delete(self, request, reseller_id, customer_id):
         """Remove a customer from a reseller"""
@@ -245,7 +275,7 @@ class ResellerSubscriptionAPI(APIView):
         
         # Check if department exists and belongs to this reseller
         try:
-            customer = ResellerCustomer.objects.get(
+            customer = ResellerCustomer.objects.select_related('department').get(
                 department__department_id=department_id, 
                 reseller=reseller
             )
@@ -261,14 +291,7 @@ class ResellerSubscriptionAPI(APIView):
         
         # Calculate subscription dates based on billing cycle
         start_date = datetime.date.today()
-        if service_package.billing_cycle == 'monthly':
-            end_date = start_date + datetime.timedelta(days=30)
-        elif service_package.billing_cycle == 'quarterly':
-            end_date = start_date + datetime.timedelta(days=90)
-        elif service_package.billing_cycle == 'yearly':
-            end_date = start_date + datetime.timedelta(days=365)
-        else:
-            end_date = start_date + datetime.timedelta(days=30)  # Default to monthly
+        end_date = subscription_end_date(service_package, start_date)
         
         # Create the subscription with reseller information
         subscription = Subscription.objects.create(
@@ -282,5 +305,5 @@ class ResellerSubscriptionAPI(APIView):
         )
         
         from service_package.serializers import SubscriptionSerializer
-        serializer = SubscriptionSerializer(subscription)
+        serializer = SubscriptionSerializer(subscription, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-18 22:56
+
+from django.db import migrations, models
+
+from core.counters import drop_triggers, install_triggers
+
+
+def create_counter_triggers(apps, schema_editor):
+    install_triggers(schema_editor, 'resellers')
+
+
+def drop_counter_triggers(apps, schema_editor):
+    drop_triggers(schema_editor, 'resellers')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reseller', '0001_initial'),
+        ('service_package', '0002_subscription_reseller_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reseller',
+            name='active_subscription_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='reseller',
+            name='customer_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(create_counter_triggers, drop_counter_triggers),
+    ]
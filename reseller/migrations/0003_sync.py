@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 23:00
+
+from django.db import migrations, models
+
+from core.counters import install_triggers
+
+
+def recreate_counter_triggers(apps, schema_editor):
+    # The triggers now also bump updated_at
+    install_triggers(schema_editor, 'resellers')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reseller', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reseller',
+            index=models.Index(fields=['updated_at', 'reseller_id'], name='resellers_updated_idx'),
+        ),
+        migrations.RunPython(recreate_counter_triggers, migrations.RunPython.noop),
+    ]
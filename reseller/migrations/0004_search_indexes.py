@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 23:40
+
+from django.db import migrations
+
+from core.search import drop_trigram_indexes, install_trigram_indexes
+
+COLUMNS = ['name']
+
+
+def create_search_indexes(apps, schema_editor):
+    install_trigram_indexes(schema_editor, 'resellers', COLUMNS)
+
+
+def drop_search_indexes(apps, schema_editor):
+    drop_trigram_indexes(schema_editor, 'resellers', COLUMNS)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run in a transaction, see core/search.py
+    atomic = False
+
+    dependencies = [
+        ('reseller', '0003_sync'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
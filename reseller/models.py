@@ -2,8 +2,9 @@ from django.db import models
 from user.models import User
 from department.models import Department
 from django.utils import timezone
+from core.counters import CounterFieldsMixin
 
-class Reseller(models.Model):
+class Reseller(CounterFieldsMixin, models.Model):
     """
     Represents a reseller/partner who can manage their own customers (departments)
     and offer services to them.
@@ -16,8 +17,18 @@ class Reseller(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Maintained by database triggers, see core/counters.py
+    customer_count = models.PositiveIntegerField(default=0, editable=False)
+    active_subscription_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    counter_fields = ('customer_count', 'active_subscription_count')
+    
     class Meta:
         db_table = 'resellers'
+        indexes = [
+            # Delta sync, see core/sync.py
+            models.Index(fields=['updated_at', 'reseller_id'], name='resellers_updated_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -0,0 +1,168 @@
+"""
+Reseller customer provisioning.
+
+Creating a customer means a department, optionally its admin user, the
+``ResellerCustomer`` link and optionally an initial subscription. Done one
+object at a time that's four autocommitted round trips per customer, and a
+failure half way leaves orphans behind. ``provision_customers`` validates a
+whole batch up front with a couple of ``IN`` lookups, hashes the admin
+passwords in parallel, and then writes everything in one transaction with
+one ``bulk_create`` per table, so the batch costs the same handful of
+statements whether it holds one customer or a thousand.
+
+Each customer is a dict:
+
+    {
+        "name": "Acme",                 # required
+        "description": "...",
+        "admin": {"email": "...", "full_name": "...", "password": "..."},
+        "service_package": 3,
+    }
+"""
+import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from core.outbox import record_events
+from core.response_cache import invalidate_on_commit
+from department.models import Department, DepartmentAdmin
+from service_package.models import ServicePackage, Subscription
+from user.hashing import hash_many
+from user.models import User
+
+from .models import ResellerCustomer
+
+BILLING_CYCLE_DAYS = {'monthly': 30, 'quarterly': 90, 'yearly': 365}
+
+
+class ProvisioningError(Exception):
+    """Raised with ``errors``, a list of ``{"index": i, "error": message}``"""
+    def __init__(self, errors):
+        super().__init__(errors[0]['error'])
+        self.errors = errors
+
+
+def subscription_end_date(service_package, start_date):
+    """End of the first billing period starting at ``start_date``"""
+    return start_date + datetime.timedelta(days=BILLING_CYCLE_DAYS.get(service_package.billing_cycle, 30))
+
+
+def _clean_admin(admin):
+    if not isinstance(admin, dict):
+        raise ValidationError("Admin must be an object")
+    email = str(admin.get('email') or '').strip()
+    full_name = str(admin.get('full_name') or '').strip()
+    if not email or not full_name or not admin.get('password'):
+        raise ValidationError("Admin email, full name and password are required")
+    validate_email(email)
+    return User.objects.normalize_email(email), full_name, admin['password']
+
+
+def _validate(customers):
+    """Check every customer, returning their cleaned fields and the packages"""
+    errors = []
+    cleaned = []
+    for index, customer in enumerate(customers):
+        try:
+            if not isinstance(customer, dict):
+                raise ValidationError("Customer must be an object")
+            if not customer.get('name'):
+                raise ValidationError("Customer name is required")
+            admin = _clean_admin(customer['admin']) if customer.get('admin') else None
+            package_id = customer.get('service_package')
+            if package_id is not None and not str(package_id).isdigit():
+                raise ValidationError("Service package must be an id")
+        except ValidationError as error:
+            errors.append({'index': index, 'error': error.messages[0]})
+            cleaned.append(None)
+            continue
+        cleaned.append((customer, admin, int(package_id) if package_id is not None else None))
+
+    # One lookup for every package and one for every admin email
+    packages = ServicePackage.objects.in_bulk({row[2] for row in cleaned if row and row[2] is not None})
+    emails = [row[1][0] for row in cleaned if row and row[1]]
+    taken = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+    seen = set()
+    for index, row in enumerate(cleaned):
+        if row is None:
+            continue
+        _, admin, package_id = row
+        if package_id is not None and package_id not in packages:
+            errors.append({'index': index, 'error': "Service package not found"})
+        elif admin and (admin[0] in taken or admin[0] in seen):
+            errors.append({'index': index, 'error': "A user with this email already exists"})
+        if admin:
+            seen.add(admin[0])
+
+    if errors:
+        raise ProvisioningError(sorted(errors, key=lambda error: error['index']))
+    return cleaned, packages
+
+
+def provision_customers(reseller, customers, user_type='reseller'):
+    """
+    Create ``customers`` under ``reseller`` in one transaction.
+
+    Returns one dict per customer with its ``customer``, ``department``,
+    ``admin`` and ``subscription`` (the latter two may be None). Raises
+    ``ProvisioningError`` without writing anything if any customer is
+    invalid.
+    """
+    cleaned, packages = _validate(customers)
+    hashes = iter(hash_many(admin[2] for _, admin, _ in cleaned if admin))
+    today = datetime.date.today()
+
+    departments = []
+    admins = []
+    for customer, admin, _ in cleaned:
+        departments.append(Department(
+            name=customer['name'],
+            description=customer.get('description'),
+            customer_type='reseller',
+        ))
+        if admin:
+            admins.append(User(email=admin[0], full_name=admin[1], password=next(hashes), user_type=user_type))
+
+    with transaction.atomic():
+        Department.objects.bulk_create(departments)
+        User.objects.bulk_create(admins)
+
+        results = []
+        admin_iter = iter(admins)
+        for department, (_, admin, package_id) in zip(departments, cleaned):
+            package = packages.get(package_id)
+            results.append({
+                'department': department,
+                'admin': next(admin_iter) if admin else None,
+                'customer': ResellerCustomer(reseller=reseller, department=department, is_active=True),
+                'subscription': Subscription(
+                    department=department,
+                    service_package=package,
+                    start_date=today,
+                    end_date=subscription_end_date(package, today),
+                    status='active',
+                    subscription_source='reseller',
+                    reseller=reseller,
+                ) if package else None,
+            })
+
+        department_admins = DepartmentAdmin.objects.bulk_create(
+            DepartmentAdmin(user=result['admin'], department=result['department'])
+            for result in results if result['admin']
+        )
+        ResellerCustomer.objects.bulk_create(result['customer'] for result in results)
+        subscriptions = Subscription.objects.bulk_create(
+            result['subscription'] for result in results if result['subscription']
+        )
+        # Outbox events, see core/outbox.py
+        record_events(department_admins, 'created')
+        record_events(subscriptions, 'created')
+
+        # bulk_create sends no post_save, see core/dependencies.py
+        invalidate_on_commit([
+            ('reseller', reseller.pk), ('reseller_customers', reseller.pk),
+            ('dashboard', 'root'), ('dashboard', f'reseller:{reseller.pk}'),
+        ])
+    return results
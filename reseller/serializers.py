@@ -2,12 +2,14 @@ from rest_framework import serializers
 from .models import Reseller, ResellerAdmin, ResellerCustomer
 from user.serializers import UserSerializer
 from department.serializers import DepartmentSerializer
+from myproject.expansion import ExpandableFieldsMixin
 
 class ResellerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Reseller
-        fields = ['reseller_id', 'name', 'description', 'is_active', 'commission_rate', 'created_at', 'updated_at']
-        read_only_fields = ['reseller_id', 'created_at', 'updated_at']
+        fields = ['reseller_id', 'name', 'description', 'is_active', 'commission_rate', 'created_at', 'updated_at',
+                  'customer_count', 'active_subscription_count']
+        read_only_fields = ['reseller_id', 'created_at', 'updated_at', 'customer_count', 'active_subscription_count']
 
 class ResellerDetailSerializer(serializers.ModelSerializer):
     admins = serializers.SerializerMethodField()
@@ -27,19 +29,23 @@ class ResellerDetailSerializer(serializers.ModelSerializer):
         reseller_customers = ResellerCustomer.objects.filter(reseller=obj).select_related('department')
         return DepartmentSerializer([customer.department for customer in reseller_customers], many=True).data
 
-class ResellerAdminSerializer(serializers.ModelSerializer):
+class ResellerAdminSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     user_details = UserSerializer(source='user', read_only=True)
     reseller_details = ResellerSerializer(source='reseller', read_only=True)
     
+    expandable_fields = {'user': 'user_details', 'reseller': 'reseller_details'}
+    
     class Meta:
         model = ResellerAdmin
         fields = ['id', 'user', 'reseller', 'assigned_at', 'user_details', 'reseller_details']
         read_only_fields = ['id', 'assigned_at', 'user_details', 'reseller_details']
 
-class ResellerCustomerSerializer(serializers.ModelSerializer):
+class ResellerCustomerSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     department_details = DepartmentSerializer(source='department', read_only=True)
     reseller_details = ResellerSerializer(source='reseller', read_only=True)
     
+    expandable_fields = {'department': 'department_details', 'reseller': 'reseller_details'}
+    
     class Meta:
         model = ResellerCustomer
         fields = ['id', 'reseller', 'department', 'is_active', 'created_at',
@@ -1,3 +1,149 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from department.models import Department, DepartmentAdmin
+from service_package.models import ServicePackage, Subscription
+from user.models import User
+
+from . import provisioning
+from .models import Reseller, ResellerAdmin, ResellerCustomer
+from .provisioning import ProvisioningError, provision_customers
+
+
+def email_taken_after_validation(email):
+    """Patch provisioning so ``email`` is registered right after the batch was validated"""
+    validate = provisioning._validate
+
+    def racing(customers):
+        result = validate(customers)
+        User.objects.create_user(email, 'Concurrent', 'unused')
+        return result
+    return mock.patch.object(provisioning, '_validate', racing)
+
+
+class ResellerCustomerCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reseller = Reseller.objects.create(name='Reseller')
+        cls.admin = User.objects.create_user('admin@example.com', 'Admin', 'unused', is_reseller_admin=True)
+        ResellerAdmin.objects.create(user=cls.admin, reseller=cls.reseller)
+        ResellerCustomer.objects.create(reseller=cls.reseller, department=Department.objects.create(name='First'))
+        cls.url = f'/api/resellers/resellers/{cls.reseller.pk}/customers/'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def get(self):
+        return self.client.get(self.url)
+
+    def test_second_read_is_cached(self):
+        self.assertEqual(self.get()['X-Cache'], 'MISS')
+        response = self.get()
+        self.assertEqual((response.status_code, response['X-Cache']), (200, 'HIT'))
+
+    def test_removed_admin_is_denied(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            ResellerAdmin.objects.filter(user=self.admin).delete()
+        self.assertEqual(self.get().status_code, 403)
+
+    def test_access_is_checked_before_the_cache(self):
+        self.get()
+        # Gone without its invalidation running, the cached page is still there
+        ResellerAdmin.objects.filter(user=self.admin).delete()
+        self.assertEqual(self.get().status_code, 403)
+
+    def test_new_customer_invalidates(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            ResellerCustomer.objects.create(reseller=self.reseller, department=Department.objects.create(name='Second'))
+        response = self.get()
+        self.assertEqual((response['X-Cache'], len(response.data)), ('MISS', 2))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ProvisioningTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reseller = Reseller.objects.create(name='Reseller')
+        cls.package = ServicePackage.objects.create(name='Package', description='Text', price='9.90')
+        cls.admin = User.objects.create_user('admin@example.com', 'Admin', 'unused', is_reseller_admin=True)
+        ResellerAdmin.objects.create(user=cls.admin, reseller=cls.reseller)
+
+    def customers(self, count):
+        return [
+            {'name': f'Customer {i}', 'service_package': self.package.pk,
+             'admin': {'email': f'customer{i}@example.com', 'full_name': f'Customer {i}', 'password': 'secret'}}
+            for i in range(count)
+        ]
+
+    def assertNothingWritten(self):
+        self.assertFalse(Department.objects.exists())
+        self.assertFalse(ResellerCustomer.objects.exists())
+        self.assertFalse(DepartmentAdmin.objects.exists())
+        self.assertFalse(Subscription.objects.exists())
+        self.assertFalse(User.objects.filter(email__startswith='customer').exists())
+
+    def test_batch(self):
+        results = provision_customers(self.reseller, self.customers(3))
+        self.assertEqual([result['department'].name for result in results], ['Customer 0', 'Customer 1', 'Customer 2'])
+        self.assertEqual(ResellerCustomer.objects.filter(reseller=self.reseller).count(), 3)
+        self.assertEqual(DepartmentAdmin.objects.count(), 3)
+        self.assertEqual(Subscription.objects.filter(reseller=self.reseller, status='active').count(), 3)
+        self.assertTrue(User.objects.get(email='customer1@example.com').check_password('secret'))
+
+    def test_invalid_customer_fails_the_batch(self):
+        customers = self.customers(3)
+        customers[1]['service_package'] = 0
+        customers[2]['admin']['email'] = 'customer0@example.com'
+        with self.assertRaises(ProvisioningError) as context:
+            provision_customers(self.reseller, customers)
+        self.assertEqual(context.exception.errors, [
+            {'index': 1, 'error': "Service package not found"},
+            {'index': 2, 'error': "A user with this email already exists"},
+        ])
+        self.assertNothingWritten()
+
+    def test_failure_while_writing_rolls_back_the_batch(self):
+        with mock.patch.object(Subscription.objects, 'bulk_create', side_effect=RuntimeError("Lost connection")), \
+                self.assertRaises(RuntimeError):
+            provision_customers(self.reseller, self.customers(3))
+        self.assertNothingWritten()
+
+    def test_email_taken_concurrently_rolls_back_the_batch(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with email_taken_after_validation('customer1@example.com'):
+            response = client.post(f'/api/resellers/resellers/{self.reseller.pk}/customers/',
+                                   self.customers(3), format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(User.objects.filter(email__startswith='customer').count(), 1)
+        self.assertFalse(Department.objects.exists())
+
+    def test_register_duplicate_email(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        payload = {'email': 'customer@example.com', 'full_name': 'Customer', 'password': 'secret',
+                   'reseller_id': self.reseller.pk}
+        with email_taken_after_validation('customer@example.com'):
+            response = client.post('/api/users/auth/register/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': "A user with this email already exists"})
+        self.assertFalse(Department.objects.exists())
+
+    def test_register_under_reseller(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        payload = {'email': 'customer@example.com', 'full_name': 'Customer', 'password': 'secret',
+                   'reseller_id': self.reseller.pk, 'department_name': 'Acme'}
+        response = client.post('/api/users/auth/register/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['department']['name'], 'Acme')
+        customer = ResellerCustomer.objects.get(reseller=self.reseller)
+        self.assertTrue(DepartmentAdmin.objects.filter(department=customer.department,
+                                                       user__email='customer@example.com').exists())
@@ -1,24 +1,58 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.utils.translation import ngettext
 from .models import ServicePackage, Subscription, ServiceAccess, Transaction
+from .bulk import grant_department_members, set_subscription_status
+from core.admin_tools import ScalableModelAdmin
 
 @admin.register(ServicePackage)
-class ServicePackageAdmin(admin.ModelAdmin):
+class ServicePackageAdmin(ScalableModelAdmin):
     list_display = ('id', 'name', 'price', 'billing_cycle')
     search_fields = ('name',)
     
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(ScalableModelAdmin):
     list_display = ('id', 'department', 'service_package', 'status', 'start_date', 'end_date')
     search_fields = ('department__name', 'service_package__name')
     list_filter = ('status', 'service_package')
+    actions = ('expire_selected', 'cancel_selected', 'grant_selected')
+    
+    def _set_status(self, request, queryset, status):
+        changed = set_subscription_status(queryset, status)
+        self.message_user(request, ngettext(
+            '%(count)d subscription marked %(status)s.',
+            '%(count)d subscriptions marked %(status)s.',
+            changed,
+        ) % {'count': changed, 'status': status}, messages.SUCCESS)
+    
+    @admin.action(description='Mark selected subscriptions expired', permissions=['change'])
+    def expire_selected(self, request, queryset):
+        self._set_status(request, queryset, 'expired')
+    
+    @admin.action(description='Cancel selected subscriptions', permissions=['change'])
+    def cancel_selected(self, request, queryset):
+        self._set_status(request, queryset, 'cancelled')
+    
+    @admin.action(description="Grant the departments' members access to selected subscriptions",
+                  permissions=['change'])
+    def grant_selected(self, request, queryset):
+        granted = grant_department_members(queryset)
+        self.message_user(request, ngettext(
+            '%(count)d access grant created.',
+            '%(count)d access grants created.',
+            granted,
+        ) % {'count': granted}, messages.SUCCESS)
     
 @admin.register(ServiceAccess)
-class ServiceAccessAdmin(admin.ModelAdmin):
+class ServiceAccessAdmin(ScalableModelAdmin):
     list_display = ('id', 'user', 'subscription', 'granted_at')
     search_fields = ('user__email', 'subscription__service_package__name')
+    # Rows render their __str__, which reads the package, and Subscription's
+    # reads its department and package
+    list_select_related = ('user', 'service_package', 'subscription__department', 'subscription__service_package')
     
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(ScalableModelAdmin):
     list_display = ('id', 'subscription', 'amount', 'status', 'payment_date')
     search_fields = ('subscription__department__name', 'subscription__service_package__name')
     list_filter = ('status',)
+    list_select_related = ('subscription__department', 'subscription__service_package')
@@ -14,5 +14,6 @@ urlpatterns = [
     
     # Custom API endpoints
     path('subscribe/', api_views.SubscribeAPIView.as_view(), name='subscribe_api'),
+    path('entitlements/<int:package_id>/', api_views.EntitlementAPIView.as_view(), name='entitlement_api'),
     path('subscription-users/<int:subscription_id>/', api_views.ServiceAccessAPIView.as_view(), name='subscription_users_api'),
 ]
@@ -1,17 +1,29 @@
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
 from rest_framework.response import Response
 from rest_framework import status, viewsets
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.http import http_date
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
 from .models import ServicePackage, Subscription, ServiceAccess, Transaction
 from .serializers import ServicePackageSerializer, SubscriptionSerializer, ServiceAccessSerializer, TransactionSerializer
 from department.models import Department
 from user.models import User
+from myproject.expansion import ExpandableQuerysetMixin
+from myproject.readers import ValuesListMixin, get_values_reader
+from myproject.exports import ExportMixin
+from myproject.lookup import BulkLookupMixin
+from core.db_router import ReplicaReadMixin
+from core.sync import DeltaSyncMixin
+from .catalog import get_catalog
 from datetime import datetime, timedelta
 
 # Service Package ViewSet
-class ServicePackageViewSet(viewsets.ModelViewSet):
+class ServicePackageViewSet(ReplicaReadMixin, DeltaSyncMixin, viewsets.ModelViewSet):
     """
     API endpoint for service packages
     """
@@ -19,50 +31,131 @@ class ServicePackageViewSet(viewsets.ModelViewSet):
     serializer_class = ServicePackageSerializer
     permission_classes = [IsAuthenticated]
     
+    def get_authenticators(self):
+        # Catalog reads only need a valid token, so skip loading the user row
+        request = getattr(self, 'request', None)
+        if request is not None and request.method in SAFE_METHODS:
+            return [JWTStatelessUserAuthentication()]
+        return super().get_authenticators()
+    
+    def active_only(self):
+        return self.request.query_params.get('active_only', 'true').lower() == 'true'
+    
     def get_queryset(self):
         """Return only active packages by default"""
         queryset = ServicePackage.objects.all()
-        active_only = self.request.query_params.get('active_only', 'true').lower() == 'true'
         
-        if active_only:
+        if self.active_only():
             queryset = queryset.filter(is_active=True)
             
         return queryset
+    
+    def get_changes_queryset(self):
+        # Deactivated packages are reported too, clients see is_active change
+        return ServicePackage.objects.all()
+    
+    def scope_tombstones(self, tombstones):
+        # The catalog is the same for everyone
+        return tombstones
+    
+    def list(self, request, *args, **kwargs):
+        """Serve the catalog from cache and answer conditional requests with 304"""
+        catalog = get_catalog(self.active_only())
+        
+        not_modified = get_conditional_response(
+            request, etag=catalog['etag'], last_modified=catalog['last_modified']
+        )
+        if not_modified is not None:
+            return not_modified
+        
+        response = Response(catalog['data'])
+        response['ETag'] = catalog['etag']
+        if catalog['last_modified'] is not None:
+            response['Last-Modified'] = http_date(catalog['last_modified'])
+        return response
+
+def get_visible_subscriptions(user, reseller_admin=None):
+    """
+    Subscriptions ``user`` may see. ``reseller_admin`` is the user's first
+    ResellerAdmin row, looked up by the caller so async views can fetch it
+    with the async ORM.
+    """
+    # Root admins can see all subscriptions
+    if user.is_root_admin:
+        return Subscription.objects.all()
+    
+    subscriptions = Subscription.objects.filter(department__in=get_subscription_departments(user, reseller_admin))
+    if user.is_reseller_admin and reseller_admin is not None:
+        return subscriptions.order_by('-created_at')
+    return subscriptions
+
+def get_subscription_departments(user, reseller_admin=None):
+    """
+    IDs of the departments whose subscriptions ``user`` may see, for callers
+    other than root admins (who see them all)
+    """
+    # Reseller admins can see subscriptions for their customers
+    if user.is_reseller_admin and reseller_admin is not None:
+        from reseller.models import ResellerCustomer
+        return ResellerCustomer.objects.filter(reseller=reseller_admin.reseller_id).values_list('department', flat=True)
+    
+    # Department admins can see their department's subscriptions
+    return Department.objects.filter(admins__user=user).values_list('pk', flat=True)
+
+def get_visible_transactions(user):
+    """Transactions ``user`` may see"""
+    # Root admins can see all transactions
+    if user.is_root_admin:
+        return Transaction.objects.all()
+        
+    # Department admins can see their department's transactions
+    admin_departments = Department.objects.filter(admins__user=user)
+    return Transaction.objects.filter(subscription__department__in=admin_departments)
+
+def get_entitlement_grant(user_id, package_id):
+    """
+    Values queryset for the caller's best grant on ``package_id``: an access
+    grant on an active, unexpired subscription of an active user (the token
+    alone doesn't prove the account still exists)
+    """
+    return ServiceAccess.objects.filter(
+        user_id=user_id,
+        user__is_active=True,
+        service_package_id=package_id,
+        subscription__status='active',
+        subscription__end_date__gte=timezone.localdate(),
+    ).order_by('-subscription__end_date').values('subscription_id', 'subscription__end_date')
+
+def entitlement_data(package_id, grant):
+    return {
+        'service_package': package_id,
+        'has_access': grant is not None,
+        'subscription': grant['subscription_id'] if grant else None,
+        'expires_on': grant['subscription__end_date'] if grant else None,
+    }
 
 # Subscription ViewSet
-class SubscriptionViewSet(viewsets.ModelViewSet):
+class SubscriptionViewSet(ReplicaReadMixin, DeltaSyncMixin, ExportMixin, BulkLookupMixin, ValuesListMixin, ExpandableQuerysetMixin, viewsets.ModelViewSet):
     """
     API endpoint for subscriptions
     """
     queryset = Subscription.objects.all()
     serializer_class = SubscriptionSerializer
     permission_classes = [IsAuthenticated]
+    export_filename = 'subscriptions'
+    
+    @cached_property
+    def reseller_admin(self):
+        """The caller's first ResellerAdmin row, if they're a reseller admin"""
+        user = self.request.user
+        if user.is_root_admin or not user.is_reseller_admin:
+            return None
+        from reseller.models import ResellerAdmin
+        return ResellerAdmin.objects.filter(user=user).first()
     
     def get_queryset(self):
         """Filter subscriptions based on user permissions"""
-        user = self.request.user
-        
-        # Root admins can see all subscriptions
-        if user.is_root_admin:
-            return Subscription.objects.all()
-        
-        # Reseller admins can see subscriptions for their customers
-        if user.is_reseller_admin:
-            from reseller.models import ResellerAdmin, ResellerCustomer
-            reseller_admin = ResellerAdmin.objects.filter(user=user).first()
-            if reseller_admin:
-                # Get all departments under this reseller
-                departments = ResellerCustomer.objects.filter(
-                    reseller=reseller_admin.reseller
-                ).values_list('department', flat=True)
-                # Return subscriptions for those departments
-                return Subscription.objects.filter(
-                    department__in=departments
-                ).order_by('-created_at')
-            
-        # Department admins can see their department's subscriptions
-        admin_departments = Department.objects.filter(admins__user=user)
-        return Subscription.objects.filter(department__in=admin_departments)
+        return get_visible_subscriptions(self.request.user, self.reseller_admin)
     
     def create(self, request):
         """Create a new subscription"""
@@ -116,7 +209,7 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
             status='active'
         )
         
-        serializer = SubscriptionSerializer(subscription)
+        serializer = SubscriptionSerializer(subscription, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 # Subscribe API View
@@ -179,9 +272,21 @@ class SubscribeAPIView(APIView):
         )
         
         # Return the subscription details
-        serializer = SubscriptionSerializer(subscription)
+        serializer = SubscriptionSerializer(subscription, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+# Entitlement API View
+class EntitlementAPIView(APIView):
+    """
+    API endpoint checking whether the caller may use a service package
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [JWTStatelessUserAuthentication]
+    
+    def get(self, request, package_id):
+        grant = get_entitlement_grant(request.user.id, package_id).first()
+        return Response(entitlement_data(package_id, grant))
+
 # Service Access API View
 class ServiceAccessAPIView(APIView):
     """
@@ -201,7 +306,12 @@ class ServiceAccessAPIView(APIView):
             
         # Get all service access records for this subscription
         access_records = ServiceAccess.objects.filter(subscription=subscription)
-        serializer = ServiceAccessSerializer(access_records, many=True)
+        reader = get_values_reader(ServiceAccessSerializer, request)
+        if reader is not None:
+            return Response(reader.read(access_records))
+        
+        access_records = ServiceAccessSerializer.setup_eager_loading(access_records, request)
+        serializer = ServiceAccessSerializer(access_records, many=True, context={'request': request})
         return Response(serializer.data)
     
     def post(self, request, subscription_id):
@@ -239,7 +349,7 @@ class ServiceAccessAPIView(APIView):
             service_package=subscription.service_package
         )
         
-        serializer = ServiceAccessSerializer(service_access)
+        serializer = ServiceAccessSerializer(service_access, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
     def delete(self, request, subscription_id):
@@ -269,22 +379,15 @@ class ServiceAccessAPIView(APIView):
             return Response({"error": "User does not have access to this service"}, status=status.HTTP_404_NOT_FOUND)
 
 # Transaction ViewSet
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(ReplicaReadMixin, ExportMixin, ValuesListMixin, ExpandableQuerysetMixin, viewsets.ModelViewSet):
     """
     API endpoint for transactions
     """
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
+    export_filename = 'transactions'
     
     def get_queryset(self):
         """Filter transactions based on user permissions"""
-        user = self.request.user
-        
-        # Root admins can see all transactions
-        if user.is_root_admin:
-            return Transaction.objects.all()
-            
-        # Department admins can see their department's transactions
-        admin_departments = Department.objects.filter(admins__user=user)
-        return Transaction.objects.filter(subscription__department__in=admin_departments)
\ No newline at end of file
+        return get_visible_transactions(self.request.user)
\ No newline at end of file
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ServicePackageConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "service_package"
+    
+    def ready(self):
+        """Import signals when the app is ready"""
+        import service_package.signals  # Import signals
@@ -0,0 +1,53 @@
+from asgiref.sync import sync_to_async
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from myproject.async_api import api_response, async_api_view
+from myproject.readers import get_values_reader
+from reseller.models import ResellerAdmin
+from .api_views import entitlement_data, get_entitlement_grant, get_visible_subscriptions
+from .catalog import get_catalog
+from .serializers import SubscriptionSerializer
+
+@async_api_view(stateless=True)
+async def package_catalog(request):
+    """Async variant of the package list, served from the catalog cache"""
+    active_only = request.GET.get('active_only', 'true').lower() == 'true'
+    catalog = await sync_to_async(get_catalog)(active_only)
+    
+    not_modified = get_conditional_response(
+        request, etag=catalog['etag'], last_modified=catalog['last_modified']
+    )
+    if not_modified is not None:
+        return not_modified
+    
+    response = api_response(catalog['data'])
+    response['ETag'] = catalog['etag']
+    if catalog['last_modified'] is not None:
+        response['Last-Modified'] = http_date(catalog['last_modified'])
+    return response
+
+@async_api_view(stateless=True)
+async def entitlement(request, package_id):
+    """Check whether the caller may use a service package right now"""
+    grant = await get_entitlement_grant(request.user.id, package_id).afirst()
+    return api_response(entitlement_data(package_id, grant))
+
+@async_api_view()
+async def subscription_list(request):
+    """Async variant of the subscription list"""
+    user = request.user
+    reseller_admin = None
+    if not user.is_root_admin and user.is_reseller_admin:
+        reseller_admin = await ResellerAdmin.objects.filter(user=user).afirst()
+    subscriptions = get_visible_subscriptions(user, reseller_admin)
+    
+    reader = get_values_reader(SubscriptionSerializer, request)
+    if reader is None:
+        subscriptions = SubscriptionSerializer.setup_eager_loading(subscriptions, request)
+        serialize = lambda: SubscriptionSerializer(subscriptions, many=True, context={'request': request}).data
+        return api_response(await sync_to_async(serialize)())
+    
+    rows = [row async for row in reader.values(subscriptions)]
+    if reader.needs_queries:
+        return api_response(await sync_to_async(reader.build)(rows))
+    return api_response(reader.build(rows))
@@ -0,0 +1,103 @@
+"""
+Bulk changes to subscriptions, for admin actions over thousands of rows.
+
+Each batch of ``batch_size`` subscriptions costs a handful of queries,
+whatever its size, and commits on its own:
+
+- ``set_subscription_status``: one locking read, one ``UPDATE``, one
+  ``bulk_create`` of outbox events and one lookup of the resellers whose
+  cached responses show the rows
+- ``grant_department_members``: one read each of the subscriptions, their
+  departments' members and the existing grants, one
+  ``bulk_create(ignore_conflicts=True)`` of the new grants, one lookup of
+  their ids and one ``bulk_create`` of their outbox events
+
+``update`` and ``bulk_create`` send no signals, so both write the outbox
+events themselves (core/outbox.py) and invalidate the cached responses
+once the batch commits (core/dependencies.py). Counters follow through
+their triggers (core/counters.py).
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from core.dependencies import subscriptions_changed
+from core.outbox import record_events
+from core.response_cache import invalidate_on_commit
+from department.models import DepartmentUser
+
+from .models import ServiceAccess, Subscription
+
+
+def _batches(queryset, batch_size):
+    """Primary keys of ``queryset`` in ascending batches"""
+    last = 0
+    while True:
+        pks = list(queryset.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return
+        yield pks
+        last = pks[-1]
+
+
+def set_subscription_status(queryset, status, batch_size=500):
+    """Set ``status`` on the subscriptions in ``queryset``, returns how many changed"""
+    changed = 0
+    for pks in _batches(queryset, batch_size):
+        with transaction.atomic():
+            subscriptions = list(
+                Subscription.objects.select_for_update().filter(pk__in=pks).exclude(status=status)
+            )
+            if not subscriptions:
+                continue
+            now = timezone.now()
+            Subscription.objects.filter(pk__in=[subscription.pk for subscription in subscriptions]).update(
+                status=status, updated_at=now,
+            )
+            for subscription in subscriptions:
+                subscription.status = status
+                subscription.updated_at = now
+            record_events(subscriptions, 'updated')
+            invalidate_on_commit(subscriptions_changed(subscriptions))
+        changed += len(subscriptions)
+    return changed
+
+
+def grant_department_members(queryset, batch_size=500):
+    """
+    Give every member of each subscription's department access to it,
+    returns how many grants were created
+    """
+    granted = 0
+    for pks in _batches(queryset, batch_size):
+        with transaction.atomic():
+            subscriptions = list(Subscription.objects.filter(pk__in=pks).values_list(
+                'pk', 'department_id', 'service_package_id'))
+            members = {}
+            for department_id, user_id in DepartmentUser.objects.filter(
+                    department_id__in={department_id for _, department_id, _ in subscriptions},
+            ).values_list('department_id', 'user_id'):
+                members.setdefault(department_id, []).append(user_id)
+            existing = set(ServiceAccess.objects.filter(subscription_id__in=pks).values_list(
+                'subscription_id', 'user_id'))
+            grants = [
+                ServiceAccess(subscription_id=pk, user_id=user_id, service_package_id=package_id)
+                for pk, department_id, package_id in subscriptions
+                for user_id in members.get(department_id, ())
+                if (pk, user_id) not in existing
+            ]
+            if not grants:
+                continue
+            ServiceAccess.objects.bulk_create(grants, ignore_conflicts=True)
+            # ignore_conflicts leaves the primary keys unset, read the rows back
+            # for their outbox events (see core/outbox.py)
+            wanted = {(grant.subscription_id, grant.user_id) for grant in grants}
+            created = [
+                access for access in ServiceAccess.objects.filter(
+                    subscription_id__in={subscription_id for subscription_id, _ in wanted},
+                    user_id__in={user_id for _, user_id in wanted},
+                )
+                if (access.subscription_id, access.user_id) in wanted
+            ]
+            record_events(created, 'created')
+        granted += len(created)
+    return granted
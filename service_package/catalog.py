@@ -0,0 +1,78 @@
+"""
+Cached service package catalog.
+
+The serialized package list is cached under a version number which is
+bumped once a change to a ``ServicePackage`` commits (see signals.py).
+Entries carry an ETag and Last-Modified derived from the packages'
+``updated_at``, so conditional requests are answered from the cache alone.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+
+from core import singleflight
+from core.bus import publish_cache_delete
+from core.db_router import use_primary
+
+CATALOG_VERSION_KEY = 'service_package:catalog:version'
+CATALOG_TIMEOUT = 60 * 60
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Start from the clock so a version key evicted from the cache never
+        # comes back with a number older entries were stored under
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+    # Other workers drop their copy of the version key
+    publish_cache_delete([CATALOG_VERSION_KEY])
+
+
+def build_catalog_entry(active_only):
+    """Serialize the package list and compute its validators"""
+    from .models import ServicePackage
+    from .serializers import ServicePackageSerializer
+
+    packages = ServicePackage.objects.all()
+    if active_only:
+        packages = packages.filter(is_active=True)
+    packages = list(packages)
+
+    last_modified = max((package.updated_at for package in packages), default=None)
+    fingerprint = '{}:{}:{}'.format(
+        int(active_only),
+        last_modified.isoformat() if last_modified else '',
+        ','.join(str(package.pk) for package in packages),
+    )
+    return {
+        'data': ServicePackageSerializer(packages, many=True).data,
+        'etag': '"{}"'.format(hashlib.sha1(fingerprint.encode()).hexdigest()),
+        # Whole seconds, as HTTP dates carry them; a fractional value never
+        # compares equal to If-Modified-Since
+        'last_modified': int(last_modified.timestamp()) if last_modified else None,
+    }
+
+
+def get_catalog(active_only=True):
+    """Return the cached catalog entry, building it on a miss"""
+    key = 'service_package:catalog:{}:{}'.format(get_catalog_version(), int(active_only))
+    entry = cache.get(key)
+    if entry is None:
+        # Concurrent misses wait for a single rebuild
+        def build():
+            with use_primary():
+                entry = build_catalog_entry(active_only)
+            cache.set(key, entry, CATALOG_TIMEOUT)
+            return entry
+        entry = singleflight.do(key, build, recheck=lambda: cache.get(key))
+    return entry
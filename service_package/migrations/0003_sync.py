@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 23:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('department', '0004_sync'),
+        ('reseller', '0003_sync'),
+        ('service_package', '0002_subscription_reseller_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='servicepackage',
+            index=models.Index(fields=['updated_at', 'id'], name='service_packages_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['updated_at', 'id'], name='subscriptions_updated_idx'),
+        ),
+    ]
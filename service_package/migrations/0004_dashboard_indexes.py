@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 23:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('department', '0004_sync'),
+        ('reseller', '0003_sync'),
+        ('service_package', '0003_sync'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['end_date', 'id'], name='subscriptions_active_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['payment_date', 'id'], name='transactions_payment_date_idx'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from user.models import User
 from department.models import Department
+from core.outbox import OutboxMixin
 
 class ServicePackage(models.Model):
     """
@@ -24,12 +25,16 @@ class ServicePackage(models.Model):
     
     class Meta:
         db_table = 'service_packages'
+        indexes = [
+            # Delta sync, see core/sync.py
+            models.Index(fields=['updated_at', 'id'], name='service_packages_updated_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - ${self.price}/{self.billing_cycle}"
 
 
-class Subscription(models.Model):
+class Subscription(OutboxMixin, models.Model):
     """
     Represents a department's subscription to a service package.
     """
@@ -59,12 +64,19 @@ class Subscription(models.Model):
     
     class Meta:
         db_table = 'subscriptions'
+        indexes = [
+            # Delta sync, see core/sync.py
+            models.Index(fields=['updated_at', 'id'], name='subscriptions_updated_idx'),
+            # Active subscriptions ending soonest, for the dashboard
+            models.Index(fields=['end_date', 'id'], condition=models.Q(status='active'),
+                         name='subscriptions_active_end_idx'),
+        ]
     
     def __str__(self):
         return f"{self.department.name} - {self.service_package.name} ({self.status})"
 
 
-class ServiceAccess(models.Model):
+class ServiceAccess(OutboxMixin, models.Model):
     """
     Links individual users with specific service packages they can access.
     """
@@ -82,7 +94,7 @@ class ServiceAccess(models.Model):
         return f"{self.user.full_name} - {self.service_package.name}"
 
 
-class Transaction(models.Model):
+class Transaction(OutboxMixin, models.Model):
     """
     Records payment transactions for service package subscriptions.
     """
@@ -104,6 +116,10 @@ class Transaction(models.Model):
     
     class Meta:
         db_table = 'transactions'
+        indexes = [
+            # Most recent transactions, for the dashboard
+            models.Index(fields=['payment_date', 'id'], name='transactions_payment_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.transaction_id} - ${self.amount} ({self.status})"
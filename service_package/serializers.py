@@ -2,6 +2,8 @@ from rest_framework import serializers
 from .models import ServicePackage, Subscription, ServiceAccess, Transaction
 from department.serializers import DepartmentSerializer
 from user.serializers import UserSerializer
+from reseller.serializers import ResellerSerializer
+from myproject.expansion import ExpandableFieldsMixin
 
 class ServicePackageSerializer(serializers.ModelSerializer):
     class Meta:
@@ -9,10 +11,16 @@ class ServicePackageSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'price', 'billing_cycle', 'features', 'is_active', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class SubscriptionSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     department_details = DepartmentSerializer(source='department', read_only=True)
     service_package_details = ServicePackageSerializer(source='service_package', read_only=True)
-    reseller_details = serializers.SerializerMethodField(read_only=True)
+    reseller_details = ResellerSerializer(source='reseller', read_only=True)
+    
+    expandable_fields = {
+        'department': 'department_details',
+        'service_package': 'service_package_details',
+        'reseller': 'reseller_details',
+    }
     
     class Meta:
         model = Subscription
@@ -21,27 +29,29 @@ class SubscriptionSerializer(serializers.ModelSerializer):
                  'department_details', 'service_package_details', 'reseller_details']
         read_only_fields = ['id', 'created_at', 'updated_at', 'department_details', 
                            'service_package_details', 'reseller_details']
-    
-    def get_reseller_details(self, obj):
-        if obj.reseller:
-            from reseller.serializers import ResellerSerializer
-            return ResellerSerializer(obj.reseller).data
-        return None
 
-class ServiceAccessSerializer(serializers.ModelSerializer):
+class ServiceAccessSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     user_details = UserSerializer(source='user', read_only=True)
     subscription_details = SubscriptionSerializer(source='subscription', read_only=True)
     service_package_details = ServicePackageSerializer(source='service_package', read_only=True)
     
+    expandable_fields = {
+        'user': 'user_details',
+        'subscription': 'subscription_details',
+        'service_package': 'service_package_details',
+    }
+    
     class Meta:
         model = ServiceAccess
         fields = ['id', 'user', 'subscription', 'service_package', 'granted_at', 
                  'user_details', 'subscription_details', 'service_package_details']
         read_only_fields = ['id', 'granted_at', 'user_details', 'subscription_details', 'service_package_details']
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     subscription_details = SubscriptionSerializer(source='subscription', read_only=True)
     
+    expandable_fields = {'subscription': 'subscription_details'}
+    
     class Meta:
         model = Transaction
         fields = ['id', 'subscription', 'amount', 'status', 'payment_date', 
@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import ServicePackage
+from .catalog import bump_catalog_version
+
+@receiver(post_save, sender=ServicePackage)
+@receiver(post_delete, sender=ServicePackage)
+def service_package_changed(sender, using=None, **kwargs):
+    """Invalidate the cached catalog whenever a package changes"""
+    # After commit, or a concurrent miss could cache the old rows under the
+    # new version
+    transaction.on_commit(bump_catalog_version, using=using)
@@ -0,0 +1,27 @@
+from django.db import transaction
+from django.utils import timezone
+
+from core.jobs import task
+
+from .models import Subscription
+
+
+@task(name='service_package.expire_subscriptions')
+def expire_subscriptions(batch_size=500):
+    """
+    Mark active subscriptions past their end date as expired. Rows are saved
+    one by one so each change gets its outbox event and cache invalidation.
+    """
+    today = timezone.localdate()
+    while True:
+        with transaction.atomic():
+            batch = list(
+                Subscription.objects.select_for_update(skip_locked=True)
+                .filter(status='active', end_date__lt=today)
+                .order_by('id')[:batch_size]
+            )
+            for subscription in batch:
+                subscription.status = 'expired'
+                subscription.save(update_fields=['status', 'updated_at'])
+        if len(batch) < batch_size:
+            return
@@ -3,7 +3,9 @@ from django.contrib import admin
 # Register your models here.
 from django.contrib import admin
 from .models import User
+from core.admin_tools import ScalableModelAdmin
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
-    list_display = ('user_id', 'email', 'is_root_admin', 'mfa_enabled', 'created_at')
\ No newline at end of file
+class UserAdmin(ScalableModelAdmin):
+    list_display = ('user_id', 'email', 'is_root_admin', 'mfa_enabled', 'created_at')
+    search_fields = ('email', 'full_name')
@@ -4,10 +4,15 @@ from rest_framework.response import Response
 from rest_framework import status, viewsets
 from rest_framework.views import APIView
 from django.contrib.auth import authenticate
+from django.db import IntegrityError
 from django.shortcuts import get_object_or_404
 from .models import User
 from .serializers import UserSerializer, UserCreateSerializer, LoginSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
+from myproject.exports import ExportMixin
+from myproject.lookup import BulkLookupMixin
+from core.db_router import ReplicaReadMixin
+from core.search import SearchMixin
 
 def get_tokens_for_user(user):
     """
@@ -37,13 +42,15 @@ def get_tokens_for_user(user):
         'access': str(refresh.access_token),
     }
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ReplicaReadMixin, ExportMixin, BulkLookupMixin, SearchMixin, viewsets.ModelViewSet):
     """
     API endpoint for users
     """
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    export_filename = 'users'
+    trigram_search_fields = ('email', 'full_name')
     
     def get_queryset(self):
         """Filter users based on user permissions"""
@@ -104,7 +111,7 @@ class LoginAPIView(APIView):
             email = serializer.validated_data['email']
             password = serializer.validated_data['password']
             
-            user = authenticate(email=email, password=password)
+            user = authenticate(request, email=email, password=password)
             
             if user:
                 tokens = get_tokens_for_user(user)
@@ -155,7 +162,7 @@ class RegisterAPIView(APIView):
                               status=status.HTTP_401_UNAUTHORIZED)
             
             # Verify the reseller exists
-            from reseller.models import Reseller, ResellerAdmin, ResellerCustomer
+            from reseller.models import Reseller, ResellerAdmin
             try:
                 reseller = Reseller.objects.get(reseller_id=reseller_id)
             except Reseller.DoesNotExist:
@@ -170,9 +177,26 @@ class RegisterAPIView(APIView):
         # Register the user
         serializer = UserCreateSerializer(data=request.data)
         if serializer.is_valid():
-            # Set user type based on registration path
+            department = None
             if reseller_id:
-                user = serializer.save(user_type='reseller')
+                # Create the user as admin of a new department under the
+                # reseller, all in one transaction
+                from reseller.provisioning import ProvisioningError, provision_customers
+                data = serializer.validated_data
+                try:
+                    result, = provision_customers(reseller, [{
+                        'name': request.data.get('department_name', f"{data['full_name']}'s Department"),
+                        'description': f"Department for {data['full_name']}",
+                        'admin': {key: data[key] for key in ('email', 'full_name', 'password')},
+                        'service_package': request.data.get('service_package'),
+                    }])
+                except ProvisioningError as error:
+                    return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+                except IntegrityError:
+                    # The email was taken after validation
+                    return Response({"error": "A user with this email already exists"},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                user, department = result['admin'], result['department']
             else:
                 user = serializer.save(user_type='direct')
             
@@ -182,27 +206,8 @@ class RegisterAPIView(APIView):
                 'tokens': tokens
             }
             
-            # If this is a reseller registration, create department and link it to reseller
-            if reseller_id:
-                from reseller.models import Reseller, ResellerCustomer
-                from department.models import Department
-                
-                # Create a department for this customer
-                department_name = request.data.get('department_name', f"{user.full_name}'s Department")
-                department = Department.objects.create(
-                    name=department_name,
-                    description=f"Department for {user.full_name}",
-                    customer_type='reseller'
-                )
-                
-                # Link department to reseller
-                ResellerCustomer.objects.create(
-                    reseller=reseller,
-                    department=department,
-                    is_active=True
-                )
-                
-                # Add department info to response
+            # Add department info to response for reseller registrations
+            if department is not None:
                 from department.serializers import DepartmentSerializer
                 response_data['department'] = DepartmentSerializer(department).data
             
@@ -0,0 +1,9 @@
+from myproject.async_api import api_response, async_api_view
+from .models import User
+from .serializers import UserSerializer
+
+@async_api_view(user_queryset=User.objects.prefetch_related(*UserSerializer.eager_prefetch))
+async def profile(request):
+    """Get current user profile"""
+    # The user and its managed departments were loaded while authenticating
+    return api_response(UserSerializer(request.user).data)
@@ -0,0 +1,103 @@
+"""
+Password hashing on a bounded thread pool.
+
+PBKDF2 runs for hundreds of milliseconds per call. Inline, a login storm
+occupies every worker thread and the read endpoints queue behind it.
+Here hashes run on a small pool (``hashlib`` releases the GIL while it
+hashes), and at most ``MAX_PENDING`` hashes may be running or queued per
+process. Callers beyond that wait up to ``WAIT`` seconds for a slot, then
+get ``PasswordHashingBusy``, a 503 API error the exception handler sends
+with a Retry-After (see myproject/exceptions.py), whichever view hashed.
+
+User.set_password() and User.check_password() hash here, so every backend
+in AUTHENTICATION_BACKENDS does too and login keeps going through
+django.contrib.auth.authenticate(). Only the hash itself runs on the pool;
+database work stays on the request thread.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PasswordHashingBusy(APIException):
+    """Raised when the hashing pool is saturated"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Server is busy, please retry shortly"
+    default_code = 'hashing_busy'
+    # Seconds the client is told to wait
+    retry_after = 1
+
+
+def get_hashing_settings():
+    options = {
+        # 0 hashes inline on the calling thread
+        'WORKERS': 1,
+        'MAX_PENDING': 2,
+        'WAIT': 0.5,
+        # Threads for bulk imports, which hash many passwords at once
+        'BULK_WORKERS': os.cpu_count() or 2,
+    }
+    options.update(getattr(settings, 'PASSWORD_HASHING', {}))
+    return options
+
+
+_executor = None
+_slots = None
+_pid = None
+_lock = threading.Lock()
+
+
+def _get_pool():
+    global _executor, _slots, _pid
+    if _pid != os.getpid():
+        with _lock:
+            if _pid != os.getpid():
+                options = get_hashing_settings()
+                _executor = ThreadPoolExecutor(max_workers=options['WORKERS'], thread_name_prefix='password-hash') \
+                    if options['WORKERS'] else None
+                _slots = threading.BoundedSemaphore(max(options['MAX_PENDING'], options['WORKERS'], 1))
+                _pid = os.getpid()
+    return _executor, _slots
+
+
+def run(fn, *args):
+    """Run ``fn(*args)`` on the hashing pool and wait for its result"""
+    executor, slots = _get_pool()
+    if executor is None:
+        return fn(*args)
+    if not slots.acquire(timeout=get_hashing_settings()['WAIT']):
+        raise PasswordHashingBusy()
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future.result()
+
+
+def hash_password(password):
+    return run(hashers.make_password, password)
+
+
+def hash_many(passwords):
+    """
+    Hash ``passwords`` in parallel on a throwaway pool, for bulk imports.
+    Independent of the login pool, so an import doesn't consume its slots.
+    """
+    passwords = list(passwords)
+    workers = min(get_hashing_settings()['BULK_WORKERS'], len(passwords))
+    if workers <= 1:
+        return [hashers.make_password(password) for password in passwords]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash-bulk') as executor:
+        return list(executor.map(hashers.make_password, passwords))
+
+
+def verify_password(password, encoded):
+    """Return (is_correct, must_update) for ``password`` against ``encoded``"""
+    return run(hashers.verify_password, password, encoded)
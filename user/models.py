@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils import timezone
 
+from .hashing import hash_password, verify_password
+
 class UserManager(BaseUserManager):
     def create_user(self, email, full_name, password=None, **extra_fields):
         if not email:
@@ -48,6 +50,19 @@ class User(AbstractUser):
     
     def __str__(self):
         return self.email
+    
+    def set_password(self, raw_password):
+        # Hashed on the bounded pool, see user/hashing.py
+        self.password = hash_password(raw_password)
+        self._password = raw_password
+    
+    def check_password(self, raw_password):
+        is_correct, must_update = verify_password(raw_password, self.password)
+        if is_correct and must_update:
+            # Rehash with the current hasher settings
+            self.set_password(raw_password)
+            self.save(update_fields=['password'])
+        return is_correct
         
     def is_department_admin(self, department_id=None):
         """
@@ -5,25 +5,54 @@ class UserSerializer(serializers.ModelSerializer):
     is_department_admin = serializers.SerializerMethodField()
     managed_departments = serializers.SerializerMethodField()
     
+    # Prefetch used by expanding serializers so nested users cost no extra queries
+    eager_prefetch = ('admin_departments__department',)
+    
     class Meta:
         model = User
         fields = ['user_id', 'email', 'full_name', 'is_root_admin', 'is_reseller_admin', 
                  'user_type', 'mfa_enabled', 'created_at', 'is_department_admin', 'managed_departments']
         read_only_fields = ['user_id', 'created_at', 'is_department_admin', 'managed_departments']
     
+    def _is_prefetched(self, obj):
+        return 'admin_departments' in getattr(obj, '_prefetched_objects_cache', {})
+    
     def get_is_department_admin(self, obj):
-        from department.models import DepartmentAdmin
-        return DepartmentAdmin.objects.filter(user=obj).exists()
+        if self._is_prefetched(obj):
+            return bool(obj.admin_departments.all())
+        return obj.admin_departments.exists()
     
     def get_managed_departments(self, obj):
-        from department.models import DepartmentAdmin
         from department.serializers import DepartmentSerializer
         
         # Only return departments info if the user is a department admin
-        departments = [admin.department for admin in DepartmentAdmin.objects.filter(user=obj)]
+        if self._is_prefetched(obj):
+            admins = obj.admin_departments.all()
+        else:
+            admins = obj.admin_departments.select_related('department')
+        departments = [admin.department for admin in admins]
         if departments:
             return DepartmentSerializer(departments, many=True).data
         return []
+    
+    def get_is_department_admin_bulk(self, user_ids):
+        """Values-based variant of get_is_department_admin for a whole page"""
+        from department.models import DepartmentAdmin
+        admins = set(DepartmentAdmin.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+        return {user_id: user_id in admins for user_id in user_ids}
+    
+    def get_managed_departments_bulk(self, user_ids):
+        """Values-based variant of get_managed_departments for a whole page"""
+        from department.models import DepartmentAdmin
+        from department.serializers import DepartmentSerializer
+        
+        managed = {user_id: [] for user_id in user_ids}
+        for admin in DepartmentAdmin.objects.filter(user_id__in=user_ids).select_related('department'):
+            managed[admin.user_id].append(admin.department)
+        return {
+            user_id: DepartmentSerializer(departments, many=True).data if departments else []
+            for user_id, departments in managed.items()
+        }
         
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
@@ -34,15 +63,8 @@ class UserCreateSerializer(serializers.ModelSerializer):
                  'user_type', 'mfa_enabled']
     
     def create(self, validated_data):
-        password = validated_data.pop('password')
-        user = User.objects.create_user(
-            email=validated_data['email'],
-            full_name=validated_data['full_name'],
-            **validated_data
-        )
-        user.set_password(password)
-        user.save()
-        return user
+        # One hash and one INSERT
+        return User.objects.create_user(**validated_data)
 
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
@@ -1,3 +1,83 @@
-from django.test import TestCase
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import hashers
+from django.contrib.auth.signals import user_login_failed
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .models import User
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def saturated_pool():
+    """Patch the hashing pool so no slot ever frees up"""
+    return mock.patch('user.hashing._get_pool', return_value=(object(), threading.Semaphore(0)))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, PASSWORD_HASHING={'WAIT': 0})
+class LoginTests(TestCase):
+    url = '/api/users/auth/login/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user@example.com', 'User', 'correct horse')
+
+    def login(self, password, email='user@example.com'):
+        return APIClient().post(self.url, {'email': email, 'password': password}, format='json')
+
+    def test_login(self):
+        response = self.login('correct horse')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user']['email'], 'user@example.com')
+        self.assertIn('access', response.data['tokens'])
+
+    def test_wrong_password_and_unknown_email(self):
+        failures = []
+        receiver = lambda sender, credentials, **kwargs: failures.append(credentials['email'])  # noqa: E731
+        user_login_failed.connect(receiver)
+        self.addCleanup(user_login_failed.disconnect, receiver)
+
+        self.assertEqual(self.login('wrong').status_code, 401)
+        self.assertEqual(self.login('correct horse', email='nobody@example.com').status_code, 401)
+        self.assertEqual(failures, ['user@example.com', 'nobody@example.com'])
+
+    def test_inactive_user(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.login('correct horse').status_code, 401)
+
+    @override_settings(PASSWORD_HASHERS=FAST_HASHERS + ['django.contrib.auth.hashers.ScryptPasswordHasher'])
+    def test_outdated_hash_is_upgraded(self):
+        User.objects.filter(pk=self.user.pk).update(
+            password=hashers.make_password('correct horse', hasher='scrypt'),
+        )
+        self.assertEqual(self.login('correct horse').status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('md5$'))
+
+    def test_saturated_pool(self):
+        with saturated_pool():
+            response = self.login('correct horse')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(response.data, {'error': 'Server is busy, please retry shortly'})
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, PASSWORD_HASHING={'WAIT': 0})
+class RegisterTests(TestCase):
+    url = '/api/users/auth/register/'
+    payload = {'email': 'new@example.com', 'full_name': 'New User', 'password': 'correct horse'}
+
+    def test_direct_registration(self):
+        response = APIClient().post(self.url, self.payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        user = User.objects.get(email='new@example.com')
+        self.assertEqual((user.full_name, user.user_type), ('New User', 'direct'))
+        self.assertTrue(user.check_password('correct horse'))
+
+    def test_saturated_pool(self):
+        with saturated_pool():
+            response = APIClient().post(self.url, self.payload, format='json')
+        self.assertEqual((response.status_code, response['Retry-After']), (503, '1'))
+        self.assertFalse(User.objects.filter(email='new@example.com').exists())